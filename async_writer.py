@@ -0,0 +1,105 @@
+import queue
+import threading
+import traceback
+from collections import Counter
+
+# Background file writer for the export loop.
+#
+# Jobs (plain callables, no bpy access) go into a bounded queue and run in
+# order on one daemon thread, so serialization and fsync happen off Blender's
+# main thread. submit() blocks while the queue is full (backpressure), drain()
+# waits for everything queued so far, and failures are kept until the caller
+# collects them with pop_errors(). Jobs carry a tag (the pot name): callers can
+# ask which pots still have writes in flight, and once a job of a tag fails
+# every later job of that tag is skipped (no journal entry for a pot with a
+# half-written file). The failure sticks to the tag even when the queue runs
+# empty between two submits of the same pot; only begin(tag), called when a new
+# export attempt of that pot starts, clears it.
+
+MAX_PENDING = 256 # Queued jobs before submit() blocks
+
+class AsyncWriter:
+    def __init__(self, max_pending=MAX_PENDING, name="jomon-writer"):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.errors = []
+        self.in_flight = Counter()
+        self.failed_tags = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                tag, fn, args, kwargs = job
+                try:
+                    if tag is not None and tag in self.failed_tags:
+                        print(f"Writer: skipped {getattr(fn, '__name__', fn)} for {tag} after an earlier failure")
+                    else:
+                        fn(*args, **kwargs)
+                except Exception as e:
+                    traceback.print_exc()
+                    with self.lock:
+                        self.errors.append((tag, e))
+                        if tag is not None:
+                            self.failed_tags.add(tag)
+                finally:
+                    with self.lock:
+                        self.in_flight[tag] -= 1
+                        if self.in_flight[tag] <= 0:
+                            # The failure stays: more jobs of this pot may still be submitted
+                            del self.in_flight[tag]
+            finally:
+                self.queue.task_done()
+
+    def submit(self, fn, *args, tag=None, **kwargs):
+        """Queues fn(*args, **kwargs). Blocks while max_pending jobs are waiting."""
+        if not self.thread.is_alive():
+            raise RuntimeError("Writer thread is not running")
+        with self.lock:
+            self.in_flight[tag] += 1
+        self.queue.put((tag, fn, args, kwargs))
+
+    def begin(self, tag):
+        """Starts a new attempt of `tag`: forgets its earlier failure. Returns False (and
+        keeps the failure) while jobs of the previous attempt are still queued."""
+        with self.lock:
+            if self.in_flight[tag] > 0:
+                return False
+            self.failed_tags.discard(tag)
+            return True
+
+    def failed(self, tag):
+        with self.lock:
+            return tag in self.failed_tags
+
+    def pending(self):
+        return self.queue.unfinished_tasks
+
+    def pending_tags(self):
+        """Tags that still have queued or running jobs."""
+        with self.lock:
+            return {tag for tag in self.in_flight if tag is not None}
+
+    def drain(self):
+        """Blocks until every job submitted so far has run."""
+        self.queue.join()
+
+    def pop_errors(self, tag=None):
+        """Returns and forgets the recorded failures [(tag, exception)] (only `tag`'s if given)."""
+        with self.lock:
+            if tag is None:
+                errors, self.errors = self.errors, []
+            else:
+                errors = [e for e in self.errors if e[0] == tag]
+                self.errors = [e for e in self.errors if e[0] != tag]
+        return errors
+
+    def close(self):
+        """Drains the queue and stops the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
@@ -0,0 +1,353 @@
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+import shard_sampler
+import shard_contact
+import facet_graph
+import facet_adjacency
+import facet_descriptors
+import facet_matcher
+import facet_icp
+import synthetic_fracture
+
+# Benchmark of the geometry hot paths on synthetic fractured pots
+# (synthetic_fracture), no Blender / RBDLab needed:
+#
+#   labels   - broadphase + contact index + nearest shard per inner face
+#              (Step 0-1 of run_segmentation_v6_majority)
+#   facets   - CSR adjacency, majority vote, connected components (Step 2-3)
+#   pairing  - facet centroids + facet_adjacency.pair_facets
+#   sampling - 2048 points per shard (shard_sampler.sample_arrays, as export_pot)
+#   sampling_threads - the same on a thread pool (shard_sampler.default_workers())
+#   descriptors - facet_descriptors table of the pot (as written to facets.npy)
+#   matching - facet_matcher.match_facets top-k candidates; counts['match_recall']
+#              is the share of the ground-truth pairs among them
+#   registration - facet_icp.register_pairs over the ground-truth pairs, the
+#              shards scattered to random export poses; counts['registration_correct']
+#              is the share of pairs within CORRECT_DEGREES of the true relative pose
+#              (the fixture's cuts are flat, so only the adjoining surface can tell
+#              a facet's spins apart)
+#
+# plus, per level, "methods/<level>": seconds per shard of the sampling methods
+# for 2048 points out of the export's dense pre-sample (shard_sampler.DENSE_FACTOR
+# x 2048 = 32768 candidates): uniform = 2048 i.i.d. points (the default export
+# path), uniform_dense = drawing the candidates alone, fps, poisson. The printed
+# ratios are against uniform (what switching the method costs an export) and
+# against uniform_dense (the methods' own overhead on top of their pre-sample).
+#
+#   python benchmark_geometry.py --out bench.json
+#   python benchmark_geometry.py --compare bench.json      (exit code 1 on regression)
+#
+# A regression is a stage slower than the baseline beyond the tolerance, or a
+# registration_correct below the baseline's by more than ACCURACY_TOLERANCE.
+# registration_correct under MIN_CORRECT for its level fails the run even
+# without a baseline ('low' meshes are too coarse for the walls' curvature).
+
+SIZES = (10, 60, 250)
+LEVELS = ('low', 'high')
+METHOD_STAGES = ('uniform', 'uniform_dense', 'fps', 'poisson')
+STAGES = ('labels', 'facets', 'pairing', 'sampling', 'sampling_threads', 'descriptors', 'matching', 'registration') + METHOD_STAGES
+CONTACT_THRESHOLD = 0.001 # Same as the segmentation
+NUM_POINTS = 2048
+MATCH_K = 10
+METHOD_CANDIDATES = shard_sampler.DENSE_FACTOR * NUM_POINTS
+METHOD_SHARDS = 10
+TOLERANCE = 0.25          # Allowed slowdown vs baseline (25%)
+NOISE_FLOOR = 0.002       # Differences below 2 ms are never regressions
+SCATTER = 0.5             # Spread (m) of the shards' random export positions
+CORRECT_DEGREES = 5.0     # Registered pairs within this rotation error count as correct
+ACCURACY_TOLERANCE = 0.02 # Allowed drop of counts['registration_correct'] vs baseline
+MIN_CORRECT = {'high': 0.9} # ... and the floor it must reach per level, baseline or not
+
+def label_fixture(shards, threshold=CONTACT_THRESHOLD):
+    """Per shard (inner face ids, labels); label k > 0 = shards[k - 1], 0 = NONE."""
+    lo, hi = shard_contact.shard_aabbs(shards)
+    candidates = shard_contact.broadphase_candidates(lo, hi, threshold)
+    index = shard_contact.ContactIndex(shards, threshold)
+
+    face_ids = [np.flatnonzero(s['inner']) for s in shards]
+    points = np.concatenate([s['centers'][ids] for s, ids in zip(shards, face_ids)])
+    owners = np.concatenate([np.full(len(ids), k) for k, ids in enumerate(face_ids)])
+    nearest, _ = index.nearest_other_shard(points, owners, allowed=candidates)
+
+    labels = []
+    start = 0
+    for ids in face_ids:
+        labels.append((ids, nearest[start:start + len(ids)] + 1))
+        start += len(ids)
+    return labels
+
+def facet_fixture(shards, initial_labels, iterations=5):
+    """Per shard (inner face ids, facet id per face, label per facet)."""
+    facets = []
+    for s, (ids, labels) in zip(shards, initial_labels):
+        if len(ids) == 0:
+            facets.append((ids, ids, ids))
+            continue
+        indptr, indices, weights = facet_graph.face_adjacency_csr(s['loop_start'], s['loop_total'], s['loop_edges'], ids)
+        labels, _ = facet_graph.smooth_labels(indptr, indices, weights, labels, iterations)
+        facet_ids = facet_graph.connected_components(indptr, indices, labels)
+        facet_labels = np.zeros(int(facet_ids.max()) + 1, dtype=np.int64)
+        facet_labels[facet_ids] = labels
+        facets.append((ids, facet_ids, facet_labels))
+    return facets
+
+def facet_data_fixture(shards, facets):
+    """facet_data like facet_adjacency.collect_facets (centroid = mean face centre)."""
+    facet_data = []
+    for s, (ids, facet_ids, facet_labels) in zip(shards, facets):
+        if len(ids) == 0: continue
+        counts = np.bincount(facet_ids)
+        sums = np.stack([np.bincount(facet_ids, weights=s['centers'][ids, k]) for k in range(3)], axis=1)
+        for i, label in enumerate(facet_labels):
+            nb_name = shards[label - 1]['name'] if label > 0 else "NONE"
+            facet_data.append({
+                'id': len(facet_data) + 1,
+                'obj_name': s['name'],
+                'nb_name': nb_name,
+                'mat_name': f"RECON_V6_{nb_name}_{i}",
+                'pos': sums[i] / counts[i],
+            })
+    return facet_data
+
+def prepare_fixture(shards, facets):
+    """prepare_shard() equivalent: (arrays, label_table, 0) per shard, labels = facet slot."""
+    for s, (ids, facet_ids, facet_labels) in zip(shards, facets):
+        per_face = np.zeros(len(s['inner']), dtype=np.int32)
+        per_face[ids] = facet_ids + 1
+        arrays = dict(s, material_index=per_face[s['polygon_index']])
+        yield arrays, np.arange(len(facet_labels) + 1, dtype=np.int32), 0.0
+
+def descriptor_fixture(shards, facets):
+    """facet_descriptors table with the facet ids of facet_data_fixture."""
+    described = []
+    offset = 0
+    for s, (ids, facet_ids, facet_labels), (arrays, label_table, _) in zip(shards, facets, prepare_fixture(shards, facets)):
+        if len(ids) == 0: continue
+        local, desc = facet_descriptors.shard_descriptors(arrays, label_table)
+        described.append((s['name'], local + offset, desc))
+        offset += len(facet_labels)
+    return facet_descriptors.facet_table(described)
+
+def sample_fixture(shards, facets, num_points=NUM_POINTS, seed=0, workers=1, write=None):
+    """Point cloud per shard (0 = surface), as export_pot samples them."""
+    seeds = [shard_sampler.shard_seed(seed, s['name']) for s in shards]
+    results = shard_sampler.sample_prepared_shards(prepare_fixture(shards, facets), num_points, seeds, workers, write)
+    return [sample for sample, _, _ in results]
+
+def scatter_fixture(shards, seed=0):
+    """Every shard moved by a random rigid pose, like the export frame of a simulated pot.
+
+    Returns (moved shards, poses.json-style poses: frame_1 = identity, export = the pose).
+    """
+    rng = np.random.default_rng([seed, 2])
+    moved, poses = [], {}
+    for s in shards:
+        q = rng.normal(size=4)
+        w, x, y, z = q / np.linalg.norm(q)
+        export = np.eye(4)
+        export[:3, :3] = [[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                          [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                          [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]]
+        export[:3, 3] = rng.normal(scale=SCATTER, size=3)
+        moved.append(dict(s, co=s['co'] @ export[:3, :3].T + export[:3, 3]))
+        poses[s['name']] = facet_icp.pose_entry(np.eye(4), export)
+    return moved, poses
+
+def registration_fixture(shards, facets, samples, poses=None):
+    """Shard name -> point cloud with the facet ids of facet_data_fixture as labels.
+
+    poses: scatter_fixture poses to move the (frame 1) samples to their export pose.
+    """
+    clouds = {}
+    offset = 0
+    for s, (ids, facet_ids, facet_labels), sample in zip(shards, facets, samples):
+        label = np.where(sample['label'] > 0, sample['label'] + offset, 0)
+        clouds[s['name']] = dict(sample, label=label)
+        if poses is not None:
+            export = np.array(poses[s['name']]['export'])
+            clouds[s['name']].update(pos=sample['pos'] @ export[:3, :3].T + export[:3, 3],
+                                     norm=sample['norm'] @ export[:3, :3].T)
+        offset += len(facet_labels) if len(ids) else 0
+    return clouds
+
+def registration_accuracy(table, registered, adjacency, poses, max_degrees=CORRECT_DEGREES):
+    """Share of the pairs registered within max_degrees of the ground truth (unregistered ones count as wrong)."""
+    correct = 0
+    for k, (id_a, id_b) in enumerate(adjacency):
+        row_a = facet_descriptors.lookup(table, id_a)
+        row_b = facet_descriptors.lookup(table, id_b)
+        if row_a is None or row_b is None or not np.isfinite(registered['residual'][k]): continue
+        truth = facet_icp.ground_truth_transform(poses, str(row_a['shard']), str(row_b['shard']))
+        degrees, _ = facet_icp.transform_error(registered['transforms'][k], truth, row_b['centroid'])
+        correct += degrees < max_degrees
+    return correct / len(adjacency) if len(adjacency) else 1.0
+
+def best_time(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def run_case(num_shards, level, repeats=3, seed=0):
+    t0 = time.perf_counter()
+    shards = synthetic_fracture.make_fractured_pot(num_shards, level, seed)
+    build = time.perf_counter() - t0
+
+    seconds = {}
+    seconds['labels'], labels = best_time(lambda: label_fixture(shards), repeats)
+    seconds['facets'], facets = best_time(lambda: facet_fixture(shards, labels), repeats)
+
+    def pairing():
+        facet_data = facet_data_fixture(shards, facets)
+        return facet_data, facet_adjacency.pair_facets(facet_data)
+    seconds['pairing'], (facet_data, pairs) = best_time(pairing, repeats)
+    seconds['sampling'], samples = best_time(lambda: sample_fixture(shards, facets), repeats)
+    seconds['sampling_threads'], _ = best_time(
+        lambda: sample_fixture(shards, facets, workers=shard_sampler.default_workers()), repeats)
+    seconds['descriptors'], table = best_time(lambda: descriptor_fixture(shards, facets), repeats)
+    seconds['matching'], (candidates, _) = best_time(lambda: facet_matcher.match_facets(table, MATCH_K), repeats)
+    adjacency = facet_adjacency.adjacency_from_pairs(facet_data, pairs)
+    moved, poses = scatter_fixture(shards, seed)
+    moved_table = descriptor_fixture(moved, facets)
+    clouds = registration_fixture(shards, facets, samples, poses)
+    seconds['registration'], registered = best_time(
+        lambda: facet_icp.register_pairs(moved_table, clouds, [tuple(p) for p in adjacency]), repeats)
+
+    inner = sum(len(ids) for ids, _ in labels)
+    labelled = sum(int((l > 0).sum()) for _, l in labels)
+    return {
+        'shards': num_shards,
+        'level': level,
+        'fixture_s': build,
+        'seconds': seconds,
+        'counts': {
+            'faces': sum(len(s['inner']) for s in shards),
+            'inner_faces': inner,
+            'labelled_ratio': labelled / inner if inner else 0.0,
+            'facets': len(facet_data),
+            'pairs': len(pairs),
+            'points': sum(len(p['pos']) for p in samples),
+            'match_candidates': len(candidates),
+            'match_recall': facet_matcher.recall(table, candidates, adjacency),
+            'registered': int(np.isfinite(registered['residual']).sum()),
+            'registration_correct': registration_accuracy(moved_table, registered, adjacency, poses),
+        },
+    }
+
+def run_methods_case(level, repeats=3, num_shards=METHOD_SHARDS, candidates=METHOD_CANDIDATES, seed=0):
+    """Seconds per shard of each sampling method (NUM_POINTS out of `candidates`)."""
+    shards = synthetic_fracture.make_fractured_pot(num_shards, level, seed)
+
+    def per_shard(fn):
+        seconds, _ = best_time(lambda: [fn(s, np.random.default_rng(k)) for k, s in enumerate(shards)], repeats)
+        return seconds / num_shards
+
+    method = lambda name: lambda s, rng: shard_sampler.sample_surface_method(s['co'], s['tris'], NUM_POINTS, rng,
+                                                                              name, candidates)
+    seconds = {
+        'uniform': per_shard(method("uniform")),
+        'uniform_dense': per_shard(lambda s, rng: shard_sampler.sample_surface(s['co'], s['tris'], candidates, rng)),
+        'fps': per_shard(method("fps")),
+        'poisson': per_shard(method("poisson")),
+    }
+    return {'shards': num_shards, 'level': level, 'candidates': candidates, 'seconds': seconds}
+
+def run_suite(sizes=SIZES, levels=LEVELS, repeats=3):
+    results = {}
+    for level in levels:
+        for num_shards in sizes:
+            r = run_case(num_shards, level, repeats)
+            results[f"{num_shards}/{level}"] = r
+            print(f"{num_shards:4d} shards {level:4s} ({r['counts']['faces']:7d} faces): "
+                  + ", ".join(f"{k} {v * 1000:8.1f} ms" for k, v in r['seconds'].items())
+                  + f", registration correct {r['counts']['registration_correct']:.0%}")
+        r = run_methods_case(level, repeats)
+        results[f"methods/{level}"] = r
+        uniform, dense = r['seconds']['uniform'], r['seconds']['uniform_dense']
+        print(f"methods {level:4s} ({r['candidates']} candidates, per shard): "
+              + ", ".join(f"{k} {v * 1000:7.1f} ms (x{v / uniform:5.1f} uniform, x{v / dense:4.1f} dense)"
+                          for k, v in r['seconds'].items()))
+    return {
+        'version': 1,
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'repeats': repeats,
+            'workers': shard_sampler.default_workers(),
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Prints new/baseline per case and stage. Returns the list of regressions."""
+    regressions = []
+    for key, r in current['results'].items():
+        base = baseline['results'].get(key)
+        # Method timings are only comparable for the same candidate count
+        if base is None or base.get('candidates') != r.get('candidates'): continue
+        for stage in STAGES:
+            new_s = r['seconds'].get(stage)
+            old_s = base['seconds'].get(stage)
+            if new_s is None or old_s is None: continue
+            ratio = new_s / old_s if old_s > 0 else float('inf')
+            slow = ratio > 1 + tolerance and new_s - old_s > NOISE_FLOOR
+            print(f"{key:10s} {stage:16s} {old_s * 1000:9.1f} -> {new_s * 1000:9.1f} ms  x{ratio:5.2f}"
+                  + ("  REGRESSION" if slow else ""))
+            if slow:
+                regressions.append((key, stage, ratio))
+        new_c = r.get('counts', {}).get('registration_correct')
+        old_c = base.get('counts', {}).get('registration_correct')
+        if new_c is not None and old_c is not None:
+            worse = old_c - new_c > ACCURACY_TOLERANCE
+            print(f"{key:10s} {'correct':16s} {old_c:9.1%} -> {new_c:9.1%}" + ("  REGRESSION" if worse else ""))
+            if worse:
+                regressions.append((key, 'registration_correct', new_c / old_c if old_c > 0 else float('inf')))
+    return regressions
+
+def accuracy_failures(current, floors=MIN_CORRECT):
+    """Cases whose registration_correct is below the floor of their level. Prints them."""
+    failures = []
+    for key, r in current['results'].items():
+        correct = r.get('counts', {}).get('registration_correct')
+        floor = floors.get(r['level'])
+        if correct is None or floor is None or correct >= floor: continue
+        print(f"{key:10s} registration correct {correct:.1%} below {floor:.0%}")
+        failures.append((key, correct))
+    return failures
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sampling / pairing / labelling on synthetic fractured pots")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--levels", nargs="+", default=list(LEVELS), choices=list(synthetic_fracture.SUBDIVISION_LEVELS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    current = run_suite(args.sizes, args.levels, args.repeats)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=4)
+    failed = bool(accuracy_failures(current))
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import multiprocessing
+from collections import deque
+import numpy as np
+
+import pointcloud_io
+import dataset_pack
+import facet_descriptors
+import facet_icp
+import pot_manifest
+import production_journal
+
+# Streaming batch loader for training (NumPy only, no DL framework).
+#
+#   for batch in iterate_batches("dataset_root_or.jpak", batch_size=32):
+#       batch['pos']    float32 [B, N, 3]
+#       batch['norm']   float32 [B, N, 3]
+#       batch['label']  int32   [B, N]      facet id per point (0 = original surface)
+#       batch['pairs']  int32   [P, 4]      (i, j, facet_i, facet_j): batch items i < j
+#                                           touch through facet_i of i and facet_j of j
+#       batch['pot'], batch['shard']        names per item
+#
+# Sources: a dataset root with Pot_XXX folders (.json or .jpc shards +
+# adjacency.json; only pots the journal lists as exported, if there is one)
+# or a .jpak pack. Pots are visited in a shuffled order per epoch, loaded by
+# worker processes (at most `prefetch` pots in flight) and their shards go
+# through a shuffle buffer of `shuffle_buffer` items, so memory stays bounded
+# by prefetch pots + buffer + one batch, whatever the dataset size.
+#
+# Every shard is resampled to exactly num_points (without replacement when it
+# has enough points). With prefix=True the first num_points are taken instead
+# (nested multi-resolution exports, see shard_sampler.nested_order; .jpc and
+# packs are sliced without reading the rest, compressed 'quant' blocks are
+# decompressed only up to the level). The output only depends on
+# seed/epoch, not on workers.
+
+BATCH_SIZE = 32
+NUM_POINTS = 2048
+SHUFFLE_BUFFER = 1024 # Shards held for shuffling
+PREFETCH = 4          # Pots loaded ahead per epoch
+
+NON_SHARD_FILES = {"adjacency.json", pot_manifest.MANIFEST_NAME, facet_icp.POSES_NAME}
+
+class FolderSource:
+    """Pot_XXX folders of a dataset root, same interface as dataset_pack.PackReader."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def pots(self):
+        names = sorted(d for d in os.listdir(self.root)
+                       if d.startswith("Pot_") and os.path.exists(os.path.join(self.root, d, "adjacency.json")))
+        if os.path.exists(os.path.join(self.root, production_journal.JOURNAL_NAME)):
+            journal = production_journal.ProductionJournal(self.root)
+            try:
+                names = [n for n in names if journal.is_done(n)]
+            finally:
+                journal.close()
+        return names
+
+    def shards(self, pot_name):
+        folder = os.path.join(self.root, pot_name)
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(folder)
+                      if f.endswith((".json", ".jpc")) and f not in NON_SHARD_FILES)
+
+    def _shard_path(self, pot_name, shard_name):
+        base = os.path.join(self.root, pot_name, shard_name)
+        return base + ".jpc" if os.path.exists(base + ".jpc") else base + ".json"
+
+    def load_shard(self, pot_name, shard_name, num_points=None):
+        return pointcloud_io.load_shard(self._shard_path(pot_name, shard_name), num_points=num_points)
+
+    def load_adjacency(self, pot_name):
+        with open(os.path.join(self.root, pot_name, "adjacency.json"), 'r') as f:
+            return json.load(f)
+
+    def load_facets(self, pot_name):
+        """facet_descriptors table of the pot (None if it was exported without one)."""
+        folder = os.path.join(self.root, pot_name)
+        if not os.path.exists(os.path.join(folder, facet_descriptors.FACETS_NAME)):
+            return None
+        return facet_descriptors.load_facets(folder)
+
+    def load_poses(self, pot_name):
+        """poses.json of the pot (None if it was exported without one)."""
+        folder = os.path.join(self.root, pot_name)
+        if not os.path.exists(os.path.join(folder, facet_icp.POSES_NAME)):
+            return None
+        return facet_icp.load_poses(folder)
+
+def open_source(path):
+    if os.path.isdir(path):
+        return FolderSource(path)
+    return dataset_pack.PackReader(path)
+
+_sources = {}
+
+def _cached_source(path):
+    """One open source per process (PackReader's mmap cannot be pickled to workers)."""
+    if path not in _sources:
+        _sources[path] = open_source(path)
+    return _sources[path]
+
+def resample(sample, num_points, rng):
+    """Exactly num_points rows of pos/norm/label (with replacement only if there are too few)."""
+    n = len(sample['pos'])
+    if n == 0:
+        raise ValueError("Shard without points")
+    if n == num_points:
+        idx = rng.permutation(n)
+    else:
+        idx = rng.choice(n, num_points, replace=n < num_points)
+    return {
+        'pos': np.asarray(sample['pos'], dtype=np.float32)[idx],
+        'norm': np.asarray(sample['norm'], dtype=np.float32)[idx],
+        'label': np.asarray(sample['label'], dtype=np.int32)[idx],
+    }
+
+def load_pot(path, pot_name, num_points, seed, prefix=False):
+    """(items, adjacency pairs [K,2]) of one pot; runs in the worker processes."""
+    source = _cached_source(path)
+    items = []
+    for shard_name in source.shards(pot_name):
+        try:
+            # Nested export: the level is the first num_points, read without the rest
+            sample = source.load_shard(pot_name, shard_name, num_points=num_points if prefix else None)
+        except ValueError:
+            # Shorter than the level: all of it, resampled below
+            sample = source.load_shard(pot_name, shard_name)
+        rng = np.random.default_rng(list(seed) + [zlib.crc32(shard_name.encode("utf-8"))])
+        item = resample(sample, num_points, rng)
+        # Facets from all points, so a resample cannot drop a small one
+        labels = np.asarray(sample['label'])
+        item['facets'] = np.unique(labels[labels > 0]).astype(np.int32)
+        item['pot'] = pot_name
+        item['shard'] = shard_name
+        items.append(item)
+    adjacency = np.asarray(source.load_adjacency(pot_name), dtype=np.int32).reshape(-1, 2)
+    return items, adjacency
+
+def _pot_stream(path, pot_names, num_points, seed, workers, prefetch, prefix=False):
+    """Yields load_pot() results in pot order, at most `prefetch` pots ahead."""
+    if workers <= 0:
+        for pot_name in pot_names:
+            yield load_pot(path, pot_name, num_points, seed, prefix)
+        return
+
+    pool = multiprocessing.get_context().Pool(workers)
+    try:
+        pending = deque()
+        names = iter(pot_names)
+        for pot_name in names:
+            pending.append(pool.apply_async(load_pot, (path, pot_name, num_points, seed, prefix)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            result = pending.popleft().get()
+            next_name = next(names, None)
+            if next_name is not None:
+                pending.append(pool.apply_async(load_pot, (path, next_name, num_points, seed, prefix)))
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def collate(items, adjacency):
+    """Batch dict (see module comment). adjacency: pot name -> pairs [K,2]."""
+    owners = {}
+    for i, item in enumerate(items):
+        for facet in item['facets'].tolist():
+            owners[(item['pot'], facet)] = i
+
+    rows = []
+    for pot_name in dict.fromkeys(item['pot'] for item in items):
+        for a, b in adjacency[pot_name].tolist():
+            i = owners.get((pot_name, a))
+            j = owners.get((pot_name, b))
+            if i is None or j is None or i == j: continue
+            rows.append((i, j, a, b) if i < j else (j, i, b, a))
+
+    return {
+        'pos': np.stack([item['pos'] for item in items]),
+        'norm': np.stack([item['norm'] for item in items]),
+        'label': np.stack([item['label'] for item in items]),
+        'pairs': np.array(sorted(rows), dtype=np.int32).reshape(-1, 4),
+        'pot': [item['pot'] for item in items],
+        'shard': [item['shard'] for item in items],
+    }
+
+def iterate_batches(path, batch_size=BATCH_SIZE, num_points=NUM_POINTS, shuffle_buffer=SHUFFLE_BUFFER,
+                    workers=2, prefetch=PREFETCH, seed=0, epochs=1, drop_last=True, pots=None, prefix=False):
+    """Generator of shuffled fixed-size batches from a dataset root or .jpak.
+
+    epochs: None = repeat forever. drop_last: skip the short last batch of an epoch.
+    pots: restrict to these pot names (e.g. a train/validation split).
+    prefix: take the first num_points of each shard (nested exports) instead of resampling.
+    """
+    pot_names = list(pots) if pots is not None else open_source(path).pots()
+    if not pot_names:
+        return
+    shuffle_buffer = max(shuffle_buffer, batch_size)
+
+    epoch = 0
+    while epochs is None or epoch < epochs:
+        rng = np.random.default_rng([seed, epoch])
+        order = [pot_names[k] for k in rng.permutation(len(pot_names))]
+
+        buffer = []
+        adjacency = {}   # pot -> pairs, while any of its shards is buffered or batched
+        remaining = {}   # pot -> shards not yet batched
+        batch = []
+
+        def take(index):
+            # Swap-remove: O(1) random pick from the buffer
+            buffer[index], buffer[-1] = buffer[-1], buffer[index]
+            batch.append(buffer.pop())
+
+        def emit():
+            out = collate(batch, adjacency)
+            for item in batch:
+                remaining[item['pot']] -= 1
+                if remaining[item['pot']] == 0:
+                    del remaining[item['pot']], adjacency[item['pot']]
+            batch.clear()
+            return out
+
+        for items, pairs in _pot_stream(path, order, num_points, (seed, epoch), workers, prefetch, prefix):
+            if not items: continue
+            adjacency[items[0]['pot']] = pairs
+            remaining[items[0]['pot']] = len(items)
+            for item in items:
+                if len(buffer) >= shuffle_buffer:
+                    take(int(rng.integers(len(buffer))))
+                    if len(batch) == batch_size:
+                        yield emit()
+                buffer.append(item)
+
+        # End of the epoch: flush the buffer in random order
+        while buffer:
+            take(int(rng.integers(len(buffer))))
+            if len(batch) == batch_size:
+                yield emit()
+        if batch and not drop_last:
+            yield emit()
+        epoch += 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream training batches from an exported dataset")
+    parser.add_argument("path", help="Dataset root (Pot_XXX folders) or .jpak pack")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--num-points", type=int, default=NUM_POINTS)
+    parser.add_argument("--shuffle-buffer", type=int, default=SHUFFLE_BUFFER)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--prefix", action="store_true", help="Nested export: use the first --num-points of each shard")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    batches = shards = pairs = 0
+    for batch in iterate_batches(args.path, args.batch_size, args.num_points, args.shuffle_buffer,
+                                 workers=args.workers, epochs=args.epochs, prefix=args.prefix):
+        batches += 1
+        shards += len(batch['pos'])
+        pairs += len(batch['pairs'])
+    seconds = time.perf_counter() - start
+    print(f"{batches} batches, {shards} shards, {pairs} adjacent pairs in {seconds:.1f} s"
+          f" ({shards / seconds if seconds > 0 else 0:.0f} shards/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
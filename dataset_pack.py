@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import numpy as np
+
+import pointcloud_io
+import facet_descriptors
+
+# Single-file dataset container (.jpak) for many pots.
+#
+# Layout (little-endian):
+#     bytes 0-3    magic b"JPAK"
+#     bytes 4-7    uint32 version
+#     bytes 8-15   uint64 offset of the last index record
+#     bytes 16-23  uint64 length of the last index record
+#     bytes 24-31  reserved
+#     32..         blobs, each 16-byte aligned:
+#                    - shard point clouds in the JPC1 binary layout (see pointcloud_io),
+#                      plain or quantized depending on the writer's format
+#                    - adjacency lists as JSON
+#                    - facet descriptor tables as .npy bytes (facet_descriptors)
+#                    - shard poses as JSON (facet_icp, same layout as poses.json)
+#                    - index records as JSON
+#
+# The file is append-only: adding a pot appends its blobs plus one index
+# record holding only that pot and the location of the previous record, then
+# the fixed header is patched to point at the new record. A crash before the
+# header patch leaves the previous chain (and all its pots) valid. Readers walk
+# the chain back from the header and fold the records oldest first, so the
+# index costs O(pots) bytes instead of one full snapshot per added pot.
+#
+# Index record:
+#     {"version": 2, "prev": [offset, length] or null,
+#      "pots": {"Pot_001": {"shards": {"Pot_001_cell.001": [offset, length], ...},
+#                           "adjacency": [offset, length],
+#                           "facets": [offset, length],
+#                           "poses": [offset, length]}}}     (facets, poses optional)
+#
+# Version 1 packs hold full snapshots without "prev"; such a record ends the
+# chain, so they stay readable and can be appended to. Adding a pot name that
+# already exists replaces its index entry (latest wins).
+
+MAGIC = b"JPAK"
+VERSION = 2
+HEADER_SIZE = 32
+ALIGN = 16
+
+def _empty_index():
+    return {'version': VERSION, 'pots': {}}
+
+def _index_location(header):
+    if bytes(header[0:4]) != MAGIC:
+        raise ValueError("Not a JPAK dataset pack")
+    offset, length = np.frombuffer(header, dtype="<u8", count=2, offset=8)
+    return int(offset), int(length)
+
+def _read_index(read, location):
+    """Folds the index records chained back from `location` ([offset, length]).
+
+    read(offset, length) -> bytes.
+    """
+    records = []
+    while location is not None and location[1]:
+        record = json.loads(read(*location).decode("utf-8"))
+        records.append(record)
+        location = record.get('prev')
+    index = _empty_index()
+    for record in reversed(records):
+        index['pots'].update(record['pots'])
+    return index
+
+class PackWriter:
+    """Appends pots (shard clouds + adjacency) to a .jpak file.
+
+    fmt: "bin" (plain float32 arrays) or "quant" (see pointcloud_io).
+    """
+
+    def __init__(self, path, fmt="bin"):
+        self.path = path
+        self.encoding = pointcloud_io.FORMAT_ENCODINGS[fmt]
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            self.f = open(path, 'r+b')
+            self.last = list(_index_location(self.f.read(HEADER_SIZE)))
+            self.index = _read_index(self._read, self.last)
+        else:
+            self.f = open(path, 'w+b')
+            self.last = [0, 0]
+            self.index = _empty_index()
+            self._write_header(0, 0)
+
+    def _read(self, offset, length):
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def _write_header(self, index_offset, index_length):
+        header = bytearray(HEADER_SIZE)
+        header[0:4] = MAGIC
+        header[4:8] = np.uint32(VERSION).tobytes()
+        header[8:24] = np.array([index_offset, index_length], dtype="<u8").tobytes()
+        self.f.seek(0)
+        self.f.write(header)
+
+    def _append(self, blob):
+        self.f.seek(0, os.SEEK_END)
+        end = self.f.tell()
+        start = (end + ALIGN - 1) // ALIGN * ALIGN
+        if start > end:
+            self.f.write(b"\0" * (start - end))
+        self.f.write(blob)
+        return [start, len(blob)]
+
+    def add_pot(self, pot_name, samples, adjacency_list, meta=None, facets=None, poses=None):
+        """samples: shard name -> {'pos','norm','label'} arrays; meta: shard header meta (levels).
+
+        facets: facet_descriptors table of the pot, if any.
+        poses: shard name -> {'frame_1', 'export'} matrices (poses.json), if any.
+        """
+        entry = {'shards': {}, 'adjacency': None}
+        for shard_name, sample in samples.items():
+            entry['shards'][shard_name] = self._append(pointcloud_io.encode_shard(sample, meta, **self.encoding))
+        entry['adjacency'] = self._append(json.dumps(adjacency_list).encode("utf-8"))
+        if facets is not None:
+            entry['facets'] = self._append(facet_descriptors.table_to_bytes(facets))
+        if poses is not None:
+            entry['poses'] = self._append(json.dumps(poses).encode("utf-8"))
+
+        self.index['pots'][pot_name] = entry
+        self._commit({pot_name: entry})
+
+    def _commit(self, pots):
+        record = {'version': VERSION, 'prev': self.last if self.last[1] else None, 'pots': pots}
+        self.last = self._append(json.dumps(record).encode("utf-8"))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._write_header(*self.last)
+        self.f.flush()
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PackReader:
+    """Random access to a .jpak file through mmap.
+
+    Plain shard arrays are zero-copy views, quantized ones are decoded copies.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = _read_index(lambda offset, length: bytes(self.buffer[offset:offset + length]),
+                                 _index_location(self.buffer))
+
+        # Flat (pot, shard) list for integer indexing
+        self.keys = [(pot, shard)
+                     for pot, entry in self.index['pots'].items()
+                     for shard in entry['shards']]
+
+    def pots(self):
+        return list(self.index['pots'].keys())
+
+    def shards(self, pot_name):
+        return list(self.index['pots'][pot_name]['shards'].keys())
+
+    def load_shard(self, pot_name, shard_name, num_points=None):
+        """num_points: only that prefix (a level of a nested shard), still zero-copy."""
+        offset, _ = self.index['pots'][pot_name]['shards'][shard_name]
+        return pointcloud_io.decode_shard(self.buffer, offset, num_points)
+
+    def load_adjacency(self, pot_name):
+        offset, length = self.index['pots'][pot_name]['adjacency']
+        return json.loads(bytes(self.buffer[offset:offset + length]).decode("utf-8"))
+
+    def load_facets(self, pot_name):
+        """facet_descriptors table of the pot (None for packs written without one)."""
+        location = self.index['pots'][pot_name].get('facets')
+        if location is None:
+            return None
+        offset, length = location
+        return facet_descriptors.table_from_bytes(self.buffer[offset:offset + length])
+
+    def load_poses(self, pot_name):
+        """Shard poses of the pot, as in poses.json (None for packs written without them)."""
+        location = self.index['pots'][pot_name].get('poses')
+        if location is None:
+            return None
+        offset, length = location
+        return json.loads(bytes(self.buffer[offset:offset + length]).decode("utf-8"))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, i):
+        pot_name, shard_name = self.keys[i]
+        return self.load_shard(pot_name, shard_name)
+
+    def close(self):
+        # Views returned by load_shard keep their own reference to the buffer
+        self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,15 +1,41 @@
 import bpy
-import bmesh
 import json
 import os
-import random
-from mathutils import Vector
-from mathutils.bvhtree import BVHTree
 
-def export_training_data(output_dir, num_points=2048):
-    if not os.path.exists(output_dir):
+import shard_sampler
+import pointcloud_io
+import dataset_pack
+import facet_adjacency
+import facet_descriptors
+import facet_icp
+import production_stats
+
+def export_training_data(output_dir, num_points=2048, fmt="json", pack_path=None, seed=None, workers=1,
+                         method="uniform", levels=None):
+    # fmt: "json" (legacy dict list), "bin" (columnar .jpc) or "quant" (quantized +
+    #      compressed .jpc), see pointcloud_io
+    # pack_path: if set, all pots are appended to this single .jpak file
+    #            (see dataset_pack) instead of Pot_XXX folders; packs hold binary
+    #            shards only, so fmt="json" (the default) is stored as "bin"
+    # seed: if set, point sampling is reproducible (per-shard seed from the exported name)
+    # workers: threads for sampling + writing (bpy extraction stays on this thread)
+    # method: point distribution, "uniform", "fps" or "poisson" (see shard_sampler)
+    # levels: nested resolutions (e.g. [512, 1024, 2048, 8192]); overrides
+    #         num_points with max(levels), every level is a prefix of the file
+    if levels:
+        num_points = max(levels)
+    meta = {'levels': list(levels)} if levels else None
+    if not pack_path and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    pack = None
+    if pack_path:
+        if fmt not in pointcloud_io.FORMAT_ENCODINGS:
+            print(f"Pack shards cannot be '{fmt}', writing 'bin' into {pack_path}")
+            fmt = "bin"
+        pack = dataset_pack.PackWriter(pack_path, fmt)
+    stats_path = pack_path + ".stats.jsonl" if pack else os.path.join(output_dir, production_stats.STATS_NAME)
+
     # Updated selector for RND_Pot
     all_shards = [obj for obj in bpy.data.objects if "RND_Pot" in obj.name and ("cell" in obj.name.lower() or "Cell" in obj.name) and obj.type == 'MESH']
     
@@ -40,10 +66,11 @@ def export_training_data(output_dir, num_points=2048):
         
         # Create Folder
         pot_dir = os.path.join(output_dir, new_pot_id)
-        if not os.path.exists(pot_dir):
+        if not pack and not os.path.exists(pot_dir):
             os.makedirs(pot_dir)
             
         print(f"Processing {old_pot_id} -> {new_pot_id} ({len(shards)} shards)")
+        production_stats.begin_pot(new_pot_id, stats_path)
 
         # Create Name Mapping for this pot's shards
         # obj.name (RND_Pot_0_0_cell.001) -> new_name (Pot_001_cell.001)
@@ -57,133 +84,70 @@ def export_training_data(output_dir, num_points=2048):
         bpy.context.scene.frame_set(1)
         bpy.context.view_layer.update()
         
-        facet_data = []
-        mat_to_id = {}
-        id_counter = 1 
-        
-        for obj in shards:
-            for i, mat in enumerate(obj.data.materials):
-                if not mat or "RECON_V6_" not in mat.name: continue
-                
-                faces = [f for f in obj.data.polygons if f.material_index == i]
-                if not faces: continue
-                
-                # Setup Names
-                mapped_obj_name = name_map[obj.name]
-                
-                # Neighbor Name Logic:
-                # Material name: RECON_V6_RND_Pot_0_0_cell.002_15
-                # We need to parse this and map the neighbor name too!
-                # Core: RND_Pot_0_0_cell.002
-                core_name = mat.name[9:] 
-                nb_original_name = "_".join(core_name.split('_')[:-1])
-                
-                # If neighbor is in our map (it should be if it's in the same pot), map it
-                mapped_nb_name = name_map.get(nb_original_name, "NONE")
-                
-                centroid = sum((f.center for f in faces), Vector()) / len(faces)
-                world_pos = obj.matrix_world @ centroid
-                
-                facet_id = id_counter
-                id_counter += 1
-                mat_to_id[(obj.name, mat.name)] = facet_id
-                
-                facet_data.append({
-                    'id': facet_id,
-                    'obj_name': mapped_obj_name, # Export NEW name
-                    'nb_name': mapped_nb_name,   # Export NEW name
-                    'mat_name': mat.name,
-                    'pos': world_pos
-                })
-
-        # --- B. Find Pairs ---
-        adjacency_list = []
-        processed_pairs = set()
-        MATCH_DIST_THRESHOLD = 2.0 
-
-        for i, f1 in enumerate(facet_data):
-            if f1['nb_name'] == "NONE": continue
-            
-            best_candidate = None
-            min_match_dist = 1000.0
-
-            for j, f2 in enumerate(facet_data):
-                if i == j: continue
-                if f1['nb_name'] == f2['obj_name'] and f2['nb_name'] == f1['obj_name']:
-                    dist = (f1['pos'] - f2['pos']).length
-                    if dist < MATCH_DIST_THRESHOLD and dist < min_match_dist:
-                        min_match_dist = dist
-                        best_candidate = j
-
-            if best_candidate is not None:
-                f2 = facet_data[best_candidate]
-                pair = sorted([f1['id'], f2['id']])
-                tuple_pair = tuple(pair)
-                
-                if tuple_pair not in processed_pairs:
-                    processed_pairs.add(tuple_pair)
-                    adjacency_list.append(pair)
-
-        # Save Adjacency
-        with open(os.path.join(pot_dir, "adjacency.json"), 'w') as f:
-            json.dump(adjacency_list, f, indent=4)
+        with production_stats.stage("adjacency") as st:
+            facet_data, mat_to_id = facet_adjacency.collect_facets(shards, name_map)
+
+            # --- B. Find Pairs ---
+            MATCH_DIST_THRESHOLD = 2.0 
+            pairs = facet_adjacency.pair_facets(facet_data, max_dist=MATCH_DIST_THRESHOLD)
+            adjacency_list = facet_adjacency.adjacency_from_pairs(facet_data, pairs)
+
+            # Save Adjacency
+            if not pack:
+                with open(os.path.join(pot_dir, "adjacency.json"), 'w') as f:
+                    json.dump(adjacency_list, f, indent=4)
+            st.update(facets=len(facet_data), pairs=len(adjacency_list))
+            frame_1 = {name_map[obj.name]: obj.matrix_world.copy() for obj in shards}
 
         # --- C. Export Point Clouds (Scattered Frame) ---
         bpy.context.scene.frame_set(current_frame)
         bpy.context.view_layer.update()
 
-        for obj in shards:
-            bm = bmesh.new()
-            bm.from_mesh(obj.data)
-            bm.transform(obj.matrix_world)
-            bvh = BVHTree.FromBMesh(bm)
-            bm.faces.ensure_lookup_table()
-            
-            total_area = sum(f.calc_area() for f in bm.faces)
-            point_cloud = []
-            
-            for _ in range(num_points):
-                r = random.uniform(0, total_area)
-                acc = 0
-                target_face = bm.faces[0]
-                for f in bm.faces:
-                    acc += f.calc_area()
-                    if acc >= r:
-                        target_face = f
-                        break
-                
-                v_coords = [v.co for v in target_face.verts]
-                if len(v_coords) >= 3:
-                    u, v_w = random.random(), random.random()
-                    if u + v_w > 1: u, v_w = 1 - u, 1 - v_w
-                    w = 1 - u - v_w
-                    p = u * v_coords[0] + v_w * v_coords[1] + w * v_coords[2]
-                else:
-                    p = target_face.calc_center_bounds()
-                
-                _, normal, face_idx, _ = bvh.find_nearest(p)
-                orig_face = bm.faces[face_idx]
-                mat = obj.data.materials[orig_face.material_index]
-                
-                label = 0
-                if mat and "RECON_V6_" in mat.name:
-                    label = mat_to_id.get((obj.name, mat.name), 0)
-                
-                point_cloud.append({
-                    'pos': [p.x, p.y, p.z],
-                    'norm': [normal.x, normal.y, normal.z],
-                    'label': label
-                })
-            
+        # Assembled vs exported pose of every shard (ground truth for facet_icp / reassembly)
+        poses = {name_map[obj.name]: facet_icp.pose_entry(frame_1[name_map[obj.name]], obj.matrix_world)
+                 for obj in shards}
+        if not pack:
+            facet_icp.save_poses(pot_dir, poses)
+
+        pot_samples = {}
+        with production_stats.stage("points", shards=len(shards), workers=workers) as st:
             # Use NEW Name for filename
-            new_filename = name_map[obj.name]
-            filename = os.path.join(pot_dir, f"{new_filename}.json")
-            with open(filename, 'w') as f:
-                json.dump(point_cloud, f)
-            bm.free()
+            new_names = [name_map[obj.name] for obj in shards]
+            write = None
+            if not pack:
+                write = lambda k, sample: pointcloud_io.write_shard(pot_dir, new_names[k], sample, fmt, meta=meta)
+            # Facet descriptors from the same arrays (frame of the point clouds)
+            described = []
+            prepared = (shard_sampler.prepare_shard(obj, mat_to_id) for obj in shards)
+            results = shard_sampler.sample_prepared_shards(
+                facet_descriptors.describing(prepared, new_names, described), num_points,
+                seeds=[shard_sampler.shard_seed(seed, name) for name in new_names],
+                workers=workers, write=write, method=method, levels=levels)
+
+            for name, (sample, timings, _) in zip(new_names, results):
+                print(shard_sampler.format_timings(name, timings, num_points))
+                st['points'] = st.get('points', 0) + len(sample['pos'])
+                st['extract_seconds'] = st.get('extract_seconds', 0.0) + timings['extract']
+                st['sample_seconds'] = st.get('sample_seconds', 0.0) + timings['sample']
+                if pack:
+                    pot_samples[name] = sample
+
+        with production_stats.stage("descriptors") as st:
+            table = facet_descriptors.facet_table(described, {f['id']: f['nb_name'] for f in facet_data})
+            if not pack:
+                facet_descriptors.save_facets(pot_dir, table)
+            st.update(facets=len(table))
+
+        if pack:
+            pack.add_pot(new_pot_id, pot_samples, adjacency_list, meta, facets=table, poses=poses)
+        production_stats.end_pot("ok", shards=len(shards))
 
+    if pack:
+        pack.close()
+        return f"Export Complete: Packed {len(sorted_pot_ids)} pots into {pack_path}"
     return f"Export Complete: Saved {len(sorted_pot_ids)} pots to {output_dir}"
 
-# Run it
-out_path = r"c:\Users\k4849\Documents\VibeCording\Jomon_Pottery_Reconstruction\dataset_manual_batch_001"
-print(export_training_data(out_path))
+# Run it (guarded so mass_production / headless_factory can import this module)
+if __name__ == "__main__":
+    out_path = r"c:\Users\k4849\Documents\VibeCording\Jomon_Pottery_Reconstruction\dataset_manual_batch_001"
+    print(export_training_data(out_path))
@@ -0,0 +1,219 @@
+import time
+import numpy as np
+
+# Facet collection and pairing shared by the exporters and the visualizer.
+#
+# A facet is a RECON_V6_<neighbour>_<n> material island on a shard. Two facets
+# pair up when each one names the other's shard as neighbour; among those the
+# closest centroid (within max_dist) wins. Facets are bucketed by
+# (obj_name, nb_name) so a facet only looks at the facets of the reverse
+# bucket, and large buckets use a uniform grid over the centroids.
+
+MATCH_DIST_THRESHOLD = 2.0
+GRID_MIN_BUCKET = 16 # Below this a linear scan of the bucket is cheaper
+
+def collect_facets(shards, name_map=None):
+    """Returns (facet_data, mat_to_id) for the RECON_V6_ facets of the shards.
+
+    facet_data entries: {'id', 'obj_name', 'nb_name', 'mat_name', 'pos'} where
+    pos is the world centroid (mean of face centers). If name_map is given,
+    obj/neighbour names are translated and unknown neighbours become "NONE".
+    """
+    from mathutils import Vector
+
+    facet_data = []
+    mat_to_id = {}
+    id_counter = 1
+
+    for obj in shards:
+        mesh = obj.data
+        num_faces = len(mesh.polygons)
+        if num_faces == 0:
+            continue
+
+        centers = np.empty(num_faces * 3, dtype=np.float32)
+        mesh.polygons.foreach_get("center", centers)
+        centers = centers.reshape(-1, 3).astype(np.float64)
+        mat_idx = np.empty(num_faces, dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", mat_idx)
+
+        num_slots = max(len(mesh.materials), int(mat_idx.max()) + 1)
+        counts = np.bincount(mat_idx, minlength=num_slots)
+        sums = np.stack([np.bincount(mat_idx, weights=centers[:, k], minlength=num_slots) for k in range(3)], axis=1)
+
+        for i, mat in enumerate(mesh.materials):
+            if not mat or "RECON_V6_" not in mat.name: continue
+            if counts[i] == 0: continue
+
+            # Material name: RECON_V6_<neighbour shard>_<facet index>
+            core_name = mat.name[9:]
+            nb_name = "_".join(core_name.split('_')[:-1])
+            obj_name = obj.name
+            if name_map is not None:
+                obj_name = name_map[obj.name]
+                nb_name = name_map.get(nb_name, "NONE")
+
+            centroid = Vector(sums[i] / counts[i])
+            world_pos = obj.matrix_world @ centroid
+
+            facet_id = id_counter
+            id_counter += 1
+            mat_to_id[(obj.name, mat.name)] = facet_id
+
+            facet_data.append({
+                'id': facet_id,
+                'obj_name': obj_name,
+                'nb_name': nb_name,
+                'mat_name': mat.name,
+                'pos': world_pos
+            })
+
+    return facet_data, mat_to_id
+
+def _nearest_in_bucket(pos, i, bucket, bucket_pos, grid, max_dist):
+    """Index of the closest facet of `bucket` to `pos` (ties -> lowest index)."""
+    if grid is None:
+        cand = bucket
+        cand_pos = bucket_pos
+    else:
+        cell = np.floor(pos / max_dist).astype(np.int64)
+        rows = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    rows.extend(grid.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), ()))
+        if not rows:
+            return None
+        rows = np.array(sorted(rows))
+        cand = bucket[rows]
+        cand_pos = bucket_pos[rows]
+
+    dist = np.linalg.norm(cand_pos - pos, axis=1)
+    valid = (dist < max_dist) & (cand != i)
+    if not valid.any():
+        return None
+    dist = np.where(valid, dist, np.inf)
+    # argmin returns the first minimum -> same tie rule as the legacy loop
+    return int(cand[np.argmin(dist)])
+
+def pair_facets(facet_data, max_dist=MATCH_DIST_THRESHOLD):
+    """Mutual-neighbour facet pairing.
+
+    Returns a list of (i, j) indices into facet_data, in the order the legacy
+    nested loop produced them, each unordered pair once.
+    """
+    if not facet_data:
+        return []
+    positions = np.array([tuple(f['pos']) for f in facet_data], dtype=np.float64)
+
+    buckets = {}
+    for idx, f in enumerate(facet_data):
+        buckets.setdefault((f['obj_name'], f['nb_name']), []).append(idx)
+
+    # Per bucket: index array, positions and (for big buckets) a cell -> rows grid
+    bucket_index = {}
+    for key, members in buckets.items():
+        members = np.array(members)
+        grid = None
+        if len(members) >= GRID_MIN_BUCKET:
+            grid = {}
+            cells = np.floor(positions[members] / max_dist).astype(np.int64)
+            for row, cell in enumerate(map(tuple, cells)):
+                grid.setdefault(cell, []).append(row)
+        bucket_index[key] = (members, positions[members], grid)
+
+    pairs = []
+    seen = set()
+    for i, f1 in enumerate(facet_data):
+        if f1['nb_name'] == "NONE": continue
+        entry = bucket_index.get((f1['nb_name'], f1['obj_name']))
+        if entry is None: continue
+
+        best = _nearest_in_bucket(positions[i], i, entry[0], entry[1], entry[2], max_dist)
+        if best is None: continue
+
+        key = (min(i, best), max(i, best))
+        if key not in seen:
+            seen.add(key)
+            pairs.append((i, best))
+    return pairs
+
+def adjacency_from_pairs(facet_data, pairs):
+    """adjacency.json layout: list of sorted [facet_id, facet_id]."""
+    return [sorted([facet_data[i]['id'], facet_data[j]['id']]) for i, j in pairs]
+
+# --- Reference implementation & benchmark ---
+
+def legacy_pair_facets(facet_data, max_dist=MATCH_DIST_THRESHOLD):
+    """The original O(F^2) loop, kept for benchmarking and cross-checking."""
+    positions = [np.asarray(tuple(f['pos']), dtype=np.float64) for f in facet_data]
+    pairs = []
+    seen = set()
+    for i, f1 in enumerate(facet_data):
+        if f1['nb_name'] == "NONE": continue
+        best = None
+        min_d = 1000.0
+        for j, f2 in enumerate(facet_data):
+            if i == j: continue
+            if f1['nb_name'] == f2['obj_name'] and f2['nb_name'] == f1['obj_name']:
+                d = float(np.linalg.norm(positions[i] - positions[j]))
+                if d < max_dist and d < min_d:
+                    min_d = d
+                    best = j
+        if best is not None:
+            key = (min(i, best), max(i, best))
+            if key not in seen:
+                seen.add(key)
+                pairs.append((i, best))
+    return pairs
+
+def make_synthetic_facets(num_shards=60, neighbours=6, facets_per_contact=2, seed=0):
+    """Random facet_data resembling a fractured pot (for benchmarks)."""
+    rng = np.random.default_rng(seed)
+    names = [f"Pot_001_cell.{k:03d}" for k in range(num_shards)]
+    centers = rng.normal(scale=0.15, size=(num_shards, 3))
+
+    facet_data = []
+    for a in range(num_shards):
+        nbs = np.argsort(np.linalg.norm(centers - centers[a], axis=1))[1:neighbours + 1]
+        for b in nbs:
+            for _ in range(facets_per_contact):
+                pos = (centers[a] + centers[b]) * 0.5 + rng.normal(scale=0.01, size=3)
+                facet_data.append({'obj_name': names[a], 'nb_name': names[b], 'pos': pos})
+        facet_data.append({'obj_name': names[a], 'nb_name': "NONE", 'pos': centers[a]})
+
+    for k, f in enumerate(facet_data):
+        f['id'] = k + 1
+        f['mat_name'] = f"RECON_V6_{f['nb_name']}_{k}"
+    return facet_data
+
+def benchmark_pairing(shard_counts=(10, 60, 250), repeats=3):
+    """Times pair_facets against legacy_pair_facets and checks identical output."""
+    results = []
+    for num_shards in shard_counts:
+        facet_data = make_synthetic_facets(num_shards)
+
+        def best_time(fn):
+            best = float('inf')
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                out = fn(facet_data)
+                best = min(best, time.perf_counter() - t0)
+            return best, out
+
+        t_legacy, legacy = best_time(legacy_pair_facets)
+        t_fast, fast = best_time(pair_facets)
+        results.append({
+            'shards': num_shards,
+            'facets': len(facet_data),
+            'legacy_s': t_legacy,
+            'indexed_s': t_fast,
+            'speedup': t_legacy / max(t_fast, 1e-12),
+            'identical': adjacency_from_pairs(facet_data, legacy) == adjacency_from_pairs(facet_data, fast),
+        })
+    return results
+
+if __name__ == "__main__":
+    for r in benchmark_pairing():
+        print(f"{r['shards']:4d} shards / {r['facets']:5d} facets: legacy {r['legacy_s'] * 1000:9.1f} ms, "
+              f"indexed {r['indexed_s'] * 1000:7.1f} ms (x{r['speedup']:.0f}), identical={r['identical']}")
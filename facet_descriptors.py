@@ -0,0 +1,192 @@
+import io
+import os
+import numpy as np
+
+# Per-facet geometric descriptors ("fingerprints", reconstruction_plan.md phase 2).
+#
+# Computed from the same triangle arrays the sampler uses (shard_sampler.
+# extract_shard_arrays + material_label_table), so the exporters get them
+# without another pass over Blender data. Everything is exact on the mesh
+# (area-weighted triangle moments), grouped per facet with bincount.
+#
+# One table per pot, <Pot_XXX>/facets.npy: a structured array sorted by
+# facet id (the ids of adjacency.json and of the point labels):
+#
+#   id              int32      facet id
+#   shard, neighbour str       shard owning the facet, shard it faces ("NONE" if unknown)
+#   faces           int32      triangles of the facet
+#   area            float64    m^2
+#   centroid        float64[3] area-weighted centroid (world, export frame)
+#   normal          float64[3] area-weighted mean normal (unit)
+#   planarity       float64    |sum of area vectors| / area (1 = flat)
+#   eigenvalues     float64[3] covariance of the surface, descending
+#   axes            float64[3,3] matching eigenvectors as columns (right-handed)
+#   boundary_length float64    m, edges shared with other facets / the surface
+#   radial_hist     float32[8] area share by distance to the centroid / sqrt(area), 0..2
+#   height_hist     float32[9] area share by height over the facet plane / sqrt(area), -0.25..0.25
+#                              (odd bin count: a flat facet fills the middle bin, mirroring is exact)
+#
+# np.load(path) reads it back without pickle.
+
+FACETS_NAME = "facets.npy"
+HIST_BINS = 8
+HEIGHT_BINS = 9
+RADIAL_RANGE = 2.0
+HEIGHT_RANGE = 0.25
+NAME_LENGTH = 64
+
+FACET_DTYPE = np.dtype([
+    ('id', '<i4'),
+    ('shard', f'<U{NAME_LENGTH}'),
+    ('neighbour', f'<U{NAME_LENGTH}'),
+    ('faces', '<i4'),
+    ('area', '<f8'),
+    ('centroid', '<f8', (3,)),
+    ('normal', '<f8', (3,)),
+    ('planarity', '<f8'),
+    ('eigenvalues', '<f8', (3,)),
+    ('axes', '<f8', (3, 3)),
+    ('boundary_length', '<f8'),
+    ('radial_hist', '<f4', (HIST_BINS,)),
+    ('height_hist', '<f4', (HEIGHT_BINS,)),
+])
+
+def _histograms(values, slot, weights, lo, hi, num_slots, num_bins=HIST_BINS):
+    """Per-slot weighted histograms [num_slots, num_bins] over [lo, hi] (outliers in the end bins)."""
+    bins = np.clip(np.floor((values - lo) / (hi - lo) * num_bins).astype(np.int64), 0, num_bins - 1)
+    hist = np.bincount(slot * num_bins + bins, weights=weights, minlength=num_slots * num_bins)
+    return hist.reshape(num_slots, num_bins)
+
+def _boundary_length(co, tris, slot, num_slots):
+    """Length of the edges that appear once among a slot's triangles (diagonals cancel)."""
+    edges = np.concatenate([tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]]])
+    edges = np.sort(edges, axis=1)
+    edge_slot = np.tile(slot, 3)
+    keys = np.stack([edge_slot, edges[:, 0], edges[:, 1]], axis=1)
+    _, first, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+    once = first[counts == 1]
+    length = np.linalg.norm(co[edges[once, 0]] - co[edges[once, 1]], axis=1)
+    return np.bincount(edge_slot[once], weights=length, minlength=num_slots)
+
+def describe_facets(co, tris, slot, num_slots):
+    """Descriptor arrays for triangle groups: slot[t] in [0, num_slots) per triangle.
+
+    Returns a dict of per-slot arrays (FACET_DTYPE fields except id/names).
+    """
+    a = co[tris[:, 0]]
+    b = co[tris[:, 1]]
+    c = co[tris[:, 2]]
+    area_vec = 0.5 * np.cross(b - a, c - a)
+    area = np.linalg.norm(area_vec, axis=1)
+    g = (a + b + c) / 3
+
+    sum_area = np.bincount(slot, weights=area, minlength=num_slots)
+    safe_area = np.where(sum_area > 0, sum_area, 1.0)
+    centroid = np.stack([np.bincount(slot, weights=area * g[:, k], minlength=num_slots) for k in range(3)], axis=1)
+    centroid /= safe_area[:, None]
+    normal_sum = np.stack([np.bincount(slot, weights=area_vec[:, k], minlength=num_slots) for k in range(3)], axis=1)
+    normal_len = np.linalg.norm(normal_sum, axis=1)
+    normal = normal_sum / np.where(normal_len > 0, normal_len, 1.0)[:, None]
+
+    # Exact second moment of a triangle: area/12 * (sum v v^T + 9 g g^T)
+    outer = lambda v: v[:, :, None] * v[:, None, :]
+    tri_moment = (area / 12)[:, None, None] * (outer(a) + outer(b) + outer(c) + 9 * outer(g))
+    moment = np.zeros((num_slots, 9))
+    for k in range(9):
+        moment[:, k] = np.bincount(slot, weights=tri_moment.reshape(-1, 9)[:, k], minlength=num_slots)
+    cov = moment.reshape(-1, 3, 3) / safe_area[:, None, None] - outer(centroid)
+    eigenvalues, axes = np.linalg.eigh(cov)
+    eigenvalues = np.clip(eigenvalues[:, ::-1], 0, None)
+    axes = axes[:, :, ::-1]
+    # Deterministic signs: largest component of the first two axes positive, third = cross
+    for k in range(2):
+        col = axes[:, :, k]
+        flip = np.take_along_axis(col, np.abs(col).argmax(axis=1)[:, None], axis=1)[:, 0] < 0
+        col[flip] *= -1
+    axes[:, :, 2] = np.cross(axes[:, :, 0], axes[:, :, 1])
+
+    scale = np.sqrt(safe_area)[slot]
+    radius = np.linalg.norm(g - centroid[slot], axis=1) / scale
+    height = ((g - centroid[slot]) * normal[slot]).sum(axis=1) / scale
+    weight = area / safe_area[slot]
+
+    return {
+        'faces': np.bincount(slot, minlength=num_slots),
+        'area': sum_area,
+        'centroid': centroid,
+        'normal': normal,
+        'planarity': normal_len / safe_area,
+        'eigenvalues': eigenvalues,
+        'axes': axes,
+        'boundary_length': _boundary_length(co, tris, slot, num_slots),
+        'radial_hist': _histograms(radius, slot, weight, 0.0, RADIAL_RANGE, num_slots),
+        'height_hist': _histograms(height, slot, weight, -HEIGHT_RANGE, HEIGHT_RANGE, num_slots, HEIGHT_BINS),
+    }
+
+def shard_descriptors(arrays, label_table):
+    """Descriptors of the facets of one shard (shard_sampler arrays + label table).
+
+    Returns (facet ids, describe_facets() dict); label 0 (original surface) is skipped.
+    """
+    mat_idx = np.clip(arrays['material_index'], 0, len(label_table) - 1)
+    labels = label_table[mat_idx]
+    inner = labels > 0
+    ids, slot = np.unique(labels[inner], return_inverse=True)
+    return ids, describe_facets(arrays['co'], arrays['tris'][inner], slot.reshape(-1), len(ids))
+
+def describing(prepared, names, out):
+    """Passes prepare_shard() results through, appending (name, ids, descriptors) to out.
+
+    Lets the exporters describe facets from the arrays the sampler extracts anyway:
+    sample_prepared_shards(describing(prepared, names, out), ...).
+    """
+    for name, (arrays, label_table, t_extract) in zip(names, prepared):
+        out.append((name, *shard_descriptors(arrays, label_table)))
+        yield arrays, label_table, t_extract
+
+def facet_table(shard_results, neighbours=None):
+    """Structured FACET_DTYPE table sorted by id.
+
+    shard_results: [(shard name, ids, descriptors)]; neighbours: facet id -> neighbour shard name.
+    """
+    neighbours = neighbours or {}
+    total = sum(len(ids) for _, ids, _ in shard_results)
+    table = np.zeros(total, dtype=FACET_DTYPE)
+    row = 0
+    for shard_name, ids, desc in shard_results:
+        rows = slice(row, row + len(ids))
+        table['id'][rows] = ids
+        table['shard'][rows] = shard_name
+        table['neighbour'][rows] = [neighbours.get(int(i), "NONE") for i in ids]
+        for key, values in desc.items():
+            table[key][rows] = values
+        row += len(ids)
+    return table[np.argsort(table['id'], kind='stable')]
+
+def table_to_bytes(table):
+    buffer = io.BytesIO()
+    np.save(buffer, table, allow_pickle=False)
+    return buffer.getvalue()
+
+def table_from_bytes(data):
+    return np.load(io.BytesIO(bytes(data)), allow_pickle=False)
+
+def save_facets(folder, table, fsync=False):
+    """Writes <folder>/facets.npy. Returns the path."""
+    path = os.path.join(folder, FACETS_NAME)
+    with open(path, 'wb') as f:
+        f.write(table_to_bytes(table))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return path
+
+def load_facets(folder):
+    return np.load(os.path.join(folder, FACETS_NAME), allow_pickle=False)
+
+def lookup(table, facet_id):
+    """Row of facet_id (table sorted by id), or None."""
+    k = np.searchsorted(table['id'], facet_id)
+    if k < len(table) and table['id'][k] == facet_id:
+        return table[k]
+    return None
@@ -0,0 +1,488 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+import kdtree
+import facet_descriptors
+
+# Rigid registration of matched facet pairs ("snap shard B onto A",
+# reconstruction_plan.md phase 4 / pose estimation in ai_training_plan.md).
+#
+# Point-to-plane ICP, batched over many pairs: the target facets' points are
+# centred and laid out side by side along x in ONE k-d tree (each facet once,
+# however many pairs and start poses register onto it), so a single
+# query per iteration finds the correspondences of every pair (the last
+# matches are passed as hints, which makes the re-query cheap). Each pair then
+# solves its damped 6x6 point-to-plane system; the rotation update is
+# projected back onto SO(3) with an SVD. Pairs stop on their own once the
+# update is below `tolerance`, the others keep iterating.
+#
+# Correspondences are rejected when farther than the pair's adaptive distance
+# gate (3x the median match distance, shrinking) or when the normals do not
+# face each other (partner facets have opposite normals).
+#
+# Start poses come from the facet descriptors (centroids and PCA frames put
+# face to face). The main axis has no sign, so each pair starts from SPINS
+# poses spun about the normal (ROUND_SPINS for near-round facets); all of
+# them get COARSE_ITERATIONS on COARSE_POINTS source points, then only the
+# best scoring one per pair is refined to the end.
+#
+# Flat facets leave the in-plane DOFs open to point-to-plane (a rectangle
+# spun by 180 degrees matches just as well), so each facet also brings its
+# context: the original surface (label 0) points within a facet radius of it.
+# Around every target context point a quadric is fitted to its neighbours; the
+# source's context points must land on A's surface extrapolated across the
+# crack (point-to-plane on the quadric). A wall's curvature flips sign under
+# the wrong spin, which the context residual sees even when the cut is planar.
+# It divides the hypothesis score after the coarse phase, so it decides between
+# the spins (and the ambiguity), and joins the final refinement with a small
+# weight (the walls alone would let a horizontal cut slide around the pot's
+# axis). Facets without context fall back to the facet term alone.
+#
+# Transforms map facet B (source) onto facet A (target) in the coordinates
+# the point clouds were exported in. Ground truth comes from poses.json:
+#
+#   {"<shard>": {"frame_1": 4x4, "export": 4x4}}   matrix_world at frame 1 (assembled)
+#                                                  and at the export frame
+#
+#   python facet_icp.py <dataset root or .jpak>    (errors vs poses.json over adjacency.json pairs)
+
+POSES_NAME = "poses.json"
+ICP_POINTS = 64          # Source points per facet (resampled)
+TARGET_POINTS = 256      # Target points per facet (in the tree)
+MAX_ITERATIONS = 16
+COARSE_ITERATIONS = 8    # Iterations every start hypothesis gets before only the best one goes on
+COARSE_POINTS = 32       # ... on this many of the source (and source context) points
+SPINS = 2                # Start hypotheses per pair (rotations about the facet normal)
+ROUND_SPINS = 4          # ... for near-round facets, whose main axis is unreliable
+ROUND_RATIO = 0.6        # Second / main axis extent above which a facet counts as round
+TOLERANCE = 1e-5         # Rotation (rad) + translation / facet radius per iteration
+DAMPING = 1e-3           # Levenberg damping, relative to the system's trace (flat facets leave DOFs free)
+GATE_FACTOR = 3.0        # Distance gate = GATE_FACTOR * median match distance
+MIN_GATE = 0.01          # ... but never below MIN_GATE * facet radius
+NORMAL_COS = -0.5        # Matches need dot(normal_b, normal_a) below this
+MIN_MATCHES = 6
+RESIDUAL_SCALE = 0.001   # Residual (m) that halves a pair's score
+CONTEXT_POINTS = 64      # Source surface points next to the facet (resampled)
+CONTEXT_TARGET_POINTS = 64 # ... and target ones (each gets a quadric from its neighbours)
+CONTEXT_REACH = 1.0      # ... within CONTEXT_REACH * facet radius of the facet's points
+CONTEXT_PROBES = 64      # Facet points the reach is measured from
+QUADRIC_NEIGHBOURS = 24  # Target context points per local quadric fit
+CONTEXT_COS = 0.5        # Context matches need dot(normal_b, normal_a) above this
+CONTEXT_CAP = 0.005      # Context residuals (m) are truncated here; unmatched points count as the cap
+CONTEXT_SCALE = 0.001    # Context RMS residual (m) that halves a pair's score
+CONTEXT_WEIGHT = 0.1     # Weight of the context rows in the final refinement (walls alone leave slides open)
+
+def facet_cloud(sample, facet_id, count, rng):
+    """(pos, norm) [count, 3] of one facet's points, resampled (None if it has no points)."""
+    rows = np.flatnonzero(np.asarray(sample['label']) == facet_id)
+    if len(rows) == 0:
+        return None
+    rows = rng.choice(rows, count, replace=len(rows) < count)
+    return (np.asarray(sample['pos'], dtype=np.float64)[rows],
+            np.asarray(sample['norm'], dtype=np.float64)[rows])
+
+def surface_points(sample):
+    """(pos, norm) [S,3] of a cloud's original surface (label 0) points."""
+    rows = np.flatnonzero(np.asarray(sample['label']) == 0)
+    return (np.asarray(sample['pos'], dtype=np.float64)[rows],
+            np.asarray(sample['norm'], dtype=np.float64)[rows])
+
+def context_cloud(surface, facet_pos, reach, count, rng):
+    """(pos, norm) [count, 3] of the surface points (surface_points) within `reach`
+    of the facet points facet_pos, resampled (None if fewer than MIN_MATCHES)."""
+    pos, norm = surface
+    probe = facet_pos[::max(1, len(facet_pos) // CONTEXT_PROBES)]
+    d2 = (pos ** 2).sum(axis=1)[:, None] - 2 * pos @ probe.T + (probe ** 2).sum(axis=1)[None, :]
+    rows = np.flatnonzero(d2.min(axis=1) <= reach * reach)
+    if len(rows) < MIN_MATCHES:
+        return None
+    rows = rng.choice(rows, count, replace=len(rows) < count)
+    return pos[rows], norm[rows]
+
+def _facet_frame(row):
+    """Orthonormal frame (columns: main axis, second axis, normal) of a facet descriptor row."""
+    n = row['normal'] / max(np.linalg.norm(row['normal']), 1e-12)
+    e1 = row['axes'][:, 0] - np.dot(row['axes'][:, 0], n) * n
+    e1 /= max(np.linalg.norm(e1), 1e-12)
+    return np.column_stack([e1, np.cross(n, e1), n])
+
+def descriptor_hypotheses(row_a, row_b, spins=SPINS):
+    """Initial poses of B onto A from their descriptors: (R [spins,3,3], t [spins,3]).
+
+    B's frame is turned onto A's frame flipped upside down (normals facing);
+    the sign of the main axis is unknown, so B is also tried spun about the
+    normal (spins=2: both signs, more for near-round facets).
+    """
+    frame_a = _facet_frame(row_a)
+    frame_b = _facet_frame(row_b)
+    # A's frame upside down (normals facing), spun about the normal
+    angles = 2 * np.pi * np.arange(spins) / spins
+    c, s = np.cos(angles), np.sin(angles)
+    spin = np.zeros((spins, 3, 3))
+    spin[:, 0, 0], spin[:, 0, 1], spin[:, 1, 0], spin[:, 1, 1], spin[:, 2, 2] = c, -s, s, c, 1.0
+    rotations = (frame_a * np.array([1.0, -1.0, -1.0])) @ spin @ frame_b.T
+    translations = row_a['centroid'] - rotations @ row_b['centroid']
+    return rotations, translations
+
+def _project_rotation(m):
+    """Closest rotations to [P,3,3] matrices (SVD, no reflections)."""
+    u, _, vt = np.linalg.svd(m)
+    d = np.sign(np.linalg.det(u @ vt))
+    u[:, :, 2] *= d[:, None]
+    return u @ vt
+
+def _skew(w):
+    z = np.zeros(len(w))
+    return np.stack([np.stack([z, -w[:, 2], w[:, 1]], axis=1),
+                     np.stack([w[:, 2], z, -w[:, 0]], axis=1),
+                     np.stack([-w[:, 1], w[:, 0], z], axis=1)], axis=1)
+
+def surface_quadrics(points, normals, neighbours=QUADRIC_NEIGHBOURS):
+    """Local quadric height field around every point of [P,N,3] clouds (neighbours within each cloud).
+
+    Returns (frames [P,N,3,3] rows t1, t2, n; coefficients [P,N,6] of h/s over
+    1, u, v, u^2, uv, v^2 with u, v in units of s; s [P,N] the patch size).
+    Neighbours whose normal turns away (the other wall) are left out of the fit.
+    """
+    n = normals / np.maximum(np.linalg.norm(normals, axis=2, keepdims=True), 1e-12)
+    helper = np.where((np.abs(n[..., 0]) < 0.9)[..., None], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+    t1 = np.cross(n, helper)
+    t1 /= np.linalg.norm(t1, axis=2, keepdims=True)
+    frames = np.stack([t1, np.cross(n, t1), n], axis=2)
+
+    # Clouds are small: brute-force k nearest inside each one
+    d2 = ((points[:, :, None, :] - points[:, None, :, :]) ** 2).sum(axis=3)
+    k = min(neighbours, points.shape[1])
+    idx = np.argpartition(d2, k - 1, axis=2)[:, :, :k]
+    take = lambda a: np.take_along_axis(a[:, None, :, :], idx[..., None], axis=2)
+    local = np.einsum('pnij,pnmj->pnmi', frames, take(points) - points[:, :, None, :])
+    use = (take(n) * n[:, :, None, :]).sum(axis=3) > 0.8
+    s = np.maximum(np.sqrt(np.where(use, (local[..., :2] ** 2).sum(axis=3), 0).max(axis=2)), 1e-9)
+    u, v, h = np.moveaxis(local / s[..., None, None], 3, 0)
+    design = np.stack([np.ones_like(u), u, v, u * u, u * v, v * v], axis=3) * use[..., None]
+    a = np.einsum('pnmi,pnmj->pnij', design, design) + 1e-6 * np.eye(6)
+    coefficients = np.linalg.solve(a, np.einsum('pnmi,pnm->pni', design, h)[..., None])[..., 0]
+    return frames, coefficients, s
+
+def refine(src_pos, src_norm, dst_pos, dst_norm, rotations, translations,
+           max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE, src_context=None, dst_context=None,
+           context_weight=CONTEXT_WEIGHT, target=None):
+    """Batched point-to-plane ICP of P problems (source B onto target A).
+
+    src_*: [P,M,3], dst_*: [T,N,3] (world), rotations [P,3,3] / translations [P,3]: start poses.
+    src_context: (pos, norm [P,Mc,3], valid [P,Mc]) surface points next to B,
+    dst_context: (pos, norm [T,Nc,3]) next to A (see module comment), if any.
+    context_weight: weight of the context rows in the ICP system (0 = only scored after the last iteration).
+    target: [P] row of dst_* each problem registers onto (default: its own row,
+    T = P); problems sharing a target share its tree entries and quadrics.
+    Returns {'transforms' [P,4,4], 'residual' [P] RMS point-to-plane distance,
+    'inliers' [P] share of matched source points, 'context' [P] truncated RMS
+    context residual (0 without context), 'iterations' [P], 'converged' [P]}.
+    """
+    num, m, _ = src_pos.shape
+    target = np.arange(num) if target is None else np.asarray(target)
+    rot = np.array(rotations, dtype=np.float64)
+    trans = np.array(translations, dtype=np.float64)
+
+    # Targets centred and spaced along x, wide enough that no match can cross pairs
+    dst_center = dst_pos.mean(axis=1)
+    local = dst_pos - dst_center[:, None, :]
+    dst_radius = np.maximum(np.sqrt((local ** 2).sum(axis=2).mean(axis=1)), 1e-9)
+    spacing = 4.0 * float(np.max(np.abs(local))) + 8.0 * float(dst_radius.max())
+    dst_offset = np.zeros((len(dst_pos), 3))
+    dst_offset[:, 0] = np.arange(len(dst_pos)) * spacing
+    tree = kdtree.KDTree((local + dst_offset[:, None, :]).reshape(-1, 3))
+    center, radius, offset = dst_center[target], dst_radius[target], dst_offset[target]
+    gate = 2.0 * radius
+    flat_norm = dst_norm.reshape(-1, 3)
+
+    # Target context in the same layout, with its local quadrics
+    ctx = np.zeros(num)
+    if src_context is not None:
+        ctx_pos, ctx_norm, ctx_valid = src_context
+        mc = ctx_pos.shape[1]
+        ctx_local = dst_context[0] - dst_center[:, None, :]
+        ctx_points = (ctx_local + dst_offset[:, None, :]).reshape(-1, 3)
+        ctx_tree = kdtree.KDTree(ctx_points)
+        ctx_frames, ctx_coef, ctx_size = (a.reshape((-1,) + a.shape[2:])
+                                          for a in surface_quadrics(dst_context[0], dst_context[1]))
+        ctx_local = ctx_local.reshape(-1, 3)
+        ctx_gate = 2.0 * CONTEXT_REACH * radius
+        ctx_hint = np.full((num, mc), -1, dtype=np.int64)
+
+    active = np.ones(num, dtype=bool)
+    iterations = np.zeros(num, dtype=np.int64)
+    hint = np.full((num, m), -1, dtype=np.int64)
+    residual = np.full(num, np.inf)
+    inliers = np.zeros(num)
+
+    for it in range(max_iterations + 1):
+        # Last pass (iteration budget spent or every problem converged): evaluate all of them
+        last = it == max_iterations or not active.any()
+        rows = np.arange(num) if last else np.flatnonzero(active)
+        # Current source points in the target's centred frame
+        p = np.einsum('pij,pmj->pmi', rot[rows], src_pos[rows]) + (trans[rows] - center[rows])[:, None, :]
+        pn = np.einsum('pij,pmj->pmi', rot[rows], src_norm[rows])
+        dist, idx = tree.query((p + offset[rows][:, None, :]).reshape(-1, 3), 1,
+                               distance_upper_bound=np.repeat(gate[rows], m), hint=hint[rows].reshape(-1))
+        dist = dist[:, 0].reshape(len(rows), m)
+        idx = idx[:, 0].reshape(len(rows), m)
+        hint[rows] = idx
+
+        q = local.reshape(-1, 3)[np.maximum(idx, 0)]
+        qn = flat_norm[np.maximum(idx, 0)]
+        ok = (idx >= 0) & (dist <= gate[rows][:, None]) & ((pn * qn).sum(axis=2) < NORMAL_COS)
+        r = ((p - q) * qn).sum(axis=2)
+        count = ok.sum(axis=1)
+        residual[rows] = np.sqrt((np.where(ok, r * r, 0).sum(axis=1)) / np.maximum(count, 1))
+        inliers[rows] = count / m
+        use_context = src_context is not None and (context_weight > 0 or last)
+        if use_context:
+            c_ok, c_p, c_n, c_r = _context_residuals(rows, rot, trans, center, offset, ctx_pos, ctx_norm,
+                                                    ctx_valid, ctx_tree, ctx_local, ctx_frames, ctx_coef,
+                                                    ctx_size, ctx_gate, ctx_hint)
+            truncated = np.where(c_ok, np.minimum(np.abs(c_r), CONTEXT_CAP), CONTEXT_CAP)
+            valid = ctx_valid[rows]
+            ctx[rows] = np.sqrt((np.where(valid, truncated ** 2, 0).sum(axis=1)) / np.maximum(valid.sum(axis=1), 1))
+            c_ok &= np.abs(c_r) < CONTEXT_CAP
+        if last:
+            break
+
+        # Gate for the next round: GATE_FACTOR * median match distance, only shrinking
+        ranked = np.sort(np.where(ok, dist, np.inf), axis=1)
+        med = np.take_along_axis(ranked, np.maximum(count - 1, 0)[:, None] // 2, axis=1)[:, 0]
+        gate[rows] = np.clip(GATE_FACTOR * med, MIN_GATE * radius[rows], gate[rows])
+
+        # Damped Gauss-Newton step in units of the facet radius
+        s = radius[rows][:, None, None]
+        jac = np.concatenate([np.cross(p / s, qn), qn], axis=2) * ok[:, :, None]
+        res = r / s[:, :, 0]
+        if use_context and context_weight > 0:
+            c_jac = np.concatenate([np.cross(c_p / s, c_n), c_n], axis=2) * (context_weight * c_ok)[:, :, None]
+            jac = np.concatenate([jac, c_jac], axis=1)
+            res = np.concatenate([res, np.where(c_ok, context_weight * c_r, 0) / s[:, :, 0]], axis=1)
+        h = np.einsum('pmi,pmj->pij', jac, jac)
+        g = np.einsum('pmi,pm->pi', jac, res)
+        h += (DAMPING * np.trace(h, axis1=1, axis2=2) / 6 + 1e-12)[:, None, None] * np.eye(6)
+        step = -np.linalg.solve(h, g[:, :, None])[:, :, 0]
+        step[count < MIN_MATCHES] = 0
+        w, v = step[:, :3], step[:, 3:] * s[:, :, 0]
+
+        delta = _project_rotation(np.eye(3) + _skew(w))
+        rot[rows] = delta @ rot[rows]
+        c = center[rows]
+        trans[rows] = np.einsum('pij,pj->pi', delta, trans[rows] - c) + c + v
+        iterations[rows] += 1
+
+        done = (np.linalg.norm(w, axis=1) + np.linalg.norm(v, axis=1) / radius[rows] < tolerance) | (count < MIN_MATCHES)
+        active[rows[done]] = False
+
+    transforms = np.tile(np.eye(4), (num, 1, 1))
+    transforms[:, :3, :3] = rot
+    transforms[:, :3, 3] = trans
+    return {'transforms': transforms, 'residual': residual, 'inliers': inliers, 'context': ctx,
+            'iterations': iterations, 'converged': ~active}
+
+def _context_residuals(rows, rot, trans, center, offset, ctx_pos, ctx_norm, ctx_valid,
+                       tree, local, frames, coef, size, gate, hint):
+    """Source context of the `rows` problems against the target's extrapolated surface.
+
+    Returns (ok, points in the target's centred frame, quadric normals, signed distances), all [R,Mc(,3)].
+    """
+    mc = ctx_pos.shape[1]
+    p = np.einsum('pij,pmj->pmi', rot[rows], ctx_pos[rows]) + (trans[rows] - center[rows])[:, None, :]
+    pn = np.einsum('pij,pmj->pmi', rot[rows], ctx_norm[rows])
+    dist, idx = tree.query((p + offset[rows][:, None, :]).reshape(-1, 3), 1,
+                           distance_upper_bound=np.repeat(gate[rows], mc), hint=hint[rows].reshape(-1))
+    idx = idx[:, 0].reshape(len(rows), mc)
+    hint[rows] = idx
+    j = np.maximum(idx, 0)
+    frame = frames[j]
+    d = np.einsum('pmij,pmj->pmi', frame, p - local[j]) / size[j][:, :, None]
+    u, v, hgt = d[..., 0], d[..., 1], d[..., 2]
+    c = coef[j]
+    f = c[..., 0] + c[..., 1] * u + c[..., 2] * v + c[..., 3] * u * u + c[..., 4] * u * v + c[..., 5] * v * v
+    fu = c[..., 1] + 2 * c[..., 3] * u + c[..., 4] * v
+    fv = c[..., 2] + c[..., 4] * u + 2 * c[..., 5] * v
+    slope = np.sqrt(1 + fu * fu + fv * fv)
+    normal = (frame[..., 2, :] - fu[..., None] * frame[..., 0, :] - fv[..., None] * frame[..., 1, :]) / slope[..., None]
+    r = (hgt - f) * size[j] / slope
+    ok = (idx >= 0) & ctx_valid[rows] & ((pn * frame[..., 2, :]).sum(axis=2) > CONTEXT_COS)
+    return ok, p, normal, r
+
+def pair_score(result):
+    """Higher is better: share of matched points, penalised by the residual and the context residual."""
+    return (result['inliers'] / (1.0 + result['residual'] / RESIDUAL_SCALE)
+            / (1.0 + result.get('context', 0.0) / CONTEXT_SCALE))
+
+def register_pairs(table, samples, pairs, seed=0, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """Best pose of facet B onto facet A for every (id_a, id_b) pair.
+
+    table: facet_descriptors table; samples: shard name -> point cloud (labels = facet ids).
+    All start poses of all pairs are refined in one batch, after COARSE_ITERATIONS only the best goes on.
+    Returns dict like refine() per pair, plus 'score' and 'ambiguity' (runner-up
+    hypothesis score / best after the coarse phase; near 1 = the facet cannot
+    tell its start poses apart). Pairs whose facets have no points get identity
+    transforms and inf residual.
+    """
+    rng = np.random.default_rng(seed)
+    surfaces, facets = {}, {}
+    def facet(facet_id, shard, count, context_count):
+        # Resampled points and context of a facet, once per facet and point count
+        key = (facet_id, count)
+        if key not in facets:
+            if shard not in surfaces:
+                surfaces[shard] = surface_points(samples[shard])
+            cloud = facet_cloud(samples[shard], facet_id, count, rng)
+            near = None
+            if cloud is not None:
+                radius = np.sqrt(((cloud[0] - cloud[0].mean(axis=0)) ** 2).sum(axis=1).mean())
+                near = context_cloud(surfaces[shard], cloud[0], CONTEXT_REACH * radius, context_count, rng)
+            facets[key] = (cloud, near)
+        return facets[key]
+
+    problems = []   # (pair index, src, target slot, R, t, src context, src context valid)
+    targets = {}    # target facet id -> slot in dst
+    dst = []        # (points, context) per target facet
+    for k, (id_a, id_b) in enumerate(pairs):
+        row_a = facet_descriptors.lookup(table, id_a)
+        row_b = facet_descriptors.lookup(table, id_b)
+        if row_a is None or row_b is None: continue
+        dst_cloud, dst_context = facet(id_a, str(row_a['shard']), TARGET_POINTS, CONTEXT_TARGET_POINTS)
+        src, src_context = facet(id_b, str(row_b['shard']), ICP_POINTS, CONTEXT_POINTS)
+        if dst_cloud is None or src is None: continue
+        if id_a not in targets:
+            targets[id_a] = len(dst)
+            placeholder = (dst_cloud[0][:CONTEXT_TARGET_POINTS], dst_cloud[1][:CONTEXT_TARGET_POINTS])
+            # A target without context gets a placeholder: its pairs get no context residuals
+            dst.append((dst_cloud, placeholder if dst_context is None else dst_context))
+        valid = np.full(CONTEXT_POINTS, dst_context is not None and src_context is not None)
+        if src_context is None:
+            src_context = (np.zeros((CONTEXT_POINTS, 3)), np.zeros((CONTEXT_POINTS, 3)))
+        extent = np.sqrt(np.maximum(row_a['eigenvalues'][:2], 0))
+        spins = ROUND_SPINS if extent[1] > ROUND_RATIO * extent[0] else SPINS
+        rotations, translations = descriptor_hypotheses(row_a, row_b, spins)
+        for R, t in zip(rotations, translations):
+            problems.append((k, src, targets[id_a], R, t, src_context, valid))
+
+    num = len(pairs)
+    out = {'transforms': np.tile(np.eye(4), (num, 1, 1)), 'residual': np.full(num, np.inf),
+           'inliers': np.zeros(num), 'context': np.zeros(num), 'iterations': np.zeros(num, dtype=np.int64),
+           'converged': np.zeros(num, dtype=bool), 'score': np.full(num, -np.inf), 'ambiguity': np.ones(num)}
+    if not problems:
+        return out
+
+    # All hypotheses for a few iterations, then only the best one of each pair
+    stack = lambda j, pick=slice(None): np.array([p[j] for p in problems])[pick]
+    dst_pos, dst_norm = (np.array([d[0][j] for d in dst]) for j in (0, 1))
+    dst_context = tuple(np.array([d[1][j] for d in dst]) for j in (0, 1))
+    contexts = lambda pick=slice(None), few=slice(None): ((stack(5, pick)[:, 0, few], stack(5, pick)[:, 1, few],
+                                                           stack(6, pick)[:, few]), dst_context)
+    few = slice(COARSE_POINTS)
+    coarse = refine(stack(1)[:, 0, few], stack(1)[:, 1, few], dst_pos, dst_norm, stack(3), stack(4),
+                    min(COARSE_ITERATIONS, max_iterations), tolerance, *contexts(few=few), context_weight=0.0,
+                    target=stack(2))
+    scores = pair_score(coarse)
+    pair_of = np.array([p[0] for p in problems])
+    order = np.lexsort((-scores, pair_of))
+    first = np.r_[True, pair_of[order][1:] != pair_of[order][:-1]]
+    best = order[first]
+    # Runner-up hypothesis (the next one of the same pair in `order`), if any
+    second = np.r_[order[1:], order[-1]][first]
+    runner_up = np.where(pair_of[second] == pair_of[best], scores[second], 0.0)
+    result = refine(stack(1, best)[:, 0], stack(1, best)[:, 1], dst_pos, dst_norm,
+                    coarse['transforms'][best, :3, :3], coarse['transforms'][best, :3, 3],
+                    max_iterations - min(COARSE_ITERATIONS, max_iterations), tolerance, *contexts(best),
+                    target=stack(2, best))
+    result['iterations'] += coarse['iterations'][best]
+    k = pair_of[best]
+    out['score'][k] = pair_score(result)
+    out['ambiguity'][k] = np.clip(runner_up / np.maximum(scores[best], 1e-12), 0.0, 1.0)
+    for key in ('transforms', 'residual', 'inliers', 'context', 'iterations', 'converged'):
+        out[key][k] = result[key]
+    return out
+
+def ground_truth_transform(poses, shard_a, shard_b):
+    """Transform taking B's exported points onto A's exported points as assembled at frame 1."""
+    matrix = lambda name, key: np.array(poses[name][key], dtype=np.float64)
+    to_world_1 = matrix(shard_b, 'frame_1') @ np.linalg.inv(matrix(shard_b, 'export'))
+    return matrix(shard_a, 'export') @ np.linalg.inv(matrix(shard_a, 'frame_1')) @ to_world_1
+
+def transform_error(transform, truth, point):
+    """(rotation error in degrees, translation error in m at `point`, e.g. facet B's centroid)."""
+    delta = transform[:3, :3] @ truth[:3, :3].T
+    angle = np.degrees(np.arccos(np.clip((np.trace(delta) - 1) / 2, -1.0, 1.0)))
+    p = np.append(point, 1.0)
+    return float(angle), float(np.linalg.norm((transform @ p - truth @ p)[:3]))
+
+def pose_entry(frame_1, export):
+    """poses.json entry of one shard from its two 4x4 world matrices (Blender Matrix or array)."""
+    return {'frame_1': [list(map(float, row)) for row in frame_1],
+            'export': [list(map(float, row)) for row in export]}
+
+def save_poses(folder, poses, fsync=False):
+    """Writes <folder>/poses.json. Returns the path."""
+    path = os.path.join(folder, POSES_NAME)
+    with open(path, 'w') as f:
+        json.dump(poses, f, indent=4)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return path
+
+def load_poses(folder):
+    with open(os.path.join(folder, POSES_NAME), 'r') as f:
+        return json.load(f)
+
+def evaluate(path, pots=None, seed=0):
+    """Registers the adjacency.json pairs of every pot, errors against poses.json."""
+    import dataset_loader
+    source = dataset_loader.open_source(path)
+    results = []
+    for pot_name in (pots or source.pots()):
+        table = source.load_facets(pot_name)
+        poses = source.load_poses(pot_name)
+        if table is None or poses is None: continue
+        samples = {shard: source.load_shard(pot_name, shard) for shard in source.shards(pot_name)}
+        pairs = [tuple(p) for p in source.load_adjacency(pot_name)]
+        t0 = time.perf_counter()
+        out = register_pairs(table, samples, pairs, seed)
+        seconds = time.perf_counter() - t0
+
+        errors = []
+        for k, (id_a, id_b) in enumerate(pairs):
+            row_a = facet_descriptors.lookup(table, id_a)
+            row_b = facet_descriptors.lookup(table, id_b)
+            if row_a is None or row_b is None or not np.isfinite(out['residual'][k]): continue
+            truth = ground_truth_transform(poses, str(row_a['shard']), str(row_b['shard']))
+            errors.append(transform_error(out['transforms'][k], truth, row_b['centroid']))
+        errors = np.array(errors).reshape(-1, 2)
+        results.append({'pot': pot_name, 'pairs': len(pairs), 'registered': len(errors), 'seconds': seconds,
+                        'rotation_deg': errors[:, 0], 'translation_m': errors[:, 1]})
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Point-to-plane ICP over adjacency.json pairs, errors vs poses.json")
+    parser.add_argument("path", help="Dataset root (Pot_XXX folders) or .jpak pack")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = evaluate(args.path, seed=args.seed)
+    if not results:
+        print(f"No pot with {facet_descriptors.FACETS_NAME} and {POSES_NAME} in {args.path}")
+        return 1
+    for r in results:
+        rot, trans = r['rotation_deg'], r['translation_m']
+        median = lambda a: float(np.median(a)) if len(a) else float('nan')
+        print(f"{r['pot']}: {r['registered']}/{r['pairs']} pairs in {r['seconds']:.2f} s, "
+              f"median error {median(rot):.2f} deg / {median(trans) * 1000:.1f} mm")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
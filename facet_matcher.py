@@ -0,0 +1,167 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import kdtree
+import facet_descriptors
+
+# Candidate facet pairs from facet descriptors (reconstruction_plan.md phase 3).
+#
+# Instead of comparing every facet with every facet of every other shard, each
+# facet becomes a feature vector that does not depend on the shard's pose,
+# the vectors go into a k-d tree, and each facet asks for its k nearest
+# compatible partners (O(F log F) instead of O(F^2)). Features, per group
+# scaled to unit variance over the table and then weighted:
+#
+#   area    log(area) - partners cover the same piece of fracture
+#   shape   log(boundary / sqrt(area)), log of the two PCA extents / sqrt(area)
+#   radial  radial_hist (outline of the facet)
+#   height  height_hist; a partner sees the same relief from the other side, so
+#           queries use the mirrored histogram
+#   normal  (oriented=True only) world normal, queries use the flipped one; for
+#           tables exported in the assembled pose (frame 1)
+#
+# A k-d tree degrades towards a linear scan in ~24 dimensions, so the tree is
+# built on the top INDEX_DIMS principal components of the features; the
+# fetched candidates are then re-ranked with the full feature distance.
+# Candidates on the facet's own shard are dropped, each unordered pair is kept
+# once with its best score (1 / (1 + feature distance)).
+#
+#   python facet_matcher.py <dataset root or .jpak> --k 10    (recall vs adjacency.json)
+
+TOP_K = 10
+FEATURE_WEIGHTS = {'area': 1.0, 'shape': 1.0, 'radial': 1.0, 'height': 1.0, 'normal': 1.0}
+INDEX_DIMS = 8     # Principal components the k-d tree is built on
+OVERFETCH = 2      # Tree candidates per wanted candidate (re-ranked in full dimension)
+EPS = 1e-12
+
+def _feature_groups(table, oriented, mirrored):
+    area = np.maximum(table['area'], EPS)
+    extent = np.sqrt(np.maximum(table['eigenvalues'][:, :2], EPS) / area[:, None])
+    height = table['height_hist'][:, ::-1] if mirrored else table['height_hist']
+    groups = {
+        'area': np.log(area)[:, None],
+        'shape': np.column_stack([np.log(np.maximum(table['boundary_length'], EPS) / np.sqrt(area)), np.log(extent)]),
+        'radial': table['radial_hist'].astype(np.float64),
+        'height': height.astype(np.float64),
+    }
+    if oriented:
+        groups['normal'] = -table['normal'] if mirrored else table['normal']
+    return groups
+
+def feature_scales(table, oriented=False, weights=None):
+    """Per group: weight / sqrt(total variance) over the table."""
+    weights = dict(FEATURE_WEIGHTS, **(weights or {}))
+    scales = {}
+    for name, values in _feature_groups(table, oriented, False).items():
+        spread = np.sqrt(values.var(axis=0).sum())
+        scales[name] = weights[name] / spread if spread > EPS else 0.0
+    return scales
+
+def facet_features(table, scales, oriented=False, mirrored=False):
+    """[F, D] feature rows; mirrored=True gives the rows a partner facet would match."""
+    groups = _feature_groups(table, oriented, mirrored)
+    return np.column_stack([groups[name] * scales[name] for name in scales])
+
+def principal_basis(features, dims=INDEX_DIMS):
+    """(mean, [D, dims] basis) of the top principal components of the rows."""
+    mean = features.mean(axis=0)
+    _, _, vt = np.linalg.svd(features - mean, full_matrices=False)
+    return mean, vt[:dims].T
+
+def match_facets(table, k=TOP_K, oriented=False, weights=None):
+    """Top-k partner candidates of every facet of a facet_descriptors table.
+
+    Returns (pairs [P,2] row indices into table, scores [P]), best score first,
+    each unordered pair once.
+    """
+    if len(table) < 2:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+    scales = feature_scales(table, oriented, weights)
+    index_features = facet_features(table, scales, oriented)
+    query_features = facet_features(table, scales, oriented, mirrored=True)
+    mean, basis = principal_basis(index_features)
+    tree = kdtree.KDTree((index_features - mean) @ basis)
+
+    # Over-fetch so dropping same-shard hits still leaves k candidates in most cases
+    shard_size = np.unique(table['shard'], return_counts=True)[1].max()
+    fetch = min(len(table), OVERFETCH * k + int(shard_size))
+    _, idx = tree.query((query_features - mean) @ basis, fetch)
+
+    rows = np.repeat(np.arange(len(table)), fetch)
+    cols = idx.reshape(-1)
+    ok = cols >= 0
+    ok[ok] = table['shard'][rows[ok]] != table['shard'][cols[ok]]
+    rows, cols = rows[ok], cols[ok]
+
+    # Re-rank in the full feature space, k per query facet
+    dist = np.linalg.norm(query_features[rows] - index_features[cols], axis=1)
+    order = np.lexsort((dist, rows))
+    rows, cols, dist = rows[order], cols[order], dist[order]
+    first = np.searchsorted(rows, rows, side='left')
+    keep = np.arange(len(rows)) - first < k
+    rows, cols, dist = rows[keep], cols[keep], dist[keep]
+
+    # Unordered pairs, best (smallest) distance wins
+    pairs = np.sort(np.stack([rows, cols], axis=1), axis=1)
+    order = np.lexsort((dist, pairs[:, 1], pairs[:, 0]))
+    pairs, dist = pairs[order], dist[order]
+    unique = np.ones(len(pairs), dtype=bool)
+    unique[1:] = (pairs[1:] != pairs[:-1]).any(axis=1)
+    pairs, dist = pairs[unique], dist[unique]
+
+    best = np.argsort(dist, kind='stable')
+    return pairs[best], 1.0 / (1.0 + dist[best])
+
+def pair_ids(table, pairs):
+    """Row-index pairs -> sorted facet-id pairs (adjacency.json layout)."""
+    return np.sort(table['id'][pairs], axis=1)
+
+def recall(table, pairs, adjacency):
+    """Share of the ground-truth pairs (adjacency.json) found among the candidates."""
+    truth = {tuple(sorted(p)) for p in adjacency}
+    if not truth:
+        return 1.0
+    found = {tuple(p) for p in pair_ids(table, pairs).tolist()}
+    return len(truth & found) / len(truth)
+
+def evaluate(path, k=TOP_K, oriented=False, pots=None):
+    """Recall and timing of match_facets over the pots of a dataset root or pack."""
+    import dataset_loader
+    source = dataset_loader.open_source(path)
+    results = []
+    for pot_name in (pots or source.pots()):
+        table = source.load_facets(pot_name)
+        if table is None: continue
+        t0 = time.perf_counter()
+        pairs, _ = match_facets(table, k, oriented)
+        seconds = time.perf_counter() - t0
+        adjacency = source.load_adjacency(pot_name)
+        results.append({'pot': pot_name, 'facets': len(table), 'truth': len(adjacency),
+                        'candidates': len(pairs), 'recall': recall(table, pairs, adjacency), 'seconds': seconds})
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Facet pair candidates from facets.npy, recall against adjacency.json")
+    parser.add_argument("path", help="Dataset root (Pot_XXX folders) or .jpak pack")
+    parser.add_argument("--k", type=int, default=TOP_K, help="Candidates per facet")
+    parser.add_argument("--oriented", action="store_true", help="Also match flipped normals (tables in the assembled pose)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = evaluate(args.path, args.k, args.oriented)
+    if not results:
+        print(f"No pot with {facet_descriptors.FACETS_NAME} in {args.path}")
+        return 1
+    for r in results:
+        print(f"{r['pot']}: {r['facets']:4d} facets, {r['candidates']:5d} candidates, "
+              f"recall@{args.k} {r['recall']:.3f} ({r['seconds'] * 1000:.1f} ms)")
+    truth = sum(r['truth'] for r in results)
+    found = sum(r['recall'] * r['truth'] for r in results)
+    print(f"{len(results)} pots: recall@{args.k} {found / truth if truth else 1.0:.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
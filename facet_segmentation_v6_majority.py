@@ -1,8 +1,122 @@
 import bpy
-import bmesh
-from collections import Counter
+import time
+import numpy as np
 
-def run_segmentation_v6_majority(target_objects=None):
+import shard_sampler
+import shard_contact
+import facet_graph
+import production_stats
+
+FACET_ATTRIBUTE = "RECON_Facet" # Per-face facet number (material slot), 0 = not a facet
+
+def inner_face_mask(obj):
+    """Bool array over polygons from the RBDLab 'Inner_faces' attribute."""
+    num_faces = len(obj.data.polygons)
+    attr = obj.data.attributes.get('Inner_faces')
+    if not attr or len(attr.data) < num_faces:
+        return np.zeros(num_faces, dtype=bool)
+    values = np.zeros(len(attr.data), dtype=bool)
+    try:
+        attr.data.foreach_get("value", values)
+    except Exception:
+        return np.zeros(num_faces, dtype=bool)
+    return values[:num_faces]
+
+def world_face_centers(obj):
+    """Median centers of all polygons in world space."""
+    centers = np.empty(len(obj.data.polygons) * 3, dtype=np.float32)
+    obj.data.polygons.foreach_get("center", centers)
+    mw = np.array(obj.matrix_world, dtype=np.float64)
+    return centers.reshape(-1, 3).astype(np.float64) @ mw[:3, :3].T + mw[:3, 3]
+
+def pot_key(obj_name):
+    """RND_Pot_0_0_cell.001 / Pot_001_cell.001 -> pot prefix."""
+    return obj_name.split('_cell')[0].split('_Cell')[0]
+
+def shard_broadphase(shards, shard_arrays, threshold):
+    """Frame-1 AABB broadphase; returns the [S,S] candidate-neighbour matrix and logs pruning per pot."""
+    lo, hi = shard_contact.shard_aabbs(shard_arrays)
+    candidates = shard_contact.broadphase_candidates(lo, hi, threshold)
+
+    stats = shard_contact.pruning_stats(candidates, [pot_key(obj.name) for obj in shards])
+    for key, (kept, total, ratio) in stats.items():
+        if key is None: continue
+        print(f"Broadphase {key}: {kept}/{total} shard pairs kept ({ratio:.1%} pruned)")
+    return candidates
+
+def nearest_neighbour_labels(shards, threshold, shard_arrays=None, candidates=None):
+    """Step 1 for all shards at once: closest other shard per inner face.
+
+    Only broadphase candidates are considered. Returns one (face_ids, labels)
+    pair of int arrays per shard, where label k > 0 means shards[k - 1] and
+    0 (facet_graph.NONE_LABEL) means no shard within threshold.
+    """
+    if shard_arrays is None:
+        shard_arrays = [shard_sampler.extract_shard_arrays(obj) for obj in shards]
+    if candidates is None:
+        candidates = shard_broadphase(shards, shard_arrays, threshold)
+
+    # Shards no one can touch don't need to be indexed at all
+    needed = candidates.any(axis=0)
+    index = shard_contact.ContactIndex(
+        [arrays if needed[s] else {'co': arrays['co'], 'tris': arrays['tris'][:0]}
+         for s, arrays in enumerate(shard_arrays)],
+        threshold)
+
+    face_ids, points, owners = [], [], []
+    for s, obj in enumerate(shards):
+        ids = np.flatnonzero(inner_face_mask(obj))
+        face_ids.append(ids)
+        points.append(world_face_centers(obj)[ids])
+        owners.append(np.full(len(ids), s, dtype=np.int64))
+
+    if not any(len(ids) for ids in face_ids):
+        return [(ids, np.zeros(0, dtype=np.int64)) for ids in face_ids]
+
+    nearest, _ = index.nearest_other_shard(np.concatenate(points), np.concatenate(owners), allowed=candidates)
+
+    labels = []
+    start = 0
+    for ids in face_ids:
+        labels.append((ids, nearest[start:start + len(ids)] + 1))
+        start += len(ids)
+    return labels
+
+def mesh_loop_arrays(mesh):
+    """(loop_start, loop_total, loop edge indices) of a mesh."""
+    num_faces = len(mesh.polygons)
+    loop_start = np.empty(num_faces, dtype=np.int64)
+    loop_total = np.empty(num_faces, dtype=np.int64)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int64)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    return loop_start, loop_total, loop_edges
+
+def write_facet_ids(mesh, inner_ids, facet_ids):
+    """Material slots (facet i -> slot i + 1) and the RECON_Facet face attribute (facet i -> i + 1, 0 = none)."""
+    per_face = np.zeros(len(mesh.polygons), dtype=np.int32)
+    per_face[inner_ids] = facet_ids + 1
+    mesh.polygons.foreach_set("material_index", per_face)
+
+    attr = mesh.attributes.get(FACET_ATTRIBUTE)
+    if attr and (attr.domain != 'FACE' or attr.data_type != 'INT'):
+        mesh.attributes.remove(attr)
+        attr = None
+    if not attr:
+        attr = mesh.attributes.new(FACET_ATTRIBUTE, 'INT', 'FACE')
+    attr.data.foreach_set("value", per_face)
+    mesh.update()
+
+def read_facet_ids(mesh):
+    """Per-face facet numbers written by the segmentation (0 = not a facet)."""
+    per_face = np.zeros(len(mesh.polygons), dtype=np.int32)
+    attr = mesh.attributes.get(FACET_ATTRIBUTE)
+    if attr and attr.domain == 'FACE':
+        attr.data.foreach_get("value", per_face)
+    return per_face
+
+def run_segmentation_v6_majority(target_objects=None, iterations=5):
     # 1. Setup Base Materials
     surf_mat = bpy.data.materials.get("RECON_Surface")
     if not surf_mat:
@@ -27,94 +141,49 @@ def run_segmentation_v6_majority(target_objects=None):
     bpy.context.view_layer.update()
 
     THRESHOLD = 0.001 # 1mm for contact
-    ITERATIONS = 5    # Number of smoothing passes
+    ITERATIONS = iterations # Max smoothing passes (stops early once stable)
 
     total_facets_found = 0
 
-    for obj in shards:
+    # Step 0: Broadphase (frame-1 AABBs padded by THRESHOLD)
+    label_start = time.perf_counter()
+    shard_arrays = [shard_sampler.extract_shard_arrays(obj) for obj in shards]
+    candidates = shard_broadphase(shards, shard_arrays, THRESHOLD)
+
+    # Step 1: Initial Labeling (Closest Neighbor), batched over all shards
+    initial_labels = nearest_neighbour_labels(shards, THRESHOLD, shard_arrays, candidates)
+    label_names = ["NONE"] + [obj.name for obj in shards]
+    production_stats.record("segment_labels", time.perf_counter() - label_start, shards=len(shards),
+                            inner_faces=sum(len(ids) for ids, _ in initial_labels))
+    facet_start = time.perf_counter()
+
+    for shard_idx, obj in enumerate(shards):
         # Reset Materials
         obj.data.materials.clear()
         obj.data.materials.append(surf_mat)
         
-        bm = bmesh.new()
-        bm.from_mesh(obj.data)
-        bm.faces.ensure_lookup_table()
-        
         # Identify inner faces
-        attr = obj.data.attributes.get('Inner_faces')
-        inner_faces = []
-        if attr:
-            try:
-                for i, face in enumerate(bm.faces):
-                    if attr.data[i].value:
-                        inner_faces.append(face)
-            except: pass
+        inner_ids, labels = initial_labels[shard_idx]
         
-        if not inner_faces:
-            bm.free()
+        if len(inner_ids) == 0:
             continue
 
-        # Step 1: Initial Labeling (Closest Neighbor)
-        face_labels = {} # face.index -> neighbor_name
-        for f in inner_faces:
-            world_center = obj.matrix_world @ f.calc_center_median()
-            best_nb = "NONE"
-            best_dist = THRESHOLD
-            
-            for other in shards:
-                if other == obj: continue
-                local_pos = other.matrix_world.inverted() @ world_center
-                dist, pt, norm, f_idx = other.closest_point_on_mesh(local_pos)
-                world_dist = (world_center - (other.matrix_world @ pt)).length
-                if world_dist < best_dist:
-                    best_dist = world_dist
-                    best_nb = other.name
-            face_labels[f.index] = best_nb
-
         # Step 2: Spatial Smoothing (Majority Vote Propagation)
-        # This handles noise and orphans.
-        for _ in range(ITERATIONS):
-            new_labels = face_labels.copy()
-            for f in inner_faces:
-                # Get labels of all connected faces (including self)
-                neighbor_labels = [face_labels[f.index]]
-                for e in f.edges:
-                    for nf in e.link_faces:
-                        if nf.index in face_labels:
-                            neighbor_labels.append(face_labels[nf.index])
-                
-                # Exclude NONE from vote if there are alternatives
-                votes = [L for L in neighbor_labels if L != "NONE"]
-                if votes:
-                    majority_label = Counter(votes).most_common(1)[0][0]
-                    new_labels[f.index] = majority_label
-                else:
-                    new_labels[f.index] = "NONE"
-            face_labels = new_labels
-
-        # Step 3: Island Grouping (Connected AND Same Label)
-        unvisited = set(inner_faces)
-        final_facets = []
-        while unvisited:
-            start_f = unvisited.pop()
-            label = face_labels[start_f.index]
-            island = [start_f]
-            queue = [start_f]
-            while queue:
-                f = queue.pop(0)
-                for e in f.edges:
-                    for nf in e.link_faces:
-                        if nf in unvisited and face_labels[nf.index] == label:
-                            unvisited.remove(nf)
-                            island.append(nf)
-                            queue.append(nf)
-            final_facets.append(island)
+        # This handles noise and orphans. Adjacency is built once as CSR arrays.
+        indptr, indices, weights = facet_graph.face_adjacency_csr(*mesh_loop_arrays(obj.data), inner_ids)
+        labels, _ = facet_graph.smooth_labels(indptr, indices, weights, labels, ITERATIONS)
+
+        # Step 3: Island Grouping (Connected AND Same Label) -> facet id per inner face
+        facet_ids = facet_graph.connected_components(indptr, indices, labels)
+        num_facets = int(facet_ids.max()) + 1
 
         # Step 4: Final Visualization
-        for i, facet in enumerate(final_facets):
+        facet_labels = np.zeros(num_facets, dtype=np.int64)
+        facet_labels[facet_ids] = labels # Constant within a facet
+        for i in range(num_facets):
             # Final 1-to-1 Check: If a facet still touches NO ONE (NONE), 
             # we should probably give it a 'Void' color or merge with the largest colored neighbor.
-            label = face_labels[facet[0].index]
+            label = label_names[facet_labels[i]]
             
             mat_name = f"RECON_V6_{label}_{i}"
             mat = bpy.data.materials.get(mat_name)
@@ -124,13 +193,13 @@ def run_segmentation_v6_majority(target_objects=None):
                 mat.diffuse_color = palette[(total_facets_found + i) % len(palette)]
             
             obj.data.materials.append(mat)
-            slot_idx = len(obj.data.materials) - 1
-            for f in facet:
-                f.material_index = slot_idx
+
+        # Slot 0 = surface, slot i + 1 = facet i
+        write_facet_ids(obj.data, inner_ids, facet_ids)
         
-        total_facets_found += len(final_facets)
-        bm.to_mesh(obj.data)
-        bm.free()
+        total_facets_found += num_facets
+
+    production_stats.record("segment_facets", time.perf_counter() - facet_start, facets=total_facets_found)
 
     bpy.context.scene.frame_set(current_frame)
     # Shading
@@ -143,8 +212,8 @@ def run_segmentation_v6_majority(target_objects=None):
     return f"V6 Majority-Vote Complete: Found {total_facets_found} facets."
 
 # Alias for external tools
-def apply_segmentation_to_objects(objects):
-    return run_segmentation_v6_majority(target_objects=objects)
+def apply_segmentation_to_objects(objects, iterations=5):
+    return run_segmentation_v6_majority(target_objects=objects, iterations=iterations)
 
 if __name__ == "__main__":
     print(run_segmentation_v6_majority())
@@ -1,33 +1,26 @@
 import bpy
+import json
 import random
 import math
+import numpy as np
 
-def create_random_pot(name, location):
-    # 1. Create Curve for the profile
-    curve_data = bpy.data.curves.new(name + "_Curve", type='CURVE')
-    curve_data.dimensions = '3D'
-    polyline = curve_data.splines.new('BEZIER')
-    
+import lathe_builder
+import surface_noise
+
+# Bezier handle types of the 7 profile points (p0 center ... p6 rim tip)
+PROFILE_HANDLES = ['VECTOR', 'VECTOR', 'AUTO', 'AUTO', 'AUTO', 'AUTO', 'AUTO']
+# Subdivision level of the weathering pass (subsurf or NumPy re-evaluation)
+ROUGHNESS_SUBDIVISIONS = 1
+
+def sample_pot_params(rng):
+    """Draws the shape parameters of one pot from `rng` (a random.Random)."""
     # --- YAYOI STYLE: TSUBO ONLY (50-60cm) ---
     # User requested: "Size 50-60cm", "Tsubo only".
-    
     archetype = 'TSUBO'
     
-    # Defaults
-    p0_center = [0, 0, 0]
-    handles = ['VECTOR', 'VECTOR', 'AUTO', 'AUTO', 'AUTO', 'AUTO', 'AUTO']
-    
-    # --- STANDARD VESSEL TOPOLOGY ---
-    
-    if archetype == 'TSUBO':
-        # TYPE 1: TSUBO (Jar - 貯蔵用)
-        # Reference: Round belly, Distinct neck, Flared rim.
-        # Scale: 30cm - 50cm
-        total_height = random.uniform(0.3, 0.5)
-        max_width = total_height * random.uniform(0.7, 0.9)
     # 1. EXPLODED GLOBAL SCALE (Restricted)
     # User requested strict range: Fixed 60cm
-    total_height = 0.60
+    params = {'archetype': archetype, 'total_height': 0.60}
     
     if archetype == 'TSUBO':
         # TYPE 1: TSUBO (Jar) - S-Curve
@@ -36,33 +29,70 @@ def create_random_pot(name, location):
         # Stoutness: Wide vs Slender
         # User requested: "Allow Bucket shapes too"
         # 25cm - 40cm range allows for both slender cylinders and typical jars.
-        max_width = random.uniform(0.25, 0.40)
-        # aspect_ratio = max_width / total_height (Implicit)
+        params['max_width'] = rng.uniform(0.25, 0.40)
         
         # 1. BELLY POSITION (Center of Gravity)
         # 0.35 (Low/Stable) to 0.75 (High Shoulder/Bucket-like)
-        belly_h_ratio = random.uniform(0.35, 0.75)
-        belly_h = total_height * belly_h_ratio
+        params['belly_h_ratio'] = rng.uniform(0.35, 0.75)
         
         # 2. NECK DEFINITION
-        # Neck width relative to belly
         # 0.35 = Tight (Jar), 1.0 = Straight (Cylinder/No Neck)
-        neck_w_ratio = random.uniform(0.35, 1.0)
-        neck_w = max_width * neck_w_ratio
-        
+        params['neck_w_ratio'] = rng.uniform(0.35, 1.0)
         # Neck Height (Distance from belly to rim)
-        # If belly is high, neck is short. If belly is low, neck is long.
-        neck_h_ratio = random.uniform(0.8, 0.9)
-        neck_h = total_height * neck_h_ratio
+        params['neck_h_ratio'] = rng.uniform(0.8, 0.9)
         
         # 3. RIM FLARE
         # 0.85 (Inverted/No Mouth) to 1.35 (Flare)
-        rim_flare_ratio = random.uniform(0.85, 1.35)
-        rim_w = neck_w * rim_flare_ratio
+        params['rim_flare_ratio'] = rng.uniform(0.85, 1.35)
         
         # Bottom (Stable)
         # 10cm (Tapered) to 35cm (Wide/Bucket Base)
-        bottom_w = random.uniform(0.10, 0.35)
+        params['bottom_w'] = rng.uniform(0.10, 0.35)
+        
+    else: # KAME
+        # TYPE 2: KAME (Pot) - Bucket/Cylinder
+        # Width: Generally wider than Tsubo relative to height
+        params['aspect_ratio'] = rng.uniform(0.7, 1.3)
+        # TAPER ANGLE (Base vs Rim): 0.9-1.0 = Cylinder (Zundou), 0.5-0.6 = Sharp Bucket (V-shape)
+        params['base_rim_ratio'] = rng.uniform(0.4, 0.95)
+        # Ensure neck is NOT wider than rim to keep inverted cone shape
+        params['neck_w_ratio'] = rng.uniform(0.95, 0.99)
+        params['belly_h_ratio'] = rng.uniform(0.4, 0.6)
+        # Tiny organic jitter (optional, keep small for now)
+        params['belly_jitter'] = rng.uniform(0.98, 1.02)
+        
+    return params
+
+def sample_pot_record(seed):
+    """Everything random about one pot, derived from a single seed.
+
+    Returned dict is what goes into the pot's manifest.json: shape params,
+    RBDLab scatter count, the seed of the point sampler and of the surface noise.
+    """
+    rng = random.Random(seed)
+    params = sample_pot_params(rng)
+    return {
+        'seed': seed,
+        'params': params,
+        'scatter_count': rng.randint(45, 65),
+        'sampler_seed': rng.randrange(2 ** 31),
+        'roughness_seed': rng.randrange(2 ** 31),
+    }
+
+def pot_profile(params):
+    """7 Bezier profile points (x = radius, z = height) and the rim radius."""
+    total_height = params['total_height']
+    p0_center = [0, 0, 0]
+    
+    # --- STANDARD VESSEL TOPOLOGY ---
+    if params['archetype'] == 'TSUBO':
+        max_width = params['max_width']
+        belly_h = total_height * params['belly_h_ratio']
+        neck_w = max_width * params['neck_w_ratio']
+        neck_h = total_height * params['neck_h_ratio']
+        rim_flare_ratio = params['rim_flare_ratio']
+        rim_w = neck_w * rim_flare_ratio
+        bottom_w = params['bottom_w']
 
         # Topology
         p1_bot_flat = [bottom_w * 0.8, 0, 0]
@@ -77,38 +107,20 @@ def create_random_pot(name, location):
         p6_rim_tip = [rim_w, 0, total_height]
         
     else: # KAME
-        # TYPE 2: KAME (Pot) - Bucket/Cylinder
-        # Variance Factor: TAPER ANGLE
-        
-        # Width: Generally wider than Tsubo relative to height
-        aspect_ratio = random.uniform(0.7, 1.3)
-        max_width = total_height * aspect_ratio
-        
-        # 1. TAPER ANGLE (Base vs Rim)
-        # 0.9-1.0 = Cylinder (Zundou)
-        # 0.5-0.6 = Sharp Bucket (V-shape)
-        base_rim_ratio = random.uniform(0.4, 0.95)
-        
+        max_width = total_height * params['aspect_ratio']
         # RIM is the widest point (Max Width)
         rim_w = max_width
-        
         # BOTTOM is derived from ratio
-        bottom_w = rim_w * base_rim_ratio
-        
+        bottom_w = rim_w * params['base_rim_ratio']
         # NECK (Definition for topology, but practically same as Rim)
         neck_h = total_height * 0.95
-        # Ensure neck is NOT wider than rim to keep inverted cone shape
-        neck_w = rim_w * random.uniform(0.95, 0.99) 
+        neck_w = rim_w * params['neck_w_ratio']
         
         # BELLY (Linear Interpolation for Straight Walls)
-        belly_h = total_height * random.uniform(0.4, 0.6)
-        
-        # Lerp: Bottom -> Neck
+        belly_h = total_height * params['belly_h_ratio']
         t = belly_h / neck_h
         belly_w_linear = bottom_w + (neck_w - bottom_w) * t
-        
-        # Tiny organic jitter (optional, keep small for now)
-        p3_belly_w = belly_w_linear * random.uniform(0.98, 1.02)
+        p3_belly_w = belly_w_linear * params['belly_jitter']
         
         # Topology
         p1_bot_flat = [bottom_w * 0.8, 0, 0]
@@ -121,6 +133,46 @@ def create_random_pot(name, location):
 
     # Shared Topology List
     coords = [p0_center, p1_bot_flat, p2_bot_curve, p3_belly, p4_neck, p5_rim_base, p6_rim_tip]
+    return coords, rim_w
+
+def mesh_from_arrays(name, verts, face_sizes, face_verts):
+    """Creates a mesh datablock from flat arrays with foreach_set (no operators)."""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", np.asarray(verts, dtype=np.float32).reshape(-1))
+    mesh.loops.add(len(face_verts))
+    mesh.loops.foreach_set("vertex_index", np.asarray(face_verts, dtype=np.int32))
+    mesh.polygons.add(len(face_sizes))
+    starts = np.cumsum(face_sizes) - face_sizes
+    mesh.polygons.foreach_set("loop_start", starts.astype(np.int32))
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly: # Blender < 4.0
+        mesh.polygons.foreach_set("loop_total", np.asarray(face_sizes, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(face_sizes), dtype=bool))
+    return mesh
+
+def build_pot_numpy(name, location, coords, handles, roughness=None):
+    """Lathe mesh built in NumPy (same profile/steps/thickness as the modifier stack, subdivided once).
+
+    roughness: keyword args for surface_noise.displace_along_normals
+    (strength, frequency, octaves, seed), applied before the mesh is created.
+    """
+    verts, face_sizes, face_verts = lathe_builder.build_lathe(coords, handles, subdivisions=ROUGHNESS_SUBDIVISIONS)
+    normals = lathe_builder.vertex_normals(verts, face_sizes, face_verts)
+    verts = surface_noise.displace_along_normals(verts, normals, **(roughness or {}))
+    mesh_obj = bpy.data.objects.new(name, mesh_from_arrays(name, verts, face_sizes, face_verts))
+    bpy.context.collection.objects.link(mesh_obj)
+    mesh_obj.location = location
+    bpy.context.view_layer.objects.active = mesh_obj
+    mesh_obj.select_set(True)
+    return mesh_obj
+
+def build_pot_modifiers(name, location, coords, handles):
+    """Legacy path: Bezier curve + Screw + Solidify, converted to a mesh."""
+    # 1. Create Curve for the profile
+    curve_data = bpy.data.curves.new(name + "_Curve", type='CURVE')
+    curve_data.dimensions = '3D'
+    polyline = curve_data.splines.new('BEZIER')
 
     polyline.bezier_points.add(len(coords) - 1)
     for i, coord in enumerate(coords):
@@ -139,13 +191,13 @@ def create_random_pot(name, location):
     screw_mod = curve_obj.modifiers.new(name="Screw", type='SCREW')
     screw_mod.axis = 'Z'
     # User requested: "Reduce vertex count". 64 -> 32
-    screw_mod.steps = 32 
+    screw_mod.steps = lathe_builder.LATHE_STEPS
     screw_mod.use_merge_vertices = True 
-    screw_mod.merge_threshold = 0.001
+    screw_mod.merge_threshold = lathe_builder.MERGE_DIST
     screw_mod.use_smooth_shade = True 
     
     solid_mod = curve_obj.modifiers.new(name="Solidify", type='SOLIDIFY')
-    solid_mod.thickness = 0.03 # 3cm
+    solid_mod.thickness = lathe_builder.WALL_THICKNESS # 3cm
     
     # 3. CONVERT TO MESH (CRITICAL for RBDLab)
     bpy.context.view_layer.objects.active = curve_obj
@@ -153,6 +205,24 @@ def create_random_pot(name, location):
     bpy.ops.object.convert(target='MESH')
     mesh_obj = bpy.context.active_object
     mesh_obj.name = name
+    return mesh_obj
+
+def create_random_pot(name, location, seed=None, params=None, builder="numpy", roughness=None):
+    """Builds one pot. Shape comes from `params` if given, else is drawn with `seed`.
+
+    builder: "numpy" (lathe_builder, no operators) or "modifiers" (legacy stack).
+    roughness: surface noise settings for the NumPy builder, e.g. {'seed': 7, 'strength': 0.008}.
+    The params used are stored as JSON in the object's "pot_params" property.
+    """
+    if params is None:
+        params = sample_pot_params(random.Random(seed))
+    coords, rim_w = pot_profile(params)
+    handles = PROFILE_HANDLES
+
+    if builder == "numpy":
+        mesh_obj = build_pot_numpy(name, location, coords, handles, roughness)
+    else:
+        mesh_obj = build_pot_modifiers(name, location, coords, handles)
     
     # 4. Apply Materials and fix Indices
     # Helper to get BSDF
@@ -195,14 +265,17 @@ def create_random_pot(name, location):
             mesh_obj.data.materials[1] = inner_mat
 
     # Set all faces to index 0 (Outer)
-    for f in mesh_obj.data.polygons:
-        f.material_index = 0
+    polygons = mesh_obj.data.polygons
+    polygons.foreach_set("material_index", np.zeros(len(polygons), dtype=np.int32))
         
     # Set Object color for viewport (Solid mode)
     mesh_obj.color = (0.8, 0.8, 0.8, 1)
+    mesh_obj["pot_params"] = json.dumps(params)
     
     # --- ADD WEATHERING (Excavated Look) ---
-    add_surface_roughness(mesh_obj)
+    # The NumPy builder already subdivided and displaced the surface
+    if builder != "numpy":
+        add_surface_roughness(mesh_obj)
     # rim_w is Radius (from screw modifier logic). total_height is Height.
     # User requested to remove chipping entirely.
     # add_rim_chipping(mesh_obj, total_height, rim_w)
@@ -232,18 +305,18 @@ def create_floor(size=20, location=(4.5, 4.5, 0)):
         plane.rigid_body.collision_shape = 'MESH'
 
 def add_surface_roughness(obj):
-    """Adds excavated-like surface roughness."""
+    """Adds excavated-like surface roughness (modifier builder only, see surface_noise)."""
     try:
         # 1. Subdivision (Levels=2)
         sub = obj.modifiers.new("Roughness_Sub", 'SUBSURF')
         # User Feedback: "Reduce vertex". 2 -> 1
-        sub.levels = 1
-        sub.render_levels = 1
+        sub.levels = ROUGHNESS_SUBDIVISIONS
+        sub.render_levels = ROUGHNESS_SUBDIVISIONS
         
         # 2. Displacement (Fine Grain)
         disp = obj.modifiers.new("Roughness_Disp", 'DISPLACE')
         # User Feedback: "Too intense" -> Reduced to subtle realism.
-        disp.strength = 0.008 
+        disp.strength = surface_noise.ROUGHNESS_STRENGTH 
         
         tex_name = "Excavated_Noise"
         tex = bpy.data.textures.get(tex_name)
@@ -307,7 +380,7 @@ def add_rim_chipping(obj, height, radius):
     except Exception as e:
         print(f"Chipping Error: {e}")
 
-def generate_verification_grid(rows=3, cols=3, spacing=3.0):
+def generate_verification_grid(rows=3, cols=3, spacing=3.0, base_seed=None):
     # Cleanup previous random pots (but keep floor if exists, or recreate)
     for obj in bpy.data.objects:
         if "RND_Pot" in obj.name:
@@ -320,7 +393,8 @@ def generate_verification_grid(rows=3, cols=3, spacing=3.0):
         for c in range(cols):
             name = f"RND_Pot_{r}_{c}"
             loc = (c * spacing, r * spacing, 0)
-            create_random_pot(name, loc)
+            seed = None if base_seed is None else base_seed + r * cols + c
+            create_random_pot(name, loc, seed=seed, roughness={'seed': seed})
             
     print(f"Generated {rows*cols} random pots for verification.")
 
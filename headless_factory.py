@@ -0,0 +1,201 @@
+import bpy
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+# Headless pot factory (one worker).
+#
+#   blender -b Jomon_Pottery_Base.blend --python headless_factory.py -- \
+#       --out <dataset root> --first-id 1 --count 50 --seed-start 1000 [--worker 0] [--format json|bin|quant]
+#       [--regenerate]
+#
+# Pot i of the range gets ID first_id + i and seed seed_start + i. Each pot is
+# generated, fractured with RBDLab, simulated, segmented and exported to
+# <out>/Pot_XXX together with its manifest.json (seed, shape params, scatter
+# count, sampler seed). A worker_<k>_manifest.json is rewritten after every pot.
+# --regenerate rebuilds the range from the existing Pot_XXX/manifest.json files.
+# Progress goes into <out>/journal.sqlite (production_journal): pots already
+# exported are skipped, partial ones are produced again. Per-stage timings go
+# to stats_worker_<k>.jsonl (production_stats). Files are written by a
+# background AsyncWriter while the next pot is generated; a pot whose writes
+# fail is flagged "failed" in the worker manifest and stays partial in the journal.
+# launch_factory.py runs several of these in parallel on disjoint ranges.
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import generate_random_pots
+import mass_production
+import pot_manifest
+import shard_sampler
+import production_journal
+import production_stats
+
+SIM_FRAMES = 120 # Rigid body frames simulated before export (scattered pose)
+
+def parse_args(argv):
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(description="Headless Jomon pot factory worker")
+    parser.add_argument("--out", required=True, help="Dataset root (Pot_XXX folders go here)")
+    parser.add_argument("--first-id", type=int, default=1)
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--worker", type=int, default=0)
+    parser.add_argument("--format", default="json", choices=["json", "bin", "quant"])
+    parser.add_argument("--sim-frames", type=int, default=SIM_FRAMES)
+    parser.add_argument("--sample-workers", type=int, default=0,
+                        help="Threads for point sampling/writing (0 = auto, 1 = serial)")
+    parser.add_argument("--sampling", default="uniform", choices=list(shard_sampler.SAMPLING_METHODS),
+                        help="Point distribution per shard (see shard_sampler)")
+    parser.add_argument("--levels", type=int, nargs="+",
+                        help="Nested point levels, e.g. 512 1024 2048 8192 (sampled once, prefixes per level)")
+    parser.add_argument("--builder", default="numpy", choices=["numpy", "modifiers"],
+                        help="Pot mesh builder (lathe_builder or the legacy modifier stack)")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Reuse the records in <out>/Pot_XXX/manifest.json instead of --seed-start")
+    return parser.parse_args(argv)
+
+def find_shards(pot_name):
+    return [o for o in bpy.data.objects
+            if pot_name in o.name and ("cell" in o.name.lower() or "Cell" in o.name) and o.type == 'MESH']
+
+def fracture_and_simulate(pot_obj, scatter_count, sim_frames):
+    """RBDLab scatter + cell fracture, rigid bodies on the shards, then run the simulation."""
+    scene = bpy.context.scene
+    if not scene.rigidbody_world:
+        bpy.ops.rigidbody.world_add()
+
+    bpy.ops.object.select_all(action='DESELECT')
+    bpy.context.view_layer.objects.active = pot_obj
+    pot_obj.select_set(True)
+
+    with production_stats.stage("fracture", scatter=scatter_count) as st:
+        scene.rbdlab.scatter_count = scatter_count
+        scene.rbdlab.current_using_cell_fracture = True
+        bpy.ops.rbdlab.scatter_add()
+        bpy.ops.rbdlab.cellfracture()
+
+        shards = find_shards(pot_obj.name)
+        st['shards'] = len(shards)
+
+    # Same rigid body setup as verify_rbdlab_automation ("Apply Fractures")
+    for obj in shards:
+        bpy.ops.object.select_all(action='DESELECT')
+        bpy.context.view_layer.objects.active = obj
+        obj.select_set(True)
+        if not obj.rigid_body:
+            bpy.ops.rigidbody.object_add(type='ACTIVE')
+        rb = obj.rigid_body
+        if rb:
+            rb.mass = 1.0
+            rb.collision_shape = 'CONVEX_HULL'
+            rb.use_margin = True
+            rb.collision_margin = 0.001
+
+    # Step the simulation frame by frame (fills the point cache)
+    with production_stats.stage("simulate", frames=sim_frames):
+        scene.frame_end = max(scene.frame_end, sim_frames)
+        for frame in range(1, sim_frames + 1):
+            scene.frame_set(frame)
+    return shards
+
+def produce_pot(pot_id, record, out_root, fmt, sim_frames, journal, builder="numpy", workers=1, writer=None,
+                method="uniform", levels=None):
+    pot_name = f"Pot_{pot_id:03d}"
+    # RBDLab's scatter uses its own RNG; seeding the global one is best effort
+    random.seed(record['seed'])
+
+    bpy.ops.jomon.cleanup_only(drain_writes=False)
+    with production_stats.stage("generate") as st:
+        generate_random_pots.create_floor(size=20, location=(0, 0, -0.2))
+        pot_obj = generate_random_pots.create_random_pot(name="Temp_Pot", location=(0, 0, 0), params=record['params'],
+                                                         builder=builder, roughness={'seed': record.get('roughness_seed')})
+        pot_obj.name = pot_name
+        st['faces'] = len(pot_obj.data.polygons)
+    journal.mark(pot_name, "generated", record['seed'])
+
+    scatter_count = record['scatter_count']
+    shards = fracture_and_simulate(pot_obj, scatter_count, sim_frames)
+    if len(shards) < 2:
+        raise RuntimeError(f"Fracture produced {len(shards)} shards")
+    journal.mark(pot_name, "fractured")
+
+    folder = os.path.join(out_root, pot_name)
+    os.makedirs(folder, exist_ok=True)
+    adjacency_list = mass_production.export_pot(shards, folder, pot_name, fmt, record['sampler_seed'],
+                                                record, journal, workers, writer, method, levels)
+    return {'shards': len(shards), 'facet_pairs': len(adjacency_list), 'scatter_count': scatter_count}
+
+def pot_record(args, pot_id, seed):
+    """Generation record of one pot: fresh from the seed, or the stored one with --regenerate."""
+    if args.regenerate:
+        record = pot_manifest.read_pot_manifest(os.path.join(args.out, f"Pot_{pot_id:03d}"))
+        if record is None:
+            raise RuntimeError("No manifest.json to regenerate from")
+        return record
+    return generate_random_pots.sample_pot_record(seed)
+
+def run_worker(args):
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, f"worker_{args.worker:02d}_manifest.json")
+    # One stats log per worker (parallel appends to one file are not safe everywhere)
+    stats_path = os.path.join(args.out, f"stats_worker_{args.worker:02d}.jsonl")
+    entries = []
+
+    mass_production.register()
+    journal = production_journal.ProductionJournal(args.out)
+    writer = mass_production.get_writer()
+
+    def collect_write_errors():
+        by_pot = {e['pot']: e for e in entries}
+        for pot, error in writer.pop_errors():
+            print(f"[worker {args.worker}] {pot}: background write failed: {error}")
+            if pot in by_pot:
+                by_pot[pot]['status'] = "failed"
+                by_pot[pot]['error'] = f"write: {error}"
+
+    for i in range(args.count):
+        pot_id = args.first_id + i
+        seed = args.seed_start + i
+        entry = {'id': pot_id, 'pot': f"Pot_{pot_id:03d}", 'seed': seed, 'worker': args.worker}
+        if journal.is_done(entry['pot']) and not args.regenerate:
+            entry['status'] = "ok"
+            entry['skipped'] = True
+            entries.append(entry)
+            print(f"[worker {args.worker}] {entry['pot']}: already exported, skipped")
+            continue
+        start = time.perf_counter()
+        production_stats.begin_pot(entry['pot'], stats_path)
+        try:
+            record = pot_record(args, pot_id, seed)
+            entry['seed'] = seed = record['seed']
+            entry.update(produce_pot(pot_id, record, args.out, args.format, args.sim_frames, journal, args.builder,
+                                     args.sample_workers or shard_sampler.default_workers(), writer, args.sampling,
+                                     sorted(set(args.levels)) if args.levels else None))
+            entry['status'] = "ok"
+        except Exception as e:
+            entry['status'] = "failed"
+            entry['error'] = str(e)
+        production_stats.end_pot(entry['status'], worker=args.worker, **({'error': entry['error']} if 'error' in entry else {}))
+        entry['seconds'] = round(time.perf_counter() - start, 2)
+        entries.append(entry)
+        print(f"[worker {args.worker}] {entry['pot']} (seed {seed}): {entry['status']} in {entry['seconds']} s")
+
+        collect_write_errors()
+        with open(manifest_path, 'w') as f:
+            json.dump(entries, f, indent=4)
+
+    # Everything queued has to be on disk before the worker exits
+    with production_stats.stage("drain_writes", jobs=writer.pending()):
+        writer.close()
+    collect_write_errors()
+    with open(manifest_path, 'w') as f:
+        json.dump(entries, f, indent=4)
+
+    journal.close()
+    bpy.ops.jomon.cleanup_only()
+    return entries
+
+if __name__ == "__main__":
+    run_worker(parse_args(sys.argv))
@@ -0,0 +1,218 @@
+import numpy as np
+
+# Static k-d tree in plain NumPy (no SciPy in Blender's Python).
+#
+# Balanced and implicit: node i has children 2i+1 / 2i+2, every leaf sits at
+# the same depth and holds at most leaf_size points. Each level is split at
+# the median of the widest dimension of every node at once (one lexsort per
+# level), and every node keeps its tight bounding box.
+#
+# Queries are batched too: each query first scans the leaves around its own
+# leaf for an initial k-th distance bound (or takes it from a hint point), then
+# all (query, node) pairs walk down the tree level by level, dropping nodes
+# whose box is farther than the bound. A query enters the walk at the deepest
+# ancestor whose cell holds its whole bound ball, so tight bounds skip most of
+# the levels. The surviving leaves are scanned as one [pairs, leaf_size]
+# distance block and a grouped sort keeps the k best per query.
+
+LEAF_SIZE = 16
+QUERY_CHUNK = 4096 # Queries per batch (bounds the frontier arrays)
+BOUND_LEAVES = 4   # Leaves around the query's own leaf scanned for the initial bound
+
+class KDTree:
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        if leaf_size < 2:
+            raise ValueError("leaf_size must be at least 2")
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        if self.points.ndim != 2:
+            raise ValueError("points must be [N, dim]")
+        n, dim = self.points.shape
+        self.n = n
+        self.dim = dim
+        self.depth = max(0, int(np.ceil(np.log2(max(n, 1) / leaf_size))))
+        self.num_leaves = 1 << self.depth
+        num_nodes = 2 * self.num_leaves - 1
+
+        # Segment [start, end) of every node in the permuted order
+        self.start = np.zeros(num_nodes, dtype=np.int64)
+        self.end = np.zeros(num_nodes, dtype=np.int64)
+        self.end[0] = n
+        self.split_dim = np.zeros(num_nodes, dtype=np.int64)
+        self.split_value = np.zeros(num_nodes)
+        perm = np.arange(n)
+
+        for level in range(self.depth):
+            nodes = np.arange((1 << level) - 1, (2 << level) - 1)
+            sizes = self.end[nodes] - self.start[nodes]
+            seg = np.repeat(np.arange(len(nodes)), sizes)
+            pts = self.points[perm]
+            starts = self.start[nodes]
+            lo = np.minimum.reduceat(pts, starts, axis=0)
+            hi = np.maximum.reduceat(pts, starts, axis=0)
+            dims = np.argmax(hi - lo, axis=1)
+            perm = perm[np.lexsort((pts[np.arange(n), dims[seg]], seg))]
+
+            mid = (self.start[nodes] + self.end[nodes]) // 2
+            self.split_dim[nodes] = dims
+            self.split_value[nodes] = self.points[perm[np.minimum(mid, n - 1)], dims]
+            self.start[2 * nodes + 1], self.end[2 * nodes + 1] = self.start[nodes], mid
+            self.start[2 * nodes + 2], self.end[2 * nodes + 2] = mid, self.end[nodes]
+        self.perm = perm
+
+        # Leaves padded to the largest one (padding = index -1, inf coordinates)
+        leaves = np.arange(self.num_leaves) + self.num_leaves - 1
+        leaf_sizes = self.end[leaves] - self.start[leaves]
+        self.leaf_width = max(int(leaf_sizes.max()), 1)
+        self.min_leaf = max(int(leaf_sizes.min()), 1)
+        cols = np.arange(self.leaf_width)
+        valid = cols[None, :] < leaf_sizes[:, None]
+        self.leaf_index = np.full((self.num_leaves, self.leaf_width), -1, dtype=np.int64)
+        self.leaf_index[valid] = perm
+        self.leaf_points = np.full((self.num_leaves, self.leaf_width, dim), np.inf)
+        self.leaf_points[valid] = self.points[perm]
+
+        # Tight boxes, leaves first (never empty for n > 0), then parents from their children
+        self.lo = np.full((num_nodes, dim), np.inf)
+        self.hi = np.full((num_nodes, dim), -np.inf)
+        if n:
+            pts = self.points[perm]
+            self.lo[leaves] = np.minimum.reduceat(pts, self.start[leaves], axis=0)
+            self.hi[leaves] = np.maximum.reduceat(pts, self.start[leaves], axis=0)
+        for level in range(self.depth - 1, -1, -1):
+            nodes = np.arange((1 << level) - 1, (2 << level) - 1)
+            self.lo[nodes] = np.minimum(self.lo[2 * nodes + 1], self.lo[2 * nodes + 2])
+            self.hi[nodes] = np.maximum(self.hi[2 * nodes + 1], self.hi[2 * nodes + 2])
+
+    def _leaf_of(self, x):
+        """(own leaf, [Q, depth] distance to each split plane on the way down)."""
+        node = np.zeros(len(x), dtype=np.int64)
+        margins = np.empty((len(x), self.depth))
+        for level in range(self.depth):
+            offset = x[np.arange(len(x)), self.split_dim[node]] - self.split_value[node]
+            right = offset >= 0
+            margins[:, level] = np.abs(offset)
+            node = 2 * node + 1 + right
+        return node - (self.num_leaves - 1), margins
+
+    def _box_dist2(self, x, nodes):
+        gap = np.maximum(self.lo[nodes] - x, 0) + np.maximum(x - self.hi[nodes], 0)
+        return (gap * gap).sum(axis=1)
+
+    def _start_level(self, margins, bound2):
+        """Deepest level on the query's own path whose cell strictly holds the bound ball.
+
+        Left subtrees hold coordinates <= split, right ones >= split, so a ball
+        strictly on one side of every split above a node cannot reach any other
+        subtree: the walk starts at that node.
+        """
+        if self.depth == 0:
+            return np.zeros(len(margins), dtype=np.int64)
+        r = np.sqrt(bound2)
+        clear = np.minimum.accumulate(margins, axis=1) > r[:, None]
+        return clear.sum(axis=1)
+
+    def _query_chunk(self, x, k, bound2, hint=None):
+        q_count = len(x)
+        own, margins = self._leaf_of(x)
+        if hint is not None and k == 1:
+            # Warm start (e.g. the previous ICP correspondence): any real point bounds the nearest
+            has = hint >= 0
+            bound2[has] = np.minimum(bound2[has], ((self.points[hint[has]] - x[has]) ** 2).sum(axis=1))
+        elif k <= self.n:
+            # k-th distance inside a small subtree around the query's own leaf
+            # that surely holds k points (leaves hold >= min_leaf)
+            span = min(BOUND_LEAVES, self.num_leaves)
+            while span < self.num_leaves and span * self.min_leaf < k:
+                span *= 2
+            leaves = (own // span * span)[:, None] + np.arange(span)
+            pts = self.leaf_points[leaves].reshape(q_count, -1, self.dim)
+            d2 = ((pts - x[:, None, :]) ** 2).sum(axis=2)
+            bound2 = np.minimum(bound2, np.partition(d2, k - 1, axis=1)[:, k - 1])
+
+        # Level-by-level walk of (query, node) pairs with box pruning, each
+        # query entering at its start level
+        start = self._start_level(margins, bound2)
+        queries = np.arange(q_count)
+        q = np.zeros(0, dtype=np.int64)
+        node = np.zeros(0, dtype=np.int64)
+        for level in range(self.depth + 1):
+            enter = queries[start == level]
+            q = np.concatenate([q, enter])
+            node = np.concatenate([node, (own[enter] >> (self.depth - level)) + (1 << level) - 1])
+            if level == self.depth:
+                break
+            q = np.repeat(q, 2)
+            node = (2 * np.repeat(node, 2) + 1) + np.tile([0, 1], len(node))
+            keep = self._box_dist2(x[q], node) <= bound2[q]
+            q, node = q[keep], node[keep]
+
+        leaf = node - (self.num_leaves - 1)
+        d2 = ((self.leaf_points[leaf] - x[q][:, None, :]) ** 2).sum(axis=2)
+        cand_i = self.leaf_index[leaf]
+        if k < self.leaf_width:
+            # Only the k best of every visited leaf can make it
+            best = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            d2 = np.take_along_axis(d2, best, axis=1)
+            cand_i = np.take_along_axis(cand_i, best, axis=1)
+        cand_q = np.repeat(q, d2.shape[1])
+        cand_d2 = d2.reshape(-1)
+        cand_i = cand_i.reshape(-1)
+        ok = (cand_i >= 0) & (cand_d2 <= bound2[cand_q])
+        cand_q, cand_d2, cand_i = cand_q[ok], cand_d2[ok], cand_i[ok]
+
+        dist = np.full((q_count, k), np.inf)
+        idx = np.full((q_count, k), -1, dtype=np.int64)
+        if k == 1:
+            # Nearest per query: group by query, first minimum of each group
+            order = np.argsort(cand_q, kind='stable')
+            cand_q, cand_d2, cand_i = cand_q[order], cand_d2[order], cand_i[order]
+            if len(cand_q) == 0:
+                return dist, idx
+            starts = np.flatnonzero(np.r_[True, cand_q[1:] != cand_q[:-1]])
+            group = np.cumsum(np.r_[False, cand_q[1:] != cand_q[:-1]])
+            best_d2 = np.minimum.reduceat(cand_d2, starts)
+            # Ties -> lowest point index, as in the k > 1 path
+            winner = np.where(cand_d2 == best_d2[group], cand_i, np.iinfo(np.int64).max)
+            dist[cand_q[starts], 0] = np.sqrt(best_d2)
+            idx[cand_q[starts], 0] = np.minimum.reduceat(winner, starts)
+            return dist, idx
+
+        # k best per query: sort by (query, distance), rank inside each group
+        order = np.lexsort((cand_i, cand_d2, cand_q))
+        cand_q, cand_d2, cand_i = cand_q[order], cand_d2[order], cand_i[order]
+        first = np.searchsorted(cand_q, cand_q, side='left')
+        rank = np.arange(len(cand_q)) - first
+        top = rank < k
+        dist[cand_q[top], rank[top]] = np.sqrt(cand_d2[top])
+        idx[cand_q[top], rank[top]] = cand_i[top]
+        return dist, idx
+
+    def query(self, x, k=1, distance_upper_bound=np.inf, hint=None):
+        """k nearest points of every row of x.
+
+        Returns (dist [Q,k], idx [Q,k]) sorted by distance; missing neighbours
+        (fewer than k points, or none within distance_upper_bound) are inf / -1.
+        distance_upper_bound: scalar or [Q] per query.
+        hint (k=1 only): [Q] point indices expected near each query (-1 = none),
+        e.g. last iteration's matches; they only tighten the search bound.
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        if x.shape[1] != self.dim:
+            raise ValueError(f"Queries must have {self.dim} columns")
+        dist = np.full((len(x), k), np.inf)
+        idx = np.full((len(x), k), -1, dtype=np.int64)
+        if self.n == 0 or k <= 0:
+            return dist, idx
+        bounds = np.broadcast_to(np.asarray(distance_upper_bound, dtype=np.float64), len(x))
+        for s in range(0, len(x), QUERY_CHUNK):
+            chunk = x[s:s + QUERY_CHUNK]
+            bound2 = bounds[s:s + QUERY_CHUNK] ** 2
+            chunk_hint = None if hint is None else np.asarray(hint)[s:s + QUERY_CHUNK]
+            dist[s:s + QUERY_CHUNK], idx[s:s + QUERY_CHUNK] = self._query_chunk(chunk, k, bound2, chunk_hint)
+        return dist, idx
+
+def bruteforce_query(points, x, k=1):
+    """O(N*Q) reference for KDTree.query (tests and benchmarks)."""
+    d = np.linalg.norm(np.asarray(x, dtype=np.float64)[:, None, :] - np.asarray(points)[None, :, :], axis=2)
+    idx = np.argsort(d, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(d, idx, axis=1), idx
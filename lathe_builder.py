@@ -0,0 +1,170 @@
+import numpy as np
+
+# Pure-NumPy lathe builder for the pot body.
+#
+# Replaces the Curve -> Screw -> Solidify -> Convert -> Subsurf operator chain
+# of create_random_pot: the 7-point Bezier profile (x = radius, z = height) is
+# evaluated like a Blender curve, revolved around Z, thickened inwards and
+# returned as flat arrays ready for foreach_set (no bpy needed here).
+#
+# Faces are stored the way Blender stores polygons: face_sizes [F] and the
+# concatenated vertex indices face_verts [sum(face_sizes)].
+
+PROFILE_RESOLUTION = 12 # Blender curve default resolution_u
+LATHE_STEPS = 32        # Screw modifier steps
+WALL_THICKNESS = 0.03   # Solidify thickness (3cm, inwards)
+MERGE_DIST = 0.001      # Screw merge threshold: profile points on the axis become one vertex
+
+def bezier_handles(points, handle_types):
+    """Left/right handles of an open Bezier spline ('VECTOR' / 'AUTO' like Blender).
+
+    Blender's rule: AUTO handles follow the bisector of the neighbour
+    directions scaled by the neighbour distances / 2.5614, VECTOR handles
+    point a third of the way to the neighbour. End points mirror their only
+    neighbour.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    left = np.empty_like(points)
+    right = np.empty_like(points)
+    for i in range(n):
+        p2 = points[i]
+        p1 = points[i - 1] if i > 0 else 2 * p2 - points[i + 1]
+        p3 = points[i + 1] if i < n - 1 else 2 * p2 - points[i - 1]
+        dvec_a = p2 - p1
+        dvec_b = p3 - p2
+        len_a = np.linalg.norm(dvec_a) or 1.0
+        len_b = np.linalg.norm(dvec_b) or 1.0
+
+        if handle_types[i] == 'AUTO':
+            tvec = dvec_b / len_b + dvec_a / len_a
+            length = np.linalg.norm(tvec) * 2.5614
+            if length != 0:
+                left[i] = p2 - tvec * (len_a / length)
+                right[i] = p2 + tvec * (len_b / length)
+                continue
+        left[i] = p2 - dvec_a / 3.0
+        right[i] = p2 + dvec_b / 3.0
+    return left, right
+
+def evaluate_profile(points, handle_types, resolution=PROFILE_RESOLUTION):
+    """Points along the spline: `resolution` per segment plus the last control point."""
+    points = np.asarray(points, dtype=np.float64)
+    left, right = bezier_handles(points, handle_types)
+
+    t = np.arange(resolution) / resolution
+    basis = np.stack([(1 - t) ** 3, 3 * t * (1 - t) ** 2, 3 * t ** 2 * (1 - t), t ** 3], axis=1)
+    # [segments, 4 control points, 3]
+    ctrl = np.stack([points[:-1], right[:-1], left[1:], points[1:]], axis=1)
+    curve = np.einsum('tk,skd->std', basis, ctrl).reshape(-1, 3)
+    return np.vstack([curve, points[-1:]])
+
+def revolve(profile, steps=LATHE_STEPS):
+    """Revolves an XZ profile around Z. Returns (verts, face_sizes, face_verts).
+
+    Profile points within MERGE_DIST of the axis become a single vertex
+    (triangle fan), the others a ring of `steps` vertices. Faces wind so the
+    normals point away from the axis for a profile running bottom-out-up.
+    """
+    radius = profile[:, 0]
+    height = profile[:, 2]
+    on_axis = np.abs(radius) < MERGE_DIST
+    angles = np.arange(steps) * (2 * np.pi / steps)
+
+    verts = []
+    rings = [] # per profile point: [steps] vertex indices (axis point repeated)
+    count = 0
+    for k in range(len(profile)):
+        if on_axis[k]:
+            verts.append([[0.0, 0.0, height[k]]])
+            rings.append(np.full(steps, count))
+            count += 1
+        else:
+            verts.append(np.stack([radius[k] * np.cos(angles), radius[k] * np.sin(angles), np.full(steps, height[k])], axis=1))
+            rings.append(count + np.arange(steps))
+            count += steps
+    verts = np.vstack(verts)
+
+    sizes, loops = [], []
+    nxt = np.roll(np.arange(steps), -1)
+    for k in range(len(profile) - 1):
+        a, b = rings[k], rings[k + 1]
+        if on_axis[k] and on_axis[k + 1]: continue
+        if on_axis[k]:
+            quad = np.stack([a, b[nxt], b], axis=1)
+        elif on_axis[k + 1]:
+            quad = np.stack([a, a[nxt], b], axis=1)
+        else:
+            quad = np.stack([a, a[nxt], b[nxt], b], axis=1)
+        sizes.append(np.full(steps, quad.shape[1]))
+        loops.append(quad.reshape(-1))
+    return verts, np.concatenate(sizes), np.concatenate(loops)
+
+def face_starts(face_sizes):
+    return np.cumsum(face_sizes) - face_sizes
+
+def vertex_normals(verts, face_sizes, face_verts):
+    """Area-weighted vertex normals (faces fanned into triangles)."""
+    starts = face_starts(face_sizes)
+    normals = np.zeros_like(verts)
+    for corner in range(1, face_sizes.max() - 1):
+        has = face_sizes > corner + 1
+        a = verts[face_verts[starts[has]]]
+        b = verts[face_verts[starts[has] + corner]]
+        c = verts[face_verts[starts[has] + corner + 1]]
+        tri_n = np.cross(b - a, c - a)
+        for offset in (0, corner, corner + 1):
+            idx = face_verts[starts[has] + offset]
+            for d in range(3):
+                normals[:, d] += np.bincount(idx, tri_n[:, d], minlength=len(verts))
+    length = np.linalg.norm(normals, axis=1)
+    length[length == 0] = 1.0
+    return normals / length[:, None]
+
+def boundary_edges(face_sizes, face_verts):
+    """Directed edges (u, v) whose reverse (v, u) is not in the mesh."""
+    starts = face_starts(face_sizes)
+    nxt = np.arange(len(face_verts)) + 1
+    ends = starts + face_sizes
+    wrap = np.isin(nxt, ends)
+    nxt[wrap] = np.repeat(starts, face_sizes)[wrap]
+    u = face_verts
+    v = face_verts[nxt]
+
+    n = int(face_verts.max()) + 1
+    forward = u.astype(np.int64) * n + v
+    reverse = v.astype(np.int64) * n + u
+    open_edge = ~np.isin(forward, reverse)
+    return u[open_edge], v[open_edge]
+
+def solidify(verts, face_sizes, face_verts, thickness=WALL_THICKNESS):
+    """Solidify (offset -1, rim fill): inner shell along -normal plus rim quads."""
+    nv = len(verts)
+    inner = verts - vertex_normals(verts, face_sizes, face_verts) * thickness
+
+    # Inner shell with reversed winding
+    starts = face_starts(face_sizes)
+    local = np.arange(len(face_verts)) - np.repeat(starts, face_sizes)
+    flipped = np.repeat(starts + face_sizes - 1, face_sizes) - local
+    inner_loops = face_verts[flipped] + nv
+
+    # Rim quads along the open boundary (the pot mouth)
+    u, v = boundary_edges(face_sizes, face_verts)
+    rim = np.stack([v, u, u + nv, v + nv], axis=1).reshape(-1)
+
+    all_verts = np.vstack([verts, inner])
+    all_sizes = np.concatenate([face_sizes, face_sizes, np.full(len(u), 4)])
+    all_loops = np.concatenate([face_verts, inner_loops, rim])
+    return all_verts, all_sizes, all_loops
+
+def build_lathe(points, handle_types, resolution=PROFILE_RESOLUTION, steps=LATHE_STEPS,
+                thickness=WALL_THICKNESS, subdivisions=0):
+    """Profile -> revolved, thickened pot mesh. Returns (verts, face_sizes, face_verts).
+
+    subdivisions doubles the profile resolution and the lathe steps per level
+    (the surface is re-evaluated from the exact curve instead of Catmull-Clark).
+    """
+    scale = 2 ** subdivisions
+    profile = evaluate_profile(points, handle_types, resolution * scale)
+    verts, sizes, loops = revolve(profile, steps * scale)
+    return solidify(verts, sizes, loops, thickness)
@@ -0,0 +1,128 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import subprocess
+
+import production_journal
+
+# Starts N background Blender workers (headless_factory.py) on disjoint
+# ID/seed ranges and merges their manifests into <out>/manifest.json.
+#
+#   python launch_factory.py --blender "C:\Program Files\Blender Foundation\Blender 4.2\blender.exe" \
+#       --out dataset_batch_002 --workers 8 --count 1000 --first-id 1 --seed-start 1000
+#
+# Runs with plain Python (no bpy needed).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BLEND = os.path.join(HERE, "Jomon_Pottery_Base.blend")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Launch parallel headless pot factory workers")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--blend", default=DEFAULT_BLEND, help="Base .blend with RBDLab enabled")
+    parser.add_argument("--out", required=True, help="Dataset root")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--count", type=int, required=True, help="Total number of pots")
+    parser.add_argument("--first-id", type=int, default=1)
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--format", default="json", choices=["json", "bin", "quant"])
+    parser.add_argument("--threads", type=int, default=1, help="Blender threads per worker (0 = auto)")
+    parser.add_argument("--sampling", default="uniform", choices=["uniform", "fps", "poisson"])
+    parser.add_argument("--levels", type=int, nargs="+", help="Nested point levels per shard")
+    parser.add_argument("--builder", default="numpy", choices=["numpy", "modifiers"],
+                        help="Pot mesh builder (lathe_builder or the legacy modifier stack)")
+    parser.add_argument("--sample-workers", type=int, default=1,
+                        help="Sampling threads per worker (processes already run in parallel)")
+    return parser.parse_args(argv)
+
+def split_range(count, workers):
+    """[(offset, n), ...] contiguous chunks covering range(count)."""
+    workers = max(1, min(workers, count))
+    base, extra = divmod(count, workers)
+    chunks = []
+    offset = 0
+    for k in range(workers):
+        n = base + (1 if k < extra else 0)
+        chunks.append((offset, n))
+        offset += n
+    return chunks
+
+def worker_command(args, worker, offset, n):
+    return [
+        args.blender, "-b", args.blend,
+        "--threads", str(args.threads),
+        "--python", os.path.join(HERE, "headless_factory.py"),
+        "--",
+        "--out", args.out,
+        "--first-id", str(args.first_id + offset),
+        "--count", str(n),
+        "--seed-start", str(args.seed_start + offset),
+        "--worker", str(worker),
+        "--format", args.format,
+        "--sample-workers", str(args.sample_workers),
+        "--sampling", args.sampling,
+        "--builder", args.builder,
+    ] + (["--levels"] + [str(v) for v in args.levels] if args.levels else [])
+
+def merge_manifests(out_root, workers=None):
+    """Combines worker manifests into manifest.json (sorted by pot ID).
+
+    workers: indices launched in this run (default: every worker_*_manifest.json).
+    Manifests left by an earlier run with more workers are not merged then, and
+    a pot listed twice keeps the entry of the most recently written manifest.
+    """
+    if workers is None:
+        paths = glob.glob(os.path.join(out_root, "worker_*_manifest.json"))
+    else:
+        paths = [os.path.join(out_root, f"worker_{w:02d}_manifest.json") for w in workers]
+    by_id = {}
+    for path in sorted((p for p in paths if os.path.exists(p)), key=os.path.getmtime):
+        with open(path, 'r') as f:
+            by_id.update((e['id'], e) for e in json.load(f))
+    entries = sorted(by_id.values(), key=lambda e: e['id'])
+
+    manifest = {
+        'pots': entries,
+        'ok': sum(1 for e in entries if e.get('status') == "ok"),
+        'failed': sum(1 for e in entries if e.get('status') != "ok"),
+    }
+    with open(os.path.join(out_root, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+def launch(args):
+    args.out = os.path.abspath(args.out)
+    os.makedirs(os.path.join(args.out, "logs"), exist_ok=True)
+    start = time.time()
+
+    # Create the shared journal up front (workers then only open it)
+    journal = production_journal.ProductionJournal(args.out)
+    print(f"Journal: {journal.summary()}")
+    journal.close()
+
+    procs = []
+    for worker, (offset, n) in enumerate(split_range(args.count, args.workers)):
+        if n == 0: continue
+        log = open(os.path.join(args.out, "logs", f"worker_{worker:02d}.log"), 'w')
+        cmd = worker_command(args, worker, offset, n)
+        print(f"Worker {worker}: IDs {args.first_id + offset}-{args.first_id + offset + n - 1}, "
+              f"seeds {args.seed_start + offset}-{args.seed_start + offset + n - 1}")
+        procs.append((worker, subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT), log))
+
+    for worker, proc, log in procs:
+        code = proc.wait()
+        log.close()
+        if code != 0:
+            print(f"Worker {worker} exited with code {code} (see logs/worker_{worker:02d}.log)")
+
+    manifest = merge_manifests(args.out, [worker for worker, _, _ in procs])
+    hours = (time.time() - start) / 3600
+    rate = manifest['ok'] / hours if hours > 0 else 0
+    print(f"Done: {manifest['ok']} ok, {manifest['failed']} failed in {hours:.2f} h ({rate:.0f} pots/hour)")
+    return manifest
+
+if __name__ == "__main__":
+    launch(parse_args(sys.argv[1:]))
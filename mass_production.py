@@ -1,17 +1,185 @@
 import bpy
 import os
 import sys
+import json
 import importlib
 
 # Ensure path is available for imports
 sys.path.append(r"c:\Users\k4849\Documents\VibeCording\Jomon_Pottery_Reconstruction")
 import generate_random_pots
 import export_shards_data
+import shard_sampler
+import pointcloud_io
+import facet_adjacency
+import facet_descriptors
+import facet_icp
+import pot_manifest
+import production_journal
+import production_stats
+import async_writer
 import verify_rbdlab_automation # We'll borrow fracture setup logic if needed, or implement here
 
 # Force reload
 importlib.reload(generate_random_pots)
 importlib.reload(export_shards_data)
+importlib.reload(shard_sampler)
+importlib.reload(pointcloud_io)
+importlib.reload(facet_adjacency)
+importlib.reload(facet_descriptors)
+importlib.reload(facet_icp)
+importlib.reload(pot_manifest)
+importlib.reload(production_journal)
+importlib.reload(production_stats)
+importlib.reload(async_writer)
+
+NUM_POINTS = 2048 # Points per shard unless nested levels are exported
+
+_writer = None
+
+def get_writer():
+    """Background writer shared by the export loop (started on first use)."""
+    global _writer
+    if _writer is None or not _writer.thread.is_alive():
+        _writer = async_writer.AsyncWriter()
+    return _writer
+
+def write_json(path, data, indent=4, fsync=False):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return path
+
+def finish_export(folder, pot_name, written, record=None, journal=None, **manifest):
+    """Writes the manifest, then hashes every file and marks the pot exported."""
+    if record:
+        pot_manifest.write_pot_manifest(folder, record, pot=pot_name, **manifest)
+        written = written + [os.path.join(folder, pot_manifest.MANIFEST_NAME)]
+    # Finished only once every file is on disk and hashed
+    if journal:
+        journal.record_files(pot_name, written)
+        journal.mark(pot_name, "exported")
+
+def finish_export_job(journal_dir, *args, **kwargs):
+    """finish_export() for the writer thread (sqlite connections stay on their thread)."""
+    journal = production_journal.ProductionJournal(journal_dir) if journal_dir else None
+    try:
+        finish_export(*args, journal=journal, **kwargs)
+    finally:
+        if journal:
+            journal.close()
+
+def export_pot(shards, folder, pot_name, fmt="json", sampler_seed=None, record=None, journal=None, workers=1,
+               writer=None, method="uniform", levels=None, export_frame=None):
+    """Segments the fractured shards of one pot and writes adjacency.json, poses.json
+    (facet_icp), point clouds and facets.npy (facet_descriptors, from the arrays
+    extracted for sampling).
+
+    sampler_seed (from the pot record) makes the point sampling reproducible.
+    record: pot record written to manifest.json; journal: ProductionJournal that
+    gets the stage updates and the checksums of every written file.
+    workers: threads for sampling + writing the shard files (extraction stays here).
+    writer: AsyncWriter -> files, manifest and checksums are queued (tag pot_name)
+    and this returns as soon as the shards are sampled.
+    method: point distribution ("uniform", "fps", "poisson", see shard_sampler).
+    levels: nested resolutions, e.g. [512, 1024, 2048, 8192]; max(levels) points
+    are sampled once and every level is a prefix of each file.
+    export_frame: frame the point clouds are sampled at (None = the scene's current
+    frame), e.g. once the rigid body simulation has scattered the shards. Adjacency
+    and poses.json's frame_1 come from frame 1, as in export_shards_data.
+    """
+    if export_frame is None:
+        export_frame = bpy.context.scene.frame_current
+    num_points = max(levels) if levels else NUM_POINTS
+    meta = {'levels': list(levels)} if levels else None
+    if writer and not writer.begin(pot_name):
+        print(f"Writes of an earlier attempt of {pot_name} are still queued, its failure (if any) still applies")
+    # 1. Segmentation first, so adjacency and labels see this pot's facets
+    # Run Segmentation logic (using external script logic inline or imported)
+    # Using imported for stability as defined in 'export_shards_data.py' logic
+    try:
+        import facet_segmentation_v6_majority
+        importlib.reload(facet_segmentation_v6_majority)
+        facet_segmentation_v6_majority.apply_segmentation_to_objects(shards)
+    except Exception as e:
+        print(f"Segmentation Warning: {e}")
+    if journal:
+        journal.mark(pot_name, "segmented")
+
+    # 2. Adjacency
+    bpy.context.scene.frame_set(1)
+    bpy.context.view_layer.update()
+    
+    with production_stats.stage("adjacency") as st:
+        facet_data, mat_to_id = facet_adjacency.collect_facets(shards)
+        pairs = facet_adjacency.pair_facets(facet_data, max_dist=2.0)
+        adjacency_list = facet_adjacency.adjacency_from_pairs(facet_data, pairs)
+                    
+        written = [os.path.join(folder, "adjacency.json")]
+        if writer:
+            writer.submit(write_json, written[0], adjacency_list, fsync=True, tag=pot_name)
+        else:
+            write_json(written[0], adjacency_list)
+        st.update(facets=len(facet_data), pairs=len(adjacency_list))
+
+        frame_1 = {obj.name: obj.matrix_world.copy() for obj in shards}
+
+    # 3. Point clouds at the export (scattered) frame; assembled vs exported pose
+    # of every shard is the ground truth for facet_icp / reassembly
+    bpy.context.scene.frame_set(export_frame)
+    bpy.context.view_layer.update()
+    poses = {obj.name: facet_icp.pose_entry(frame_1[obj.name], obj.matrix_world) for obj in shards}
+    if all(frame_1[obj.name] == obj.matrix_world for obj in shards):
+        print(f"{pot_name}: shards did not move between frame 1 and frame {export_frame}, "
+              f"its poses.json is trivial (no use for evaluating facet_icp / reassembly)")
+    written.append(os.path.join(folder, facet_icp.POSES_NAME))
+    if writer:
+        writer.submit(facet_icp.save_poses, folder, poses, fsync=True, tag=pot_name)
+    else:
+        facet_icp.save_poses(folder, poses)
+
+    with production_stats.stage("points", shards=len(shards), workers=workers, method=method) as st:
+        described = []
+        prepared = (shard_sampler.prepare_shard(obj, mat_to_id) for obj in shards)
+        results = shard_sampler.sample_prepared_shards(
+            facet_descriptors.describing(prepared, [obj.name for obj in shards], described), num_points,
+            seeds=[shard_sampler.shard_seed(sampler_seed, obj.name) for obj in shards],
+            workers=workers, method=method, levels=levels,
+            write=None if writer else lambda k, sample: pointcloud_io.write_shard(folder, shards[k].name, sample, fmt,
+                                                                                   meta=meta))
+        for obj, (sample, timings, path) in zip(shards, results):
+            print(shard_sampler.format_timings(obj.name, timings, num_points))
+            if writer:
+                writer.submit(pointcloud_io.write_shard, folder, obj.name, sample, fmt, fsync=True, meta=meta,
+                              tag=pot_name)
+                path = os.path.join(folder, obj.name + pointcloud_io.FORMAT_EXTENSIONS[fmt])
+            written.append(path)
+            st['points'] = st.get('points', 0) + len(sample['pos'])
+            st['extract_seconds'] = st.get('extract_seconds', 0.0) + timings['extract']
+            st['sample_seconds'] = st.get('sample_seconds', 0.0) + timings['sample']
+
+    # 4. Facet descriptors
+    with production_stats.stage("descriptors") as st:
+        table = facet_descriptors.facet_table(described, {f['id']: f['nb_name'] for f in facet_data})
+        written.append(os.path.join(folder, facet_descriptors.FACETS_NAME))
+        if writer:
+            writer.submit(facet_descriptors.save_facets, folder, table, fsync=True, tag=pot_name)
+        else:
+            facet_descriptors.save_facets(folder, table)
+        st.update(facets=len(table))
+
+    # 5. Manifest + checksums (queued after the pot's files, the writer runs jobs in order)
+    manifest = dict(shards=len(shards), format=fmt, sampling=method, points=num_points, export_frame=export_frame)
+    if levels:
+        manifest['levels'] = list(levels)
+    if writer:
+        journal_dir = os.path.dirname(journal.path) if journal else None
+        writer.submit(finish_export_job, journal_dir, folder, pot_name, written, record, tag=pot_name, **manifest)
+    else:
+        with production_stats.stage("checksums", files=len(written)):
+            finish_export(folder, pot_name, written, record, journal, **manifest)
+    return adjacency_list
 
 class JomonFactoryProperties(bpy.types.PropertyGroup):
     output_path: bpy.props.StringProperty(
@@ -20,6 +188,52 @@ class JomonFactoryProperties(bpy.types.PropertyGroup):
         subtype='DIR_PATH'
     )
     current_id: bpy.props.IntProperty(name="Current ID", default=10, min=1)
+    sample_workers: bpy.props.IntProperty(
+        name="Sampling Threads",
+        description="Threads for point sampling and file writing (0 = auto, 1 = serial)",
+        default=0,
+        min=0,
+        max=64
+    )
+    base_seed: bpy.props.IntProperty(
+        name="Base Seed",
+        description="Pot N is generated with seed Base Seed + N (recorded in Pot_XXX/manifest.json)",
+        default=0,
+        min=0
+    )
+    sampling_method: bpy.props.EnumProperty(
+        name="Point Sampling",
+        description="Distribution of the points per shard",
+        items=[
+            ('uniform', "Uniform", "Random area-weighted points (fastest)"),
+            ('fps', "Farthest Point", "Farthest-point sampling of a dense pre-sample (even coverage)"),
+            ('poisson', "Poisson Disk", "Blue-noise points with a minimum spacing"),
+        ],
+        default='uniform'
+    )
+    export_frame: bpy.props.IntProperty(
+        name="Export Frame",
+        description="Frame the point clouds are sampled at, once the simulation has scattered the shards "
+                    "(0 = current frame; at frame 1 poses.json holds no motion)",
+        default=0,
+        min=0
+    )
+    point_levels: bpy.props.StringProperty(
+        name="Point Levels",
+        description="Nested resolutions, e.g. '512,1024,2048,8192': the largest is sampled once and "
+                    "every level is a prefix of the file (empty = 2048 points)",
+        default=""
+    )
+    export_format: bpy.props.EnumProperty(
+        name="Point Format",
+        description="File format for shard point clouds",
+        items=[
+            ('json', "JSON", "Legacy list of pos/norm/label dicts (.json)"),
+            ('bin', "Binary", "Columnar float32/int32 arrays, memory-mappable (.jpc)"),
+            ('quant', "Quantized", "int16 positions/normals, uint16 labels, compressed (.jpc)"),
+        ],
+        default='json'
+    )
     
     promo_grid_rows: bpy.props.IntProperty(
         name="Grid Rows",
@@ -39,88 +253,105 @@ class JomonFactoryProperties(bpy.types.PropertyGroup):
 class JOMON_OT_GeneratePot(bpy.types.Operator):
     """Generates a new pot and prepares it for fracturing."""
     bl_idname = "jomon.generate_pot"
-    bl_label = "1. Generate & Fracture Setup"
+    bl_label = "1. Spawn & Fracture"
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        print("--- RUNNING GENERATE POT V3 (Fix Cleanup) ---")
         props = context.scene.jomon_props
         
-        # 1. Determine Next ID from folder scan
-        # Scan explicitly to be safe
-        existing_pots = []
-        if os.path.exists(props.output_path):
-            for d in os.listdir(props.output_path):
-                if d.startswith("Pot_") and os.path.isdir(os.path.join(props.output_path, d)):
-                    try:
-                        num = int(d.split("_")[1])
-                        existing_pots.append(num)
-                    except: pass
+        # 1. Next ID from the completion journal: an unfinished pot is retried
+        # first, otherwise one past the last exported pot (no folder scan).
+        # Pots still being written in the background are not unfinished.
+        journal = production_journal.ProductionJournal(props.output_path)
+        props.current_id = journal.next_id(default=props.current_id, exclude=get_writer().pending_tags())
+        pot_name = f"Pot_{props.current_id:03d}"
         
-        next_id = 1
-        if existing_pots:
-            next_id = max(existing_pots) + 1
+        record = generate_random_pots.sample_pot_record(pot_manifest.pot_seed(props.base_seed, props.current_id))
+        production_stats.begin_pot(pot_name, os.path.join(props.output_path, production_stats.STATS_NAME))
+        with production_stats.stage("generate"):
+            result = spawn_pot(self, context, record)
+        if result == {'FINISHED'}:
+            journal.mark(pot_name, "generated", record['seed'])
+        journal.close()
+        return result
+
+def spawn_pot(op, context, record):
+    """Cleanup + build the pot described by `record` (see pot_manifest) + RBDLab setup."""
+    import json
+    import random
+    props = context.scene.jomon_props
+
+    # 1. Cleanup Scene First (Aggressive); background writes of the previous pot keep going
+    bpy.ops.jomon.cleanup_only(drain_writes=False)
+    
+    # 2. Generate Pot
+    pot_name = f"Pot_{props.current_id:03d}"
+    location = (0, 0, 0) # Center
+    
+    # RBDLab's scatter RNG is not exposed; seeding the global one is best effort
+    random.seed(record['seed'])
+    
+    try:
+        # Create Floor if missing (Hidden)
+        generate_random_pots.create_floor(size=20, location=(0,0,-0.2))
         
-        props.current_id = next_id
+        # Create Pot
+        # NOTE: generates 'Tempo_Pot' then renames
+        pot_obj = generate_random_pots.create_random_pot(name="Temp_Pot", location=location, params=record['params'],
+                                                           roughness={'seed': record.get('roughness_seed')})
+        pot_obj.name = pot_name
         
-        # 2. Cleanup Scene (delete old RND_Pot_*, PROOF_*, etc.)
-    bl_label = "1. Spawn & Fracture"
-    bl_options = {'REGISTER', 'UNDO'}
+        # Ensure it is active
+        bpy.context.view_layer.objects.active = pot_obj
+        pot_obj.select_set(True)
+        
+    except Exception as e:
+        op.report({'ERROR'}, f"Generation Failed: {e}")
+        return {'CANCELLED'}
 
-    def execute(self, context):
-        props = context.scene.jomon_props
+    # Remember the record so ExportNext can write it next to the data
+    context.scene["jomon_pot_record"] = json.dumps(dict(record, pot=pot_name))
+    
+    # 3. Setup Rigid Body World if missing
+    if not bpy.context.scene.rigidbody_world:
+        bpy.ops.rigidbody.world_add()
         
-        # 1. Cleanup Scene First (Aggressive)
-        bpy.ops.jomon.cleanup_only()
+    # 4. RBDLab Autos Setup & Fracture
+    try:
+        # Scatter count comes from the pot record
+        bpy.context.scene.rbdlab.scatter_count = record['scatter_count']
         
-        # 2. Generate Pot
-        pot_name = f"Pot_{props.current_id:03d}"
-        location = (0, 0, 0) # Center
+        # Add Scatter
+        # bpy.ops.rbdlab.scatter_add()
         
-        try:
-            # Create Floor if missing (Hidden)
-            generate_random_pots.create_floor(size=20, location=(0,0,-0.2))
-            
-            # Create Pot
-            # NOTE: generates 'Tempo_Pot' then renames
-            pot_obj = generate_random_pots.create_random_pot(name="Temp_Pot", location=(0,0,0)) 
-            pot_obj.name = pot_name
-            
-            # Ensure it is active
-            bpy.context.view_layer.objects.active = pot_obj
-            pot_obj.select_set(True)
-            
-        except Exception as e:
-            self.report({'ERROR'}, f"Generation Failed: {e}")
-            return {'CANCELLED'}
+        # Enable Cell Fracture Mode
+        # bpy.context.scene.rbdlab.current_using_cell_fracture = True
         
-        # 3. Setup Rigid Body World if missing
-        if not bpy.context.scene.rigidbody_world:
-            bpy.ops.rigidbody.world_add()
-            
-        # 4. RBDLab Autos Setup & Fracture
-        try:
-            # Set scatter count (randomize slightly to avoid deterministic glitches)
-            import random
-            count = random.randint(45, 65)
-            bpy.context.scene.rbdlab.scatter_count = count
-            
-            # Add Scatter
-            # bpy.ops.rbdlab.scatter_add()
-            
-            # Enable Cell Fracture Mode
-            # bpy.context.scene.rbdlab.current_using_cell_fracture = True
-            
-            # Execute Fracture (This creates the cells but DOES NOT Apply Physics yet)
-            # bpy.ops.rbdlab.cellfracture()
-            
-            self.report({'INFO'}, f"Generated {pot_name}. (Fracture Disabled for Debug)")
-            
-        except Exception as e:
-            self.report({'WARNING'}, f"RBDLab Auto-Fracture Failed: {e}")
-            return {'CANCELLED'}
+        # Execute Fracture (This creates the cells but DOES NOT Apply Physics yet)
+        # bpy.ops.rbdlab.cellfracture()
+        
+        op.report({'INFO'}, f"Generated {pot_name} (seed {record['seed']}). (Fracture Disabled for Debug)")
+        
+    except Exception as e:
+        op.report({'WARNING'}, f"RBDLab Auto-Fracture Failed: {e}")
+        return {'CANCELLED'}
 
-        return {'FINISHED'}
+    return {'FINISHED'}
+
+class JOMON_OT_RegeneratePot(bpy.types.Operator):
+    """Rebuilds Pot_<Current ID> from its manifest.json (same shape, scatter count and seeds)."""
+    bl_idname = "jomon.regenerate_pot"
+    bl_label = "Regenerate From Manifest"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        props = context.scene.jomon_props
+        folder = os.path.join(props.output_path, f"Pot_{props.current_id:03d}")
+        record = pot_manifest.read_pot_manifest(folder)
+        if record is None:
+            self.report({'ERROR'}, f"No manifest in {folder}")
+            return {'CANCELLED'}
+        return spawn_pot(self, context, record)
 
 class JOMON_OT_HideOriginal(bpy.types.Operator):
     """Manually hides the original pot if it overlaps."""
@@ -159,6 +390,11 @@ class JOMON_OT_ExportNext(bpy.types.Operator):
         pot_id_str = f"Pot_{props.current_id:03d}"
         target_dir = os.path.join(props.output_path, pot_id_str)
         
+        # Failures of earlier pots' background writes (those pots stay unfinished in the journal)
+        writer = get_writer()
+        for pot, error in writer.pop_errors():
+            self.report({'ERROR'}, f"Background write of {pot} failed: {error}")
+        
         if not os.path.exists(target_dir):
             os.makedirs(target_dir)
 
@@ -172,13 +408,29 @@ class JOMON_OT_ExportNext(bpy.types.Operator):
         # Force Hide Original before export (just in case)
         bpy.ops.jomon.hide_original()
         
+        # Time since spawning = manual RBDLab fracture in the GUI loop
+        if production_stats.current_pot() == pot_id_str:
+            production_stats.record("fracture", production_stats.idle_seconds(), shards=len(shards))
+        else:
+            production_stats.begin_pot(pot_id_str, os.path.join(props.output_path, production_stats.STATS_NAME))
+        
+        record = current_pot_record(context, pot_id_str)
+        journal = production_journal.ProductionJournal(props.output_path)
+        journal.mark(pot_id_str, "fractured")
+        
         try:
-            self.export_single_pot(shards, target_dir, pot_id_str)
-            self.report({'INFO'}, f"Exported {pot_id_str} Success!")
+            with production_stats.stage("export", shards=len(shards)):
+                self.export_single_pot(shards, target_dir, pot_id_str, props.export_format,
+                                       record['sampler_seed'] if record else None, record, journal,
+                                       props.sample_workers or shard_sampler.default_workers(), writer,
+                                       props.sampling_method, shard_sampler.parse_levels(props.point_levels),
+                                       props.export_frame or None)
+            production_stats.end_pot("ok", shards=len(shards), queued_writes=writer.pending())
+            self.report({'INFO'}, f"Exported {pot_id_str} Success! ({writer.pending()} writes in background)")
             
             # --- WANKO SOBA MODE: Cleanup & Next ---
-            # 1. Delete everything
-            bpy.ops.jomon.cleanup_only()
+            # 1. Delete everything (the shards were sampled, their files are written in the background)
+            bpy.ops.jomon.cleanup_only(drain_writes=False)
             
             # 2. Increment ID
             props.current_id += 1
@@ -187,113 +439,27 @@ class JOMON_OT_ExportNext(bpy.types.Operator):
             bpy.ops.jomon.generate_pot()
             
         except Exception as e:
+            production_stats.end_pot("failed", error=str(e))
             self.report({'ERROR'}, f"Export Failed: {e}")
             return {'CANCELLED'}
+        finally:
+            journal.close()
 
-    def export_single_pot(self, shards, folder, pot_name):
-        import json
-        import bmesh
-        from mathutils.bvhtree import BVHTree
-        from mathutils import Vector
-        import random
-        
-        # 1. Adjacency
-        bpy.context.scene.frame_set(1)
-        bpy.context.view_layer.update()
-        
-        facet_data = []
-        mat_to_id = {}
-        id_counter = 1
-        
-        for obj in shards:
-            for i, mat in enumerate(obj.data.materials):
-                if not mat or "RECON_V6_" not in mat.name: continue
-                faces = [f for f in obj.data.polygons if f.material_index == i]
-                if not faces: continue
-                
-                core_name = mat.name[9:] 
-                nb_name = "_".join(core_name.split('_')[:-1])
-                
-                centroid = sum((f.center for f in faces), Vector()) / len(faces)
-                world_pos = obj.matrix_world @ centroid
-                
-                facet_id = id_counter
-                id_counter += 1
-                mat_to_id[(obj.name, mat.name)] = facet_id
-                
-                facet_data.append({
-                    'id': facet_id,
-                    'obj_name': obj.name,
-                    'nb_name': nb_name,
-                    'mat_name': mat.name,
-                    'pos': world_pos
-                })
-        
-        adjacency_list = []
-        pairs_set = set()
-        
-        for i, f1 in enumerate(facet_data):
-            best = None
-            min_d = 1000.0
-            
-            for j, f2 in enumerate(facet_data):
-                if i == j: continue
-                if f1['nb_name'] == f2['obj_name'] and f2['nb_name'] == f1['obj_name']:
-                    d = (f1['pos'] - f2['pos']).length
-                    if d < 2.0 and d < min_d:
-                        min_d = d
-                        best = j
-            if best is not None:
-                f2 = facet_data[best]
-                pair = sorted([f1['id'], f2['id']])
-                tp = tuple(pair)
-                if tp not in pairs_set:
-                    pairs_set.add(tp)
-                    adjacency_list.append(pair)
-                    
-        with open(os.path.join(folder, "adjacency.json"), 'w') as f:
-            json.dump(adjacency_list, f, indent=4)
-            
-        # Run Segmentation logic (using external script logic inline or imported)
-        # Using imported for stability as defined in 'export_shards_data.py' logic
-        try:
-            import facet_segmentation_v6_majority
-            importlib.reload(facet_segmentation_v6_majority)
-            facet_segmentation_v6_majority.apply_segmentation_to_objects(shards)
-        except Exception as e:
-            print(f"Segmentation Warning: {e}")
-
-        for obj in shards:
-            bm = bmesh.new()
-            bm.from_mesh(obj.data)
-            bm.transform(obj.matrix_world)
-            bvh = BVHTree.FromBMesh(bm)
-            bm.faces.ensure_lookup_table()
-            total_area = sum(f.calc_area() for f in bm.faces)
-            points = []
-            
-            for _ in range(2048):
-                 r = random.uniform(0, total_area)
-                 acc = 0
-                 target = bm.faces[0]
-                 for f in bm.faces:
-                     acc += f.calc_area()
-                     if acc >= r: target = f; break
-                 
-                 p = target.calc_center_bounds()
-                 _, n, fidx, _ = bvh.find_nearest(p)
-                 mat_idx = bm.faces[fidx].material_index
-                 mat = obj.data.materials[mat_idx]
-                 
-                 lbl = 0
-                 if mat and "RECON_V6_" in mat.name:
-                     lbl = mat_to_id.get((obj.name, mat.name), 0)
-                     
-                 points.append({'pos': [p.x, p.y, p.z], 'norm': [n.x, n.y, n.z], 'label': lbl})
-            
-            with open(os.path.join(folder, f"{obj.name}.json"), 'w') as f:
-                json.dump(points, f)
-            bm.free()
+        return {'FINISHED'}
+
+    def export_single_pot(self, shards, folder, pot_name, fmt="json", sampler_seed=None, record=None, journal=None, workers=1,
+                          writer=None, method="uniform", levels=None, export_frame=None):
+        return export_pot(shards, folder, pot_name, fmt, sampler_seed, record, journal, workers, writer, method, levels,
+                          export_frame)
+
+def current_pot_record(context, pot_name):
+    """Record stored by spawn_pot, if it belongs to pot_name."""
+    import json
+    raw = context.scene.get("jomon_pot_record")
+    if not raw:
+        return None
+    record = json.loads(raw)
+    return record if record.get('pot') == pot_name else None
 
 class JOMON_OT_GeneratePromoGrid(bpy.types.Operator):
     """Generates a grid of random pots for promotion."""
@@ -325,7 +491,19 @@ class JOMON_OT_CleanupOnly(bpy.types.Operator):
     bl_label = "Emergency Cleanup"
     bl_options = {'REGISTER', 'UNDO'}
 
+    drain_writes: bpy.props.BoolProperty(
+        name="Wait For Writes",
+        description="Finish the queued background file writes before deleting",
+        default=True
+    )
+
     def execute(self, context):
+        if self.drain_writes and _writer is not None:
+            with production_stats.stage("drain_writes", jobs=_writer.pending()):
+                _writer.drain()
+            for pot, error in _writer.pop_errors():
+                self.report({'ERROR'}, f"Background write of {pot} failed: {error}")
+
         # Explicitly remove handler if it exists (Leftover cleanup)
         try:
              if bpy.app.handlers.depsgraph_update_post:
@@ -340,10 +518,11 @@ class JOMON_OT_CleanupOnly(bpy.types.Operator):
             if "_Low" in obj.name:
                 to_delete.append(obj)
         
-        for obj in to_delete:
-            try:
-                bpy.data.objects.remove(obj, do_unlink=True)
-            except: pass
+        with production_stats.stage("cleanup", removed=len(to_delete)):
+            for obj in to_delete:
+                try:
+                    bpy.data.objects.remove(obj, do_unlink=True)
+                except: pass
             
         self.report({'INFO'}, "Scene Cleaned.")
         return {'FINISHED'}
@@ -361,6 +540,12 @@ class JOMON_PT_FactoryPanel_V9(bpy.types.Panel):
         
         layout.prop(props, "output_path")
         layout.prop(props, "current_id")
+        layout.prop(props, "base_seed")
+        layout.prop(props, "export_format")
+        layout.prop(props, "sample_workers")
+        layout.prop(props, "sampling_method")
+        layout.prop(props, "point_levels")
+        layout.prop(props, "export_frame")
         
         layout.separator()
         layout.label(text="Loop Operation:")
@@ -370,6 +555,10 @@ class JOMON_PT_FactoryPanel_V9(bpy.types.Panel):
         col.operator("jomon.generate_pot", text="1. Spawn Only (Debug)", icon='PLAY')
         col.label(text="↓ Click Apply in RBDLab (Wait for Shards) ↓")
         col.operator("jomon.export_next", text="2. Export & Next Pot >>", icon='FORWARD')
+        layout.operator("jomon.regenerate_pot", text="Regenerate From Manifest", icon='FILE_REFRESH')
+        
+        layout.separator()
+        self.draw_stats(layout, props)
         
         layout.separator()
         layout.label(text="Verification:")
@@ -381,7 +570,23 @@ class JOMON_PT_FactoryPanel_V9(bpy.types.Panel):
         layout.operator("jomon.generate_promo_grid", text="Generate Verification Grid", icon='GRID')
         layout.operator("jomon.cleanup_only", text="Clear Scene", icon='TRASH')
 
-classes = [JomonFactoryProperties, JOMON_OT_GeneratePot, JOMON_OT_HideOriginal, JOMON_OT_ExportNext, JOMON_OT_GeneratePromoGrid, JOMON_OT_CleanupOnly, JOMON_PT_FactoryPanel_V9]
+    def draw_stats(self, layout, props):
+        stats = production_stats.summary(os.path.join(props.output_path, production_stats.STATS_NAME))
+        box = layout.box()
+        if not stats:
+            box.label(text="Stats: no pots logged yet")
+            return
+        box.label(text=f"Pots: {stats['pots']} ok / {stats['failed']} failed")
+        box.label(text=f"Rolling: {stats['pots_per_hour']:.1f} pots/hour (last {production_stats.ROLLING_WINDOW})")
+        if _writer is not None and _writer.pending():
+            box.label(text=f"Background writes: {_writer.pending()} queued", icon='FILE_TICK')
+        last = stats['last']
+        if last:
+            box.label(text=f"Last {last['pot']}: {last['seconds']:.1f} s")
+            for name, entry in sorted(last['stages'].items(), key=lambda kv: -kv[1]['seconds']):
+                box.label(text=f"  {name}: {entry['seconds']:.2f} s")
+
+classes = [JomonFactoryProperties, JOMON_OT_GeneratePot, JOMON_OT_RegeneratePot, JOMON_OT_HideOriginal, JOMON_OT_ExportNext, JOMON_OT_GeneratePromoGrid, JOMON_OT_CleanupOnly, JOMON_PT_FactoryPanel_V9]
 
 def register():
     # Aggressive Cleanup of Old Panels
@@ -400,6 +605,12 @@ def register():
     bpy.types.Scene.jomon_props = bpy.props.PointerProperty(type=JomonFactoryProperties)
 
 def unregister():
+    # Let queued files land before the operators go away
+    if _writer is not None:
+        _writer.close()
+        for pot, error in _writer.pop_errors():
+            print(f"Background write of {pot} failed: {error}")
+
     for cls in classes:
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.jomon_props
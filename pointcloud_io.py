@@ -0,0 +1,372 @@
+import json
+import mmap
+import os
+import zlib
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import shard_sampler
+
+# Shard point-cloud file formats.
+#
+# 'json' : legacy list of {'pos', 'norm', 'label'} dicts (<shard>.json)
+# 'bin'  : columnar binary layout (<shard>.jpc), little-endian:
+#
+#     bytes 0-3   magic b"JPC1"
+#     bytes 4-7   uint32 header length H
+#     bytes 8-8+H JSON header, space padded so the data starts on a 16-byte boundary
+#     data        one contiguous block per array, each 16-byte aligned
+#
+#   The header looks like
+#     {"version": 1, "num_points": N,
+#      "arrays": {"pos":   {"dtype": "<f4", "shape": [N, 3], "offset": o},
+#                 "norm":  {"dtype": "<f4", "shape": [N, 3], "offset": o},
+#                 "label": {"dtype": "<i4", "shape": [N],    "offset": o}}}
+#   with offsets counted from the start of the file (or blob).
+#   Nested multi-resolution shards (shard_sampler.nested_order) carry
+#   "meta": {"levels": [512, 1024, 2048, 8192]}; every level is a prefix of
+#   the arrays, so load_shard(path, num_points=512) is a slice of the mmap.
+#
+# 'quant': same container, version 2, quantized per shard (12 bytes/point
+#   before compression instead of 28):
+#
+#     pos   int16 [N, 3]  "encoding": "linear16", float64 "origin"/"scale" per
+#                         axis (bbox centre / half extent), pos = origin + q * scale
+#     norm  int16 [N, 2]  "encoding": "oct16", octahedral map of the unit normal
+#     label uint16 [N]    "encoding": "uint16"
+#
+#   Each array block may be compressed on its own ("codec": "zstd" or "zlib",
+#   "nbytes" = stored length). Decoding returns float32 pos/norm and int32
+#   labels like the other formats; error_bounds(header) gives the worst-case
+#   error, which stays in metres (no normalization of the shard).
+
+MAGIC = b"JPC1"
+VERSION = 1
+VERSION_QUANTIZED = 2
+ALIGN = 16
+
+FORMAT_EXTENSIONS = {'json': ".json", 'bin': ".jpc", 'quant': ".jpc"}
+
+ARRAY_DTYPES = {'pos': "<f4", 'norm': "<f4", 'label': "<i4"}
+
+POS_LEVELS = 32767 # int16 steps from the bbox centre to its faces
+OCT_LEVELS = 32767 # int16 steps per unit of the octahedral square
+DEFAULT_CODEC = "zstd" if zstandard else "zlib"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# encode_shard() options per binary format
+FORMAT_ENCODINGS = {'bin': {}, 'quant': {'quantize': True, 'codec': DEFAULT_CODEC}}
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+def quantize_positions(pos):
+    """int16 [N,3] codes + float64 origin/scale [3] of the shard's bounding box."""
+    pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+    lo = pos.min(axis=0) if len(pos) else np.zeros(3)
+    hi = pos.max(axis=0) if len(pos) else np.zeros(3)
+    origin = (lo + hi) / 2
+    scale = (hi - lo) / (2 * POS_LEVELS)
+    # Flat axis: every code is 0, any positive scale decodes exactly
+    scale[scale <= 0] = np.finfo(np.float32).eps
+    q = np.rint((pos - origin) / scale)
+    return np.clip(q, -POS_LEVELS, POS_LEVELS).astype("<i2"), origin, scale
+
+def dequantize_positions(q, origin, scale):
+    return (np.asarray(origin, dtype=np.float64) + q.astype(np.float64) * np.asarray(scale, dtype=np.float64)).astype(np.float32)
+
+def _sign(x):
+    return np.where(x >= 0, 1.0, -1.0)
+
+def octahedral_encode(norm):
+    """int16 [N,2] octahedral codes of (unit) normals [N,3]; zero vectors map to +Z."""
+    n = np.asarray(norm, dtype=np.float64).reshape(-1, 3)
+    l1 = np.abs(n).sum(axis=1)
+    l1[l1 == 0] = 1.0
+    x, y, z = (n / l1[:, None]).T
+    lower = z < 0
+    u = np.where(lower, (1 - np.abs(y)) * _sign(x), x)
+    v = np.where(lower, (1 - np.abs(x)) * _sign(y), y)
+    q = np.rint(np.stack([u, v], axis=1) * OCT_LEVELS)
+    return np.clip(q, -OCT_LEVELS, OCT_LEVELS).astype("<i2")
+
+def octahedral_decode(q):
+    """float32 unit normals [N,3] from octahedral codes [N,2]."""
+    u, v = (q.astype(np.float64) / OCT_LEVELS).T
+    z = 1 - np.abs(u) - np.abs(v)
+    t = np.clip(-z, 0, None)
+    x = u - t * _sign(u)
+    y = v - t * _sign(v)
+    n = np.stack([x, y, z], axis=1)
+    return (n / np.linalg.norm(n, axis=1, keepdims=True)).astype(np.float32)
+
+def compress(data, codec):
+    if codec == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression needs the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+def decompress(data, codec, nbytes, limit=None):
+    """Decompressed block of nbytes; limit: only its first `limit` bytes (stops early)."""
+    if limit is not None and limit < nbytes:
+        nbytes = limit
+        if codec == "zlib":
+            out = zlib.decompressobj().decompress(data, nbytes)
+        elif codec == "zstd":
+            if zstandard is None:
+                raise ImportError("zstd-compressed shard needs the 'zstandard' package")
+            out = b""
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                while len(out) < nbytes:
+                    chunk = reader.read(nbytes - len(out))
+                    if not chunk: break
+                    out += chunk
+        else:
+            raise ValueError(f"Unknown codec: {codec}")
+    elif codec == "zlib":
+        out = zlib.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd-compressed shard needs the 'zstandard' package")
+        out = zstandard.ZstdDecompressor().decompress(data, max_output_size=nbytes)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    if len(out) != nbytes:
+        raise ValueError(f"Corrupt {codec} block: {len(out)} bytes, expected {nbytes}")
+    return out
+
+def _quantized_arrays(sample):
+    """(stored array, extra header fields) per key of the 'quant' layout."""
+    labels = np.asarray(sample['label']).reshape(-1)
+    if len(labels) and (labels.min() < 0 or labels.max() > np.iinfo(np.uint16).max):
+        raise ValueError("Labels do not fit in uint16")
+    q, origin, scale = quantize_positions(sample['pos'])
+    return {
+        'pos': (q, {'encoding': "linear16", 'origin': origin.tolist(), 'scale': scale.tolist()}),
+        'norm': (octahedral_encode(sample['norm']), {'encoding': "oct16"}),
+        'label': (labels.astype("<u2"), {'encoding': "uint16"}),
+    }
+
+def encode_shard(sample, meta=None, quantize=False, codec=None):
+    """Serializes a sample dict ({'pos','norm','label'}) to the binary layout.
+
+    quantize: store the 'quant' encoding; codec: None, "zlib" or "zstd" per array.
+    """
+    if quantize:
+        arrays = _quantized_arrays(sample)
+    else:
+        arrays = {key: (np.ascontiguousarray(sample[key], dtype=dtype), {}) for key, dtype in ARRAY_DTYPES.items()}
+
+    blobs = {}
+    for key, (arr, extra) in arrays.items():
+        blobs[key] = arr.tobytes()
+        if codec:
+            blobs[key] = compress(blobs[key], codec)
+            extra.update(codec=codec, nbytes=len(blobs[key]))
+
+    version = VERSION_QUANTIZED if quantize or codec else VERSION
+    header = {'version': version, 'num_points': int(len(arrays['pos'][0])), 'arrays': {}}
+    if meta:
+        header['meta'] = meta
+
+    # Offsets depend on the header size, which depends on the offsets.
+    # Reserve generous room for the numbers and pad the rest.
+    probe = dict(header, arrays={k: dict({'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': 10 ** 12}, **extra)
+                                 for k, (a, extra) in arrays.items()})
+    data_start = _align(8 + len(json.dumps(probe).encode("utf-8")))
+
+    offset = data_start
+    for key, (arr, extra) in arrays.items():
+        header['arrays'][key] = dict({'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}, **extra)
+        offset = _align(offset + len(blobs[key]))
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (data_start - 8 - len(header_bytes))
+
+    out = bytearray(offset)
+    out[0:4] = MAGIC
+    out[4:8] = np.uint32(len(header_bytes)).tobytes()
+    out[8:data_start] = header_bytes
+    for key, blob in blobs.items():
+        start = header['arrays'][key]['offset']
+        out[start:start + len(blob)] = blob
+    return bytes(out)
+
+def read_header(buffer, offset=0):
+    """Parses the JSON header of a binary shard stored at `offset` in `buffer`."""
+    if bytes(buffer[offset:offset + 4]) != MAGIC:
+        raise ValueError("Not a JPC1 point-cloud blob")
+    header_len = int(np.frombuffer(buffer, dtype="<u4", count=1, offset=offset + 4)[0])
+    return json.loads(bytes(buffer[offset + 8:offset + 8 + header_len]).decode("utf-8"))
+
+def _prefix_shape(info, rows):
+    """Shape of the first `rows` rows of an array (all of it for rows=None)."""
+    shape = list(info['shape'])
+    if rows is not None and shape:
+        shape[0] = min(rows, shape[0])
+    return shape
+
+def _decode_array(buffer, offset, info, rows=None):
+    """float32 / int32 array of one compressed and/or quantized block (first `rows` rows only)."""
+    shape = _prefix_shape(info, rows)
+    itemsize = np.dtype(info['dtype']).itemsize
+    count = int(np.prod(shape)) if shape else 1
+    total = (int(np.prod(info['shape'])) if info['shape'] else 1) * itemsize
+    nbytes = count * itemsize
+    if 'codec' in info:
+        start = offset + info['offset']
+        data = decompress(bytes(buffer[start:start + info['nbytes']]), info['codec'], total, limit=nbytes)
+        arr = np.frombuffer(data, dtype=info['dtype'], count=count).reshape(shape)
+    else:
+        arr = np.frombuffer(buffer, dtype=info['dtype'], count=count, offset=offset + info['offset']).reshape(shape)
+
+    encoding = info.get('encoding')
+    if encoding == "linear16":
+        return dequantize_positions(arr, info['origin'], info['scale'])
+    if encoding == "oct16":
+        return octahedral_decode(arr)
+    if encoding == "uint16":
+        return arr.astype(np.int32)
+    if encoding is not None:
+        raise ValueError(f"Unknown array encoding: {encoding}")
+    return arr
+
+def decode_shard(buffer, offset=0, num_points=None):
+    """Arrays of a binary shard inside `buffer` (bytes or mmap).
+
+    Plain 'bin' arrays are zero-copy views; quantized or compressed ones are
+    decoded into new float32 (pos, norm) / int32 (label) arrays.
+    num_points: only the first num_points; compressed blocks are decompressed
+    just far enough and only that prefix is dequantized.
+    """
+    header = read_header(buffer, offset)
+    if num_points is not None and num_points > header['num_points']:
+        raise ValueError(f"Shard has {header['num_points']} points, {num_points} requested")
+    sample = {}
+    for key, info in header['arrays'].items():
+        if 'encoding' in info or 'codec' in info:
+            sample[key] = _decode_array(buffer, offset, info, num_points)
+            continue
+        shape = _prefix_shape(info, num_points)
+        count = int(np.prod(shape)) if shape else 1
+        arr = np.frombuffer(buffer, dtype=info['dtype'], count=count, offset=offset + info['offset'])
+        sample[key] = arr.reshape(shape)
+    return sample
+
+def normal_error_bound():
+    """Worst-case angle (radians) between a unit normal and its oct16 decoding.
+
+    Rounding moves u, v by at most d/2 (d = 1 / OCT_LEVELS); the unfolded
+    vector moves by at most sqrt(6) * d/2 and is at least 1/sqrt(3) long.
+    """
+    d = 1.0 / OCT_LEVELS
+    return float(np.sqrt(3) * np.sqrt(6) * d / 2) + 2 * float(np.finfo(np.float32).eps)
+
+def error_bounds(header):
+    """Worst-case decoding error of a binary shard: {'pos': metres per axis [3], 'norm': radians}.
+
+    Zero for the lossless 'bin' layout. Labels are always exact.
+    """
+    pos = header['arrays']['pos']
+    norm = header['arrays']['norm']
+    if pos.get('encoding') == "linear16":
+        origin = np.abs(np.asarray(pos['origin']))
+        scale = np.asarray(pos['scale'])
+        # Rounding to the grid + rounding the metric value to float32
+        pos_bound = scale / 2 + (origin + scale * POS_LEVELS) * np.finfo(np.float32).eps
+    else:
+        pos_bound = np.zeros(3)
+    return {
+        'pos': pos_bound.tolist(),
+        'norm': normal_error_bound() if norm.get('encoding') == "oct16" else 0.0,
+    }
+
+def measure_errors(sample, decoded):
+    """Actual error of `decoded` against the original `sample` (same keys as error_bounds)."""
+    pos = np.abs(np.asarray(decoded['pos'], dtype=np.float64) - np.asarray(sample['pos'], dtype=np.float64))
+    a = np.asarray(sample['norm'], dtype=np.float64)
+    b = np.asarray(decoded['norm'], dtype=np.float64)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-30)
+    cos = np.clip((a * b).sum(axis=1), -1.0, 1.0)
+    # arctan2 keeps precision for tiny angles (arccos does not)
+    angle = np.arctan2(np.linalg.norm(np.cross(a, b), axis=1), cos)
+    return {
+        'pos': pos.max(axis=0).tolist() if len(pos) else [0.0, 0.0, 0.0],
+        'norm': float(angle.max()) if len(angle) else 0.0,
+        'label_mismatches': int((np.asarray(sample['label']) != np.asarray(decoded['label'])).sum()),
+    }
+
+def within_bounds(sample, decoded, header):
+    """True if `decoded` reproduces `sample` within error_bounds(header) and all labels match."""
+    bounds = error_bounds(header)
+    errors = measure_errors(sample, decoded)
+    return (all(e <= b for e, b in zip(errors['pos'], bounds['pos']))
+            and errors['norm'] <= bounds['norm'] and errors['label_mismatches'] == 0)
+
+def write_shard(folder, name, sample, fmt="json", fsync=False, meta=None):
+    """Writes one shard as <folder>/<name>.json or .jpc ('bin' / 'quant'). Returns the path.
+
+    fsync: flush the file to disk before returning (background writer).
+    meta: stored in the .jpc header (e.g. {'levels': [...]}); JSON files keep
+    only the point order.
+    """
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unknown point-cloud format: {fmt}")
+
+    path = os.path.join(folder, name + FORMAT_EXTENSIONS[fmt])
+    if fmt == "json":
+        with open(path, 'w') as f:
+            json.dump(shard_sampler.sample_to_records(sample), f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    else:
+        with open(path, 'wb') as f:
+            f.write(encode_shard(sample, meta, **FORMAT_ENCODINGS[fmt]))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    return path
+
+def shard_levels(header):
+    """Nested resolution levels of a binary shard (None if it is not nested)."""
+    return header.get('meta', {}).get('levels')
+
+def prefix(sample, num_points):
+    """First num_points of every array (views, no copy)."""
+    if num_points is None:
+        return sample
+    if num_points > len(sample['pos']):
+        raise ValueError(f"Shard has {len(sample['pos'])} points, {num_points} requested")
+    return {key: arr[:num_points] for key, arr in sample.items()}
+
+def load_shard(path, use_mmap=True, num_points=None):
+    """Loads a shard file into {'pos','norm','label'} arrays.
+
+    Binary files are memory-mapped and returned as read-only views (no copy)
+    unless use_mmap is False. Quantized files are decoded into new arrays.
+    num_points: only the first num_points (a level of a nested shard).
+    """
+    if path.endswith(".json"):
+        with open(path, 'r') as f:
+            records = json.load(f)
+        return prefix({
+            'pos': np.array([r['pos'] for r in records], dtype=np.float32).reshape(-1, 3),
+            'norm': np.array([r['norm'] for r in records], dtype=np.float32).reshape(-1, 3),
+            'label': np.array([r['label'] for r in records], dtype=np.int32),
+        }, num_points)
+
+    with open(path, 'rb') as f:
+        if not use_mmap:
+            return decode_shard(f.read(), num_points=num_points)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The returned views keep the mapping alive
+    return decode_shard(buffer, num_points=num_points)
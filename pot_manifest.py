@@ -0,0 +1,33 @@
+import json
+import os
+
+# Per-pot generation record: <dataset>/Pot_XXX/manifest.json
+#
+#   {"pot": "Pot_012", "seed": 1011,
+#    "params": {"archetype": "TSUBO", "belly_h_ratio": ..., "neck_w_ratio": ...,
+#               "rim_flare_ratio": ..., "bottom_w": ..., ...},
+#    "scatter_count": 52, "sampler_seed": 123456789, ...}
+#
+# seed alone reproduces params/scatter_count/sampler_seed
+# (generate_random_pots.sample_pot_record); the drawn values are stored too
+# so a pot can be rebuilt even if the sampling code changes later.
+
+MANIFEST_NAME = "manifest.json"
+
+def pot_seed(base_seed, pot_id):
+    """Seed of pot `pot_id` in a batch started from `base_seed`."""
+    return base_seed + pot_id
+
+def write_pot_manifest(folder, record, **extra):
+    manifest = dict(record)
+    manifest.update(extra)
+    with open(os.path.join(folder, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+def read_pot_manifest(folder):
+    path = os.path.join(folder, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
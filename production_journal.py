@@ -0,0 +1,122 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+# Completion journal of a dataset folder: <output>/journal.sqlite
+#
+#   pots(pot, id, state, seed, updated)     one row per pot, state only moves forward
+#   files(pot, name, sha256, size)          checksums of the exported files
+#
+# A pot is finished only once it reaches 'exported' (set after all of its files
+# are written and hashed). Anything below that is partial and gets redone, so a
+# crash mid-export no longer leaves a folder that looks complete.
+
+JOURNAL_NAME = "journal.sqlite"
+STATES = ("generated", "fractured", "segmented", "exported")
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def pot_id_from_name(pot_name):
+    try:
+        return int(pot_name.split("_")[1])
+    except (IndexError, ValueError):
+        return None
+
+class ProductionJournal:
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        is_new = not os.path.exists(self.path)
+
+        # Several headless workers may share one journal -> wait on locks
+        self.db = sqlite3.connect(self.path, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS pots ("
+                        "pot TEXT PRIMARY KEY, id INTEGER, state TEXT, seed INTEGER, updated REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files ("
+                        "pot TEXT, name TEXT, sha256 TEXT, size INTEGER, PRIMARY KEY (pot, name))")
+        self.db.commit()
+
+        if is_new:
+            self._adopt_existing(output_dir)
+
+    def _adopt_existing(self, output_dir):
+        """One-time import of folders exported before the journal existed.
+
+        Only folders with an adjacency.json count; their files are hashed as found.
+        """
+        for d in sorted(os.listdir(output_dir)):
+            folder = os.path.join(output_dir, d)
+            pot_id = pot_id_from_name(d)
+            if not d.startswith("Pot_") or pot_id is None: continue
+            if not os.path.exists(os.path.join(folder, "adjacency.json")): continue
+            files = [os.path.join(folder, f) for f in sorted(os.listdir(folder))]
+            self.record_files(d, [p for p in files if os.path.isfile(p)])
+            self.mark(d, "exported")
+            print(f"Journal: adopted existing {d}")
+
+    def mark(self, pot_name, state, seed=None):
+        """Moves a pot to `state` (never backwards; re-generating resets it)."""
+        if state not in STATES:
+            raise ValueError(f"Unknown state: {state}")
+        current = self.state(pot_name)
+        if current is not None and state != "generated" and STATES.index(state) < STATES.index(current):
+            return
+        if state == "generated":
+            # Fresh attempt: forget checksums of any earlier partial export
+            self.db.execute("DELETE FROM files WHERE pot = ?", (pot_name,))
+        self.db.execute(
+            "INSERT INTO pots (pot, id, state, seed, updated) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(pot) DO UPDATE SET state = excluded.state, updated = excluded.updated, "
+            "seed = COALESCE(excluded.seed, pots.seed)",
+            (pot_name, pot_id_from_name(pot_name), state, seed, time.time()))
+        self.db.commit()
+
+    def record_files(self, pot_name, paths):
+        rows = [(pot_name, os.path.basename(p), file_sha256(p), os.path.getsize(p)) for p in paths]
+        self.db.executemany("INSERT OR REPLACE INTO files (pot, name, sha256, size) VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def state(self, pot_name):
+        row = self.db.execute("SELECT state FROM pots WHERE pot = ?", (pot_name,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, pot_name):
+        return self.state(pot_name) == "exported"
+
+    def partial_pots(self):
+        """Names of pots that were started but never finished, lowest ID first."""
+        rows = self.db.execute("SELECT pot FROM pots WHERE state != 'exported' ORDER BY id").fetchall()
+        return [r[0] for r in rows]
+
+    def next_id(self, default=1, exclude=()):
+        """Lowest unfinished pot ID, else one past the highest finished one.
+
+        exclude: pot names to leave alone (e.g. still being written in the background).
+        """
+        for pot in self.partial_pots():
+            if pot not in exclude:
+                return pot_id_from_name(pot)
+        row = self.db.execute("SELECT MAX(id) FROM pots WHERE state = 'exported'").fetchone()
+        ids = [i for i in [row[0]] + [pot_id_from_name(p) for p in exclude] if i is not None]
+        return max(ids) + 1 if ids else default
+
+    def verify(self, pot_name, folder):
+        """Files of an exported pot that are missing or no longer match their checksum."""
+        bad = []
+        for name, sha in self.db.execute("SELECT name, sha256 FROM files WHERE pot = ?", (pot_name,)):
+            path = os.path.join(folder, name)
+            if not os.path.exists(path) or file_sha256(path) != sha:
+                bad.append(name)
+        return bad
+
+    def summary(self):
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM pots GROUP BY state").fetchall())
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+# Per-stage instrumentation of the production loop.
+#
+# begin_pot() opens a record, every stage()/record() call adds wall time, a
+# call count and its counters (faces, shards, points, ...) plus the Blender
+# datablock counts after the stage. end_pot() appends the record as one JSON
+# line to the log (<output>/stats.jsonl):
+#
+#   {"pot": "Pot_012", "status": "ok", "start": ..., "end": ..., "seconds": 84.2,
+#    "stages": {"segmentation": {"calls": 1, "seconds": 3.1, "shards": 52,
+#                                "inner_faces": 18312, "datablocks": {...}}, ...}}
+#
+# Stages recorded outside begin_pot/end_pot are only printed.
+
+STATS_NAME = "stats.jsonl"
+ROLLING_WINDOW = 20 # Pots used for the rolling pots/hour
+
+_pot = None
+_summary_cache = {}
+
+def datablock_counts():
+    """Sizes of the main bpy.data collections ({} outside Blender)."""
+    try:
+        import bpy
+    except ImportError:
+        return {}
+    data = bpy.data
+    return {
+        'objects': len(data.objects),
+        'meshes': len(data.meshes),
+        'materials': len(data.materials),
+        'textures': len(data.textures),
+        'curves': len(data.curves),
+    }
+
+def begin_pot(pot_name, log_path):
+    global _pot
+    now = time.time()
+    _pot = {'pot': pot_name, 'log': log_path, 'start': now, 'last': now, 'stages': {}}
+
+def current_pot():
+    return _pot['pot'] if _pot else None
+
+def idle_seconds():
+    """Seconds since the last recorded stage of the open pot (0 if none)."""
+    return time.time() - _pot['last'] if _pot else 0.0
+
+def record(name, seconds, **counts):
+    """Adds one call of stage `name` to the open pot record (counters are summed)."""
+    print(f"[stats] {name}: {seconds * 1000:.1f} ms" + "".join(f", {k} {v}" for k, v in counts.items()))
+    if _pot is None:
+        return
+    entry = _pot['stages'].setdefault(name, {'calls': 0, 'seconds': 0.0})
+    entry['calls'] += 1
+    entry['seconds'] += seconds
+    for key, value in counts.items():
+        entry[key] = entry.get(key, 0) + value
+    entry['datablocks'] = datablock_counts()
+    _pot['last'] = time.time()
+
+@contextmanager
+def stage(name, **counts):
+    """Times the block; counters can be added to the yielded dict."""
+    info = dict(counts)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(name, time.perf_counter() - start, **info)
+
+def end_pot(status="ok", **extra):
+    """Closes the open pot record and appends it to its log. Returns the record."""
+    global _pot
+    if _pot is None:
+        return None
+    pot, _pot = _pot, None
+    end = time.time()
+    line = {'pot': pot['pot'], 'status': status, 'start': pot['start'], 'end': end,
+            'seconds': end - pot['start'], 'stages': pot['stages']}
+    line.update(extra)
+    if pot['log']:
+        os.makedirs(os.path.dirname(os.path.abspath(pot['log'])), exist_ok=True)
+        with open(pot['log'], 'a') as f:
+            f.write(json.dumps(line) + "\n")
+    return line
+
+def read_log(log_path):
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, 'r') as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+def rolling_rate(records, window=ROLLING_WINDOW):
+    """Pots/hour over the last `window` successful pots (first start -> last end)."""
+    done = [r for r in records if r.get('status') == "ok"][-window:]
+    if not done:
+        return 0.0
+    hours = (done[-1]['end'] - done[0]['start']) / 3600
+    return len(done) / hours if hours > 0 else 0.0
+
+def summary(log_path, window=ROLLING_WINDOW):
+    """{'pots', 'failed', 'pots_per_hour', 'last'} for the panel (cached on file size/mtime)."""
+    try:
+        st = os.stat(log_path)
+        key = (st.st_size, st.st_mtime)
+    except OSError:
+        return None
+    cached = _summary_cache.get(log_path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    records = read_log(log_path)
+    result = {
+        'pots': sum(1 for r in records if r.get('status') == "ok"),
+        'failed': sum(1 for r in records if r.get('status') != "ok"),
+        'pots_per_hour': rolling_rate(records, window),
+        'last': records[-1] if records else None,
+    }
+    _summary_cache[log_path] = (key, result)
+    return result
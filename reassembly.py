@@ -0,0 +1,514 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import facet_descriptors
+import facet_matcher
+import facet_icp
+
+# Whole-pot reassembly from scored facet pairs (reconstruction_plan.md phase 4,
+# "snap the shards back", for every shard at once).
+#
+#   1. Every facet pair (adjacency.json, or facet_matcher candidates) is
+#      registered with facet_icp. The pair becomes a shard-graph edge carrying
+#      the transform, weighted by its ICP score, by how clearly its start pose
+#      beat the other one (1 - ambiguity) and by the matcher score, if given.
+#   2. Maximum spanning tree, Kruskal style: edges best first, a union-find
+#      over clusters of already assembled shards. Taking an edge moves the
+#      smaller cluster onto the larger one (incremental pose propagation):
+#      every edge between the two clusters proposes a motion, the one most of
+#      them agree with is re-fitted on their anchors. The merge is rejected
+#      when too few edges agree, or when shards of the two clusters then
+#      interpenetrate. Penetration is measured with shard bounding volumes:
+#      the share of a shard's points inside another shard's oriented box,
+#      shrunk by BOX_SHRINK so that touching shards pass. A cluster is
+#      refined (step 3, on its own edges) each time it doubles in size, so
+#      the tree's drift does not pile up into false penetrations.
+#   3. Global refinement: all edges inside a component go into a
+#      Gauss-Newton pose-graph solve, on anchor points around each facet (its
+#      centroid and principal axes). Cauchy weights with a shrinking scale
+#      pull consistent loop closures in and let wrong pairs fade out. The
+#      largest shard of each component stays fixed.
+#
+# facet_matcher candidates (--predicted) are mostly wrong pairs (about 4 of 5
+# at k=2), and ICP fits a wrong pair face to face as well as a true one: no
+# penetration, scores that overlap. Taking them best first glues singletons
+# along wrong pairs before any check can see it, so candidates run in strict
+# mode: the tree first grows only on edges that close a triangle (two other
+# edges via a third shard reproduce the edge within TRIANGLE_TOLERANCE), then
+# clusters merge only where MIN_AGREE edges between them agree, and both
+# refinements take only tree edges and edges within STRICT_GATE of the poses.
+# Merges also only go along distinct pairs, whose ICP score beats every other
+# candidate of both facets by DISTINCT_RATIO: on flat cuts of the fixture
+# cylinder the cut faces of a row are congruent, a wrong candidate fits as
+# well as the true one and closes triangles with other wrong ones.
+# Strict mode leaves shards without such loops unplaced. On 60-shard 'high'
+# fixtures with relief 0.002-0.004 it places 30-55% of the shards, nearly all
+# correctly, at about 1 deg / 1 mm median error (k=1 to 5); on flat cuts
+# (relief 0) it places at most one pair. Adjacency pairs place all 60 shards
+# (median 0.5-0.8 deg) in about 2 s. Registration dominates the run time,
+# 7-14 s for the ~950 pairs of k=5.
+#
+# Poses map a shard's exported points into the assembly frame. Errors are
+# against poses.json (frame 1), after one best-fit rigid alignment of the
+# largest component.
+#
+#   python reassembly.py <dataset root or .jpak>             (adjacency.json pairs)
+#   python reassembly.py <dataset root or .jpak> --predicted 5   (facet_matcher top-5)
+
+VOLUME_POINTS = 64        # Points per shard for the penetration test
+BOX_SHRINK = 0.4          # Oriented boxes shrink by this share of each half-extent
+MAX_PENETRATION = 0.1     # Merges with more points inside another shard's box are rejected
+MIN_INLIERS = 0.5         # Pairs whose ICP matched fewer source points are no edges
+LOOP_TOLERANCE = 0.005    # RMS anchor distance (m) below which an edge agrees with the poses
+REFINE_ITERATIONS = 10
+REFINE_SCALE = 0.001      # Final Cauchy scale (m) of the refinement residuals
+START_SCALE = 0.05        # ... starting from this one
+MERGE_PROPOSALS = 16      # Edges between two clusters tried as their relative motion
+MIN_SUPPORT = 0.2         # Merges need this share (by weight) of the other edges between the clusters to agree
+TRIANGLE_TOLERANCE = 0.002 # RMS anchor distance (m) within which two edges via a third shard reproduce an edge
+DISTINCT_RATIO = 1.1      # Strict mode: a pair's ICP score must beat its facets' other candidates by this factor
+MIN_AGREE = 2             # Strict mode: agreeing edges a merge of two clusters needs (a closed loop)
+STRICT_GATE = 0.005        # Strict mode: RMS anchor distance (m) of the non-tree edges that enter refinement
+CORRECT_DEG = 5.0         # Shards within both limits count as correctly placed
+CORRECT_M = 0.005
+
+def shard_volumes(samples, names, count=VOLUME_POINTS, seed=0):
+    """Bounding volumes per shard in exported coordinates.
+
+    Returns {'points' [S,count,3], 'center' [S,3], 'axes' [S,3,3] (columns),
+    'half' [S,3] half-extents along the axes, 'size' [S] point counts}.
+    """
+    rng = np.random.default_rng(seed)
+    out = {key: [] for key in ('points', 'center', 'axes', 'half', 'size')}
+    for name in names:
+        pos = np.asarray(samples[name]['pos'], dtype=np.float64)
+        mean = pos.mean(axis=0)
+        _, _, vt = np.linalg.svd(pos - mean, full_matrices=False)
+        local = (pos - mean) @ vt.T
+        lo, hi = local.min(axis=0), local.max(axis=0)
+        out['center'].append(mean + ((lo + hi) / 2) @ vt)
+        out['axes'].append(vt.T)
+        out['half'].append((hi - lo) / 2)
+        out['points'].append(pos[rng.choice(len(pos), count, replace=len(pos) < count)])
+        out['size'].append(len(pos))
+    return {key: np.array(values) for key, values in out.items()}
+
+def _apply(poses, points):
+    """[S,4,4] poses applied to [S,M,3] points."""
+    return np.einsum('sij,smj->smi', poses[:, :3, :3], points) + poses[:, None, :3, 3]
+
+def penetration(poses, volumes, moved, fixed, shrink=BOX_SHRINK):
+    """Largest share of one shard's points inside another's shrunk box, over moved x fixed shards."""
+    moved, fixed = np.asarray(moved), np.asarray(fixed)
+    world = _apply(poses, volumes['points'])
+    lo, hi = world.min(axis=1), world.max(axis=1)
+    # Broadphase on the world AABBs of the points
+    overlap = ((lo[moved][:, None] <= hi[fixed][None]) & (lo[fixed][None] <= hi[moved][:, None])).all(axis=2)
+    m, f = np.nonzero(overlap)
+    if len(m) == 0:
+        return 0.0
+    a, b = np.concatenate([moved[m], fixed[f]]), np.concatenate([fixed[f], moved[m]])
+    center = np.einsum('sij,sj->si', poses[b, :3, :3], volumes['center'][b]) + poses[b, :3, 3]
+    axes = poses[b, :3, :3] @ volumes['axes'][b]
+    local = np.einsum('sji,smj->smi', axes, world[a] - center[:, None])
+    inside = (np.abs(local) < (1 - shrink) * volumes['half'][b][:, None]).all(axis=2)
+    return float(inside.mean(axis=1).max())
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def _edge_points(poses, edges, anchors, rows, moving):
+    """Anchor points of edges `rows` on the moving cluster's side and where the other side wants them."""
+    a, b = edges['a'][rows], edges['b'][rows]
+    at_a = _apply(poses[a] @ edges['transform'][rows], anchors[rows])
+    at_b = _apply(poses[b], anchors[rows])
+    b_moves = moving[b][:, None, None]
+    return np.where(b_moves, at_b, at_a), np.where(b_moves, at_a, at_b)
+
+def _expand(starts, counts):
+    """(owner, position) for the ranges [starts, starts + counts), flattened."""
+    owner = np.repeat(np.arange(len(starts)), counts)
+    return owner, starts[owner] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+def closed_triangles(num_shards, edges, anchors, tolerance=TRIANGLE_TOLERANCE):
+    """[E] number of triangles that close on each edge.
+
+    Edge a <- b closes a triangle with a third shard c when chaining the
+    edges b -> c -> a moves its anchors where the edge itself does. Wrong
+    pairs of facet_matcher candidates almost never close one.
+    """
+    a, b, transform = edges['a'], edges['b'], edges['transform']
+    num = len(a)
+    # Every edge in both directions, sorted by (from, to); moves map `from` coordinates into `to`'s
+    start = np.concatenate([b, a])
+    end = np.concatenate([a, b])
+    moves = np.concatenate([transform, np.linalg.inv(transform)])
+    edge = np.tile(np.arange(num), 2)
+    order = np.lexsort((end, start))
+    start, end, moves, edge = start[order], end[order], moves[order], edge[order]
+    key = start * num_shards + end
+
+    # b -> c, then c -> a (another edge each)
+    first = np.searchsorted(start, b)
+    k, d1 = _expand(first, np.searchsorted(start, b, side='right') - first)
+    want = end[d1] * num_shards + a[k]
+    first = np.searchsorted(key, want)
+    pick, d2 = _expand(first, np.searchsorted(key, want, side='right') - first)
+    k, d1 = k[pick], d1[pick]
+    keep = (edge[d1] != k) & (edge[d2] != k)
+    k, d1, d2 = k[keep], d1[keep], d2[keep]
+
+    chained = _apply(moves[d2] @ moves[d1], anchors[k])
+    direct = _apply(transform[k], anchors[k])
+    closed = np.sqrt(((chained - direct) ** 2).sum(axis=2).mean(axis=1)) < tolerance
+    return np.bincount(k[closed], minlength=num)
+
+def distinct_pairs(pairs, scores, ratio=DISTINCT_RATIO):
+    """[E] bool: pairs whose score beats every other pair sharing one of their facets by `ratio`.
+
+    A facet_matcher candidate that fits no better than a rival partner of
+    the same facet (congruent flat cuts, look-alike facets) cannot be told
+    from it, whichever of the two is the true one.
+    """
+    ids, facet = np.unique(pairs, return_inverse=True)
+    facet = facet.reshape(-1, 2)
+    num = len(pairs)
+    # Best and runner-up score per facet, over the pairs it is in
+    flat = np.repeat(np.arange(num), 2)
+    order = np.lexsort((-scores[flat], facet.reshape(-1)))
+    slot, edge = facet.reshape(-1)[order], flat[order]
+    first = np.searchsorted(slot, np.arange(len(ids)))
+    count = np.bincount(slot, minlength=len(ids))
+    best = edge[first]
+    runner_up = np.where(count > 1, scores[edge[np.minimum(first + 1, len(edge) - 1)]], 0.0)
+    # The rival of a pair at a facet: the facet's best pair, or its runner-up if that is the pair itself
+    rival = np.where(best[facet] == np.arange(num)[:, None], runner_up[facet], scores[best[facet]]).max(axis=1)
+    return scores > ratio * rival
+
+def cluster_motion(poses, edges, anchors, between, first, moving):
+    """Rigid motion of the moving cluster ([S] bool) onto the other one.
+
+    Every edge between the two clusters proposes a motion (edge between[first]
+    and then up to MERGE_PROPOSALS - 1 others); the one most edges (by weight)
+    agree with is re-fitted (Kabsch) on the anchors of the agreeing edges.
+    Returns (delta [4,4], agree [len(between)] bool).
+    """
+    src, dst = _edge_points(poses, edges, anchors, between, moving)
+    weight = edges['weight'][between]
+    agreeing = lambda delta: np.sqrt(((_apply(delta[None], src.reshape(1, -1, 3)).reshape(src.shape) - dst) ** 2)
+                                     .sum(axis=2).mean(axis=1)) < LOOP_TOLERANCE
+    best, best_support = None, -1.0
+    for k in np.r_[first, np.delete(np.arange(len(between)), first)][:MERGE_PROPOSALS]:
+        agree = agreeing(_kabsch(src[k], dst[k]))
+        if weight[agree].sum() > best_support:
+            best, best_support = agree, weight[agree].sum()
+    delta = _kabsch(src[best].reshape(-1, 3), dst[best].reshape(-1, 3))
+    return delta, agreeing(delta)
+
+def _gated(poses, edges, anchors, use, tree, gate):
+    """use restricted to tree edges and edges within `gate` (RMS anchor distance) of the poses; gate None: use."""
+    if gate is None:
+        return use
+    residual, _ = edge_residuals(poses, edges, anchors)
+    return use & (tree | (np.sqrt((residual ** 2).sum(axis=2).mean(axis=1)) < gate))
+
+def spanning_assembly(num_shards, edges, anchors, volumes, max_penetration=MAX_PENETRATION, closed=None,
+                      distinct=None):
+    """Maximum spanning tree with pose propagation and rejection of bad merges.
+
+    edges: dict of arrays 'a', 'b' (shard indices), 'transform' [E,4,4] (b -> a),
+    'weight' [E]; anchors: [E,K,3] (see edge_residuals).
+    A merge is rejected when it makes shards interpenetrate, or when the other
+    edges between the two clusters mostly (by weight) disagree with it.
+    closed: [E] bool (closed_triangles() > 0) -> strict mode for candidate pairs:
+    the tree first grows on closed edges only, then merges need MIN_AGREE
+    agreeing edges between the clusters (repeated while clusters keep merging),
+    and refinement only takes tree edges and those within STRICT_GATE.
+    distinct: [E] bool (distinct_pairs()), strict mode only: merges take these
+    edges alone; the others still count when edges between two clusters agree.
+    Returns (poses [S,4,4], component [S] root shard, tree [E] bool, rejected [E] bool).
+    """
+    poses = np.tile(np.eye(4), (num_shards, 1, 1))
+    parent = np.arange(num_shards)
+    label = np.arange(num_shards)
+    members = {i: [i] for i in range(num_shards)}
+    refined = {}
+    tree = np.zeros(len(edges['weight']), dtype=bool)
+    rejected = np.zeros(len(edges['weight']), dtype=bool)
+    order = np.argsort(-edges['weight'], kind='stable')
+    if closed is None:
+        passes, gate = [(order, 1)], None
+    else:
+        usable = np.ones(len(order), dtype=bool) if distinct is None else distinct
+        passes = [(order[(closed & usable)[order]], 1), (order[usable[order]], MIN_AGREE)]
+        gate = STRICT_GATE
+
+    tried = {}
+    for edge_order, min_agree in passes:
+        merged = True
+        while merged:
+            merged = False
+            for e in edge_order:
+                a, b = int(edges['a'][e]), int(edges['b'][e])
+                ra, rb = _find(parent, a), _find(parent, b)
+                if ra == rb: continue
+                # Repeated strict passes: clusters unchanged since the last try fail again
+                state = (ra, len(members[ra]), rb, len(members[rb]), min_agree)
+                if tried.get(e) == state: continue
+                tried[e] = state
+                # Move the smaller cluster onto the larger one
+                keep, move = (ra, rb) if len(members[ra]) >= len(members[rb]) else (rb, ra)
+                moved = members[move]
+                la, lb = label[edges['a']], label[edges['b']]
+                between = np.flatnonzero(((la == keep) & (lb == move)) | ((la == move) & (lb == keep)))
+                first = int(np.flatnonzero(between == e)[0])
+                delta, agree = cluster_motion(poses, edges, anchors, between, first, label == move)
+                trial = poses.copy()
+                trial[moved] = delta @ poses[moved]
+                support = edges['weight'][between]
+                if (agree.sum() < min_agree or (min_agree > 1 and not agree[first])
+                        or support[agree].sum() < MIN_SUPPORT * support.sum()
+                        or penetration(trial, volumes, moved, members[keep]) > max_penetration):
+                    rejected[e] = True
+                    continue
+                poses = trial
+                label[moved] = keep
+                parent[move] = keep
+                members[keep] += members.pop(move)
+                tree[e] = True
+                rejected[e] = False
+                merged = min_agree > 1
+
+                # Refine a cluster whenever it has doubled since its last refinement,
+                # so the tree's drift does not turn into false penetrations
+                if len(members[keep]) >= 2 * refined.get(keep, 1):
+                    inside = (label[edges['a']] == keep) & (label[edges['b']] == keep)
+                    inside = _gated(poses, edges, anchors, inside, tree, gate)
+                    poses = refine_poses(poses, label, edges, anchors, inside, volumes)
+                    refined[keep] = len(members[keep])
+
+    component = np.array([_find(parent, i) for i in range(num_shards)])
+    return poses, component, tree, rejected
+
+def _rotation(w):
+    """Rotation matrices [N,3,3] of rotation vectors [N,3] (Rodrigues)."""
+    angle = np.linalg.norm(w, axis=1)
+    axis = w / np.where(angle > 0, angle, 1.0)[:, None]
+    k = facet_icp._skew(axis)
+    s, c = np.sin(angle)[:, None, None], np.cos(angle)[:, None, None]
+    return np.eye(3) + s * k + (1 - c) * (k @ k)
+
+def edge_residuals(poses, edges, anchors):
+    """[E,K,3] distances between P_a T_ab p and P_b p for the anchor points p [E,K,3] (b's coordinates)."""
+    a_side = _apply(poses[edges['a']] @ edges['transform'], anchors)
+    return a_side - _apply(poses[edges['b']], anchors), a_side
+
+def refine_poses(poses, component, edges, anchors, use, volumes, iterations=REFINE_ITERATIONS,
+                 scale=REFINE_SCALE, start_scale=START_SCALE):
+    """Gauss-Newton pose-graph refinement over the `use` edges ([E] bool).
+
+    Every pose gets a left update (w, v): x -> R(w) x + v; the largest shard
+    of each component is held fixed. The Cauchy scale shrinks geometrically
+    from start_scale to scale, so loop edges that disagree only through the
+    tree's accumulated drift are pulled in while wrong ones fade out.
+    Returns refined poses [S,4,4].
+    """
+    poses = poses.copy()
+    sel = np.flatnonzero(use)
+    if len(sel) == 0:
+        return poses
+    # Only the shards the edges touch are unknowns
+    nodes, local = np.unique(np.concatenate([edges['a'][sel], edges['b'][sel]]), return_inverse=True)
+    num = len(nodes)
+    ea, eb = local[:len(sel)], local[len(sel):]
+    sub = {'a': ea, 'b': eb, 'transform': edges['transform'][sel]}
+    pts = anchors[sel]
+    weight = edges['weight'][sel]
+    node_poses = poses[nodes]
+
+    # Gauge: the biggest shard (most points) of each component stays put
+    fixed = np.zeros(num, dtype=bool)
+    for root in np.unique(component[nodes]):
+        group = np.flatnonzero(component[nodes] == root)
+        fixed[group[np.argmax(volumes['size'][nodes[group]])]] = True
+
+    for c in np.geomspace(start_scale, scale, iterations):
+        r, xa = edge_residuals(node_poses, sub, pts)
+        xb = xa - r
+        # Cauchy weights per anchor
+        w = weight[:, None] / (1 + (r ** 2).sum(axis=2) / c ** 2)
+
+        # r = -[Xa]x wa + va + [Xb]x wb - vb  ->  J [E,K,3,12]
+        eye = np.broadcast_to(np.eye(3), r.shape + (3,))
+        jac = np.concatenate([-facet_icp._skew(xa.reshape(-1, 3)).reshape(eye.shape), eye,
+                              facet_icp._skew(xb.reshape(-1, 3)).reshape(eye.shape), -eye], axis=3)
+        block = np.einsum('ek,ekij,ekil->ejl', w, jac, jac)
+        grad = np.einsum('ek,ekij,eki->ej', w, jac, r)
+
+        index = np.concatenate([6 * ea[:, None] + np.arange(6), 6 * eb[:, None] + np.arange(6)], axis=1)
+        h = np.zeros((6 * num, 6 * num))
+        g = np.zeros(6 * num)
+        np.add.at(h, (index[:, :, None], index[:, None, :]), block)
+        np.add.at(g, index, grad)
+        # Fixed and unconnected shards: identity rows
+        free = np.repeat(~fixed, 6) & (np.diag(h) > 0)
+        h[~free] = 0
+        h[:, ~free] = 0
+        h[~free, ~free] = 1
+        g[~free] = 0
+        h += 1e-9 * np.trace(h) / len(h) * np.eye(len(h))
+
+        step = -np.linalg.solve(h, g).reshape(num, 6)
+        delta = _rotation(step[:, :3])
+        node_poses[:, :3, :3] = delta @ node_poses[:, :3, :3]
+        node_poses[:, :3, 3] = np.einsum('sij,sj->si', delta, node_poses[:, :3, 3]) + step[:, 3:]
+    poses[nodes] = node_poses
+    return poses
+
+def facet_anchors(table, facet_ids):
+    """[E,5,3] anchor points of facets: centroid and centroid +- sqrt(eigenvalue) * axis (two main axes)."""
+    rows = np.searchsorted(table['id'], facet_ids)
+    centroid = table['centroid'][rows]
+    spread = table['axes'][rows][:, :, :2] * np.sqrt(table['eigenvalues'][rows][:, None, :2])
+    offsets = np.concatenate([np.zeros((len(rows), 1, 3)), spread.transpose(0, 2, 1), -spread.transpose(0, 2, 1)], axis=1)
+    return centroid[:, None, :] + offsets
+
+def reassemble(table, samples, pairs, scores=None, seed=0, strict=False):
+    """Assembles a pot from facet pairs (id_a, id_b), optionally with matcher scores.
+
+    table: facet_descriptors table; samples: shard name -> point cloud (labels = facet ids).
+    strict: only merges backed by closed loops (see spanning_assembly), for
+    facet_matcher candidates where most pairs are wrong.
+    Returns {'names', 'poses' [S,4,4], 'component' [S], 'edges', 'tree', 'rejected',
+    'loops' (non-tree edges that agree with the refined poses), 'seconds' per step}.
+    """
+    names = sorted(samples)
+    slot = {name: k for k, name in enumerate(names)}
+    seconds = {}
+
+    t0 = time.perf_counter()
+    registered = facet_icp.register_pairs(table, samples, pairs, seed)
+    seconds['registration'] = time.perf_counter() - t0
+
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    rows = np.searchsorted(table['id'], pairs)
+    known = (rows < len(table)) & (table['id'][np.minimum(rows, len(table) - 1)] == pairs)
+    ok = known.all(axis=1) & np.isfinite(registered['residual']) & (registered['inliers'] >= MIN_INLIERS)
+    shard = np.array([slot.get(str(s), -1) for s in table['shard']])
+    a, b = shard[rows[ok, 0]], shard[rows[ok, 1]]
+    ok[ok] = (a >= 0) & (b >= 0) & (a != b)
+    # Confident pairs first: good fit, and clearly better than the other start pose
+    weight = registered['score'] * (1 - registered['ambiguity']) * (1.0 if scores is None else np.asarray(scores))
+    edges = {'a': shard[rows[ok, 0]], 'b': shard[rows[ok, 1]], 'transform': registered['transforms'][ok],
+             'weight': weight[ok], 'pair': pairs[ok]}
+    anchors = facet_anchors(table, edges['pair'][:, 1])
+
+    t0 = time.perf_counter()
+    volumes = shard_volumes(samples, names, seed=seed)
+    closed = closed_triangles(len(names), edges, anchors) > 0 if strict else None
+    distinct = distinct_pairs(edges['pair'], registered['score'][ok]) if strict else None
+    poses, component, tree, rejected = spanning_assembly(len(names), edges, anchors, volumes, closed=closed,
+                                                         distinct=distinct)
+    seconds['spanning_tree'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    same = component[edges['a']] == component[edges['b']]
+    poses = refine_poses(poses, component, edges, anchors,
+                         _gated(poses, edges, anchors, same, tree, STRICT_GATE if strict else None), volumes)
+    residual, _ = edge_residuals(poses, edges, anchors)
+    loops = same & ~tree & (np.sqrt((residual ** 2).sum(axis=2).mean(axis=1)) < LOOP_TOLERANCE)
+    seconds['refinement'] = time.perf_counter() - t0
+
+    return {'names': names, 'poses': poses, 'component': component, 'edges': edges,
+            'tree': tree, 'rejected': rejected, 'loops': loops, 'seconds': seconds}
+
+def _kabsch(src, dst):
+    """Rigid 4x4 transform best mapping src [N,3] onto dst [N,3]."""
+    mu_s, mu_d = src.mean(axis=0), dst.mean(axis=0)
+    u, _, vt = np.linalg.svd((src - mu_s).T @ (dst - mu_d))
+    d = np.sign(np.linalg.det(vt.T @ u.T))
+    rot = vt.T @ np.diag([1.0, 1.0, d]) @ u.T
+    out = np.eye(4)
+    out[:3, :3] = rot
+    out[:3, 3] = mu_d - rot @ mu_s
+    return out
+
+def assembly_error(result, poses_gt, samples):
+    """Errors of the largest assembled component against poses.json (frame 1).
+
+    Returns {'placed' share of shards in the largest component, 'components',
+    'rotation_deg' [S], 'translation_m' [S] RMS point error, 'correct' share of all shards}.
+    """
+    names, poses, component = result['names'], result['poses'], result['component']
+    roots, counts = np.unique(component, return_counts=True)
+    group = np.flatnonzero(component == roots[np.argmax(counts)])
+    truth = np.array([np.array(poses_gt[n]['frame_1']) @ np.linalg.inv(np.array(poses_gt[n]['export']))
+                      for n in names])
+    points = shard_volumes(samples, names)['points']
+
+    align = _kabsch(_apply(poses[group], points[group]).reshape(-1, 3),
+                    _apply(truth[group], points[group]).reshape(-1, 3))
+    placed = align @ poses[group]
+    delta = placed[:, :3, :3] @ truth[group, :3, :3].transpose(0, 2, 1)
+    rotation = np.degrees(np.arccos(np.clip((np.trace(delta, axis1=1, axis2=2) - 1) / 2, -1.0, 1.0)))
+    diff = _apply(placed, points[group]) - _apply(truth[group], points[group])
+    translation = np.sqrt((diff ** 2).sum(axis=2).mean(axis=1))
+    correct = (rotation < CORRECT_DEG) & (translation < CORRECT_M)
+    return {'placed': len(group) / len(names), 'components': len(roots),
+            'rotation_deg': rotation, 'translation_m': translation, 'correct': correct.sum() / len(names)}
+
+def evaluate(path, predicted=None, pots=None, seed=0):
+    """Reassembles every pot of a dataset root or pack, errors against poses.json.
+
+    predicted: use facet_matcher's top-k candidates (k = predicted) instead of adjacency.json.
+    """
+    import dataset_loader
+    source = dataset_loader.open_source(path)
+    results = []
+    for pot_name in (pots or source.pots()):
+        table = source.load_facets(pot_name)
+        poses_gt = source.load_poses(pot_name)
+        if table is None or poses_gt is None: continue
+        samples = {shard: source.load_shard(pot_name, shard) for shard in source.shards(pot_name)}
+        t0 = time.perf_counter()
+        if predicted:
+            candidates, scores = facet_matcher.match_facets(table, predicted)
+            pairs = facet_matcher.pair_ids(table, candidates)
+        else:
+            pairs, scores = np.asarray(source.load_adjacency(pot_name), dtype=np.int64).reshape(-1, 2), None
+        result = reassemble(table, samples, pairs, scores, seed, strict=bool(predicted))
+        seconds = time.perf_counter() - t0
+        error = assembly_error(result, poses_gt, samples)
+        results.append(dict(error, pot=pot_name, shards=len(result['names']), pairs=len(pairs),
+                            tree=int(result['tree'].sum()), loops=int(result['loops'].sum()),
+                            rejected=int(result['rejected'].sum()), seconds=seconds))
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reassemble pots from facet pairs, errors vs poses.json")
+    parser.add_argument("path", help="Dataset root (Pot_XXX folders) or .jpak pack")
+    parser.add_argument("--predicted", type=int, default=0, metavar="K",
+                        help="Use facet_matcher's top-K candidates instead of adjacency.json")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = evaluate(args.path, args.predicted, seed=args.seed)
+    if not results:
+        print(f"No pot with {facet_descriptors.FACETS_NAME} and {facet_icp.POSES_NAME} in {args.path}")
+        return 1
+    for r in results:
+        print(f"{r['pot']}: {r['shards']} shards, {r['pairs']} pairs -> {r['tree']} tree + {r['loops']} loop edges "
+              f"({r['rejected']} rejected), {r['components']} component(s), {r['placed']:.0%} in the largest, "
+              f"{r['correct']:.0%} correct, median error {np.median(r['rotation_deg']):.2f} deg / "
+              f"{np.median(r['translation_m']) * 1000:.1f} mm ({r['seconds']:.2f} s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
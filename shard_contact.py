@@ -0,0 +1,279 @@
+import numpy as np
+
+# World-space contact queries between shards.
+#
+# All shard triangles (frame 1) go into one uniform grid. A triangle is listed
+# in every cell its AABB, padded by the query radius, touches, so a query point
+# only needs the triangles of its own cell. Candidates are filtered by AABB and
+# then refined with an exact point-triangle distance, all in batched NumPy.
+# Triangles that would cover more than MAX_TRI_CELLS cells (big un-subdivided
+# fracture faces) stay out of the grid and are tested against every query
+# point by AABB instead, so memory stays bounded by MAX_TRI_CELLS per triangle.
+
+QUERY_CHUNK = 20000 # Query points per batch (bounds the candidate-pair arrays)
+MAX_TRI_CELLS = 64  # Cells a triangle may occupy in the grid
+BIG_TRI_CHUNK = 256 # Big triangles per AABB test block
+
+def closest_point_on_triangles(p, a, b, c):
+    """Closest points on triangles (a, b, c) to points p, row-wise (Ericson 5.1.5)."""
+    ab = b - a
+    ac = c - a
+    ap = p - a
+    d1 = np.einsum('ij,ij->i', ab, ap)
+    d2 = np.einsum('ij,ij->i', ac, ap)
+
+    bp = p - b
+    d3 = np.einsum('ij,ij->i', ab, bp)
+    d4 = np.einsum('ij,ij->i', ac, bp)
+
+    cp = p - c
+    d5 = np.einsum('ij,ij->i', ab, cp)
+    d6 = np.einsum('ij,ij->i', ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Interior (default)
+        denom = va + vb + vc
+        v = vb / denom
+        w = vc / denom
+        result = a + ab * v[:, None] + ac * w[:, None]
+
+        # Edge BC
+        t_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        mask = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+        result[mask] = (b + (c - b) * t_bc[:, None])[mask]
+
+        # Edge AC
+        t_ac = d2 / (d2 - d6)
+        mask = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        result[mask] = (a + ac * t_ac[:, None])[mask]
+
+        # Vertex C
+        mask = (d6 >= 0) & (d5 <= d6)
+        result[mask] = c[mask]
+
+        # Edge AB
+        t_ab = d1 / (d1 - d3)
+        mask = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        result[mask] = (a + ab * t_ab[:, None])[mask]
+
+    # Vertices A and B (applied last = highest priority, as in the scalar routine)
+    mask = (d3 >= 0) & (d4 <= d3)
+    result[mask] = b[mask]
+    mask = (d1 <= 0) & (d2 <= 0)
+    result[mask] = a[mask]
+
+    # Degenerate triangles: fall back to the closest vertex
+    bad = ~np.isfinite(result).all(axis=1)
+    if bad.any():
+        verts = np.stack([a[bad], b[bad], c[bad]], axis=1)
+        d = np.linalg.norm(verts - p[bad][:, None, :], axis=2)
+        result[bad] = verts[np.arange(len(verts)), np.argmin(d, axis=1)]
+    return result
+
+class ContactIndex:
+    """Uniform grid over the world triangles of many shards."""
+
+    def __init__(self, shard_arrays, radius, cell_size=None):
+        """shard_arrays: list of {'co': [V,3] world coords, 'tris': [T,3]} per shard."""
+        self.radius = float(radius)
+        self.num_shards = len(shard_arrays)
+
+        tri_a, tri_b, tri_c, tri_shard = [], [], [], []
+        for s, arrays in enumerate(shard_arrays):
+            co, tris = arrays['co'], arrays['tris']
+            if len(tris) == 0: continue
+            tri_a.append(co[tris[:, 0]])
+            tri_b.append(co[tris[:, 1]])
+            tri_c.append(co[tris[:, 2]])
+            tri_shard.append(np.full(len(tris), s, dtype=np.int32))
+
+        if not tri_shard:
+            self.a = self.b = self.c = np.zeros((0, 3))
+            self.tri_shard = np.zeros(0, dtype=np.int32)
+            self.cell_keys = np.zeros(0, dtype=np.int64)
+            self.cell_tris = np.zeros(0, dtype=np.int64)
+            self.big_tris = np.zeros(0, dtype=np.int64)
+            self.origin = np.zeros(3)
+            self.cell = 1.0
+            self.dims = np.ones(3, dtype=np.int64)
+            return
+
+        self.a = np.concatenate(tri_a)
+        self.b = np.concatenate(tri_b)
+        self.c = np.concatenate(tri_c)
+        self.tri_shard = np.concatenate(tri_shard)
+
+        self.lo = np.minimum(np.minimum(self.a, self.b), self.c) - self.radius
+        self.hi = np.maximum(np.maximum(self.a, self.b), self.c) + self.radius
+
+        if cell_size is None:
+            # Typical triangle extent -> each triangle lands in a handful of cells
+            cell_size = float(np.median(np.max(self.hi - self.lo, axis=1)))
+        self.cell = max(cell_size, 1e-6)
+
+        self.origin = self.lo.min(axis=0)
+        self.dims = np.floor((self.hi.max(axis=0) - self.origin) / self.cell).astype(np.int64) + 1
+        self._build_grid()
+
+    def _build_grid(self):
+        c_lo = np.floor((self.lo - self.origin) / self.cell).astype(np.int64)
+        c_hi = np.floor((self.hi - self.origin) / self.cell).astype(np.int64)
+        span = c_hi - c_lo + 1
+        counts = span.prod(axis=1)
+        # Oversized triangles are kept aside (see module comment)
+        big = counts > MAX_TRI_CELLS
+        self.big_tris = np.flatnonzero(big)
+        counts[big] = 0
+
+        # Expand every triangle to all the cells of its padded AABB
+        tri_rep = np.repeat(np.arange(len(counts)), counts)
+        starts = np.cumsum(counts) - counts
+        k = np.arange(counts.sum()) - np.repeat(starts, counts)
+        sx = span[tri_rep, 0]
+        sy = span[tri_rep, 1]
+        ix = c_lo[tri_rep, 0] + k % sx
+        iy = c_lo[tri_rep, 1] + (k // sx) % sy
+        iz = c_lo[tri_rep, 2] + k // (sx * sy)
+
+        keys = self._key(ix, iy, iz)
+        order = np.argsort(keys, kind='stable')
+        self.cell_keys = keys[order]
+        self.cell_tris = tri_rep[order]
+
+    def _key(self, ix, iy, iz):
+        return (iz * self.dims[1] + iy) * self.dims[0] + ix
+
+    def _candidates(self, points):
+        """(point_row, triangle) pairs sharing a grid cell."""
+        cells = np.floor((points - self.origin) / self.cell).astype(np.int64)
+        inside = np.all((cells >= 0) & (cells < self.dims), axis=1)
+        keys = np.where(inside, self._key(cells[:, 0], cells[:, 1], cells[:, 2]), -1)
+
+        start = np.searchsorted(self.cell_keys, keys, side='left')
+        end = np.searchsorted(self.cell_keys, keys, side='right')
+        end[~inside] = start[~inside]
+        counts = end - start
+
+        rows = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tris = self.cell_tris[np.repeat(start, counts) + offsets]
+
+        # Big triangles: every point inside their padded AABB
+        all_rows, all_tris = [rows], [tris]
+        for b0 in range(0, len(self.big_tris), BIG_TRI_CHUNK):
+            big = self.big_tris[b0:b0 + BIG_TRI_CHUNK]
+            hit = np.all((points[:, None, :] >= self.lo[big][None]) & (points[:, None, :] <= self.hi[big][None]), axis=2)
+            r, t = np.nonzero(hit)
+            all_rows.append(r)
+            all_tris.append(big[t])
+        return np.concatenate(all_rows), np.concatenate(all_tris)
+
+    def nearest_other_shard(self, points, point_shard, allowed=None):
+        """Nearest shard (other than the point's own) within the radius.
+
+        points: [N,3] world positions, point_shard: [N] shard index of each point.
+        allowed: optional [S,S] bool matrix; allowed[s, t] permits shard t for
+                 points of shard s (broadphase candidates).
+        Returns (shard [N] int, -1 if none; distance [N], inf if none).
+        Ties go to the lowest shard index, like the per-shard loop it replaces.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        point_shard = np.asarray(point_shard, dtype=np.int64)
+        best_shard = np.full(len(points), -1, dtype=np.int64)
+        best_dist = np.full(len(points), np.inf)
+        if len(self.tri_shard) == 0:
+            return best_shard, best_dist
+
+        for c0 in range(0, len(points), QUERY_CHUNK):
+            pts = points[c0:c0 + QUERY_CHUNK]
+            own = point_shard[c0:c0 + QUERY_CHUNK]
+            rows, tris = self._candidates(pts)
+
+            other = self.tri_shard[tris]
+            keep = other != own[rows]
+            if allowed is not None:
+                keep &= allowed[own[rows], other]
+            p = pts[rows]
+            keep &= np.all((p >= self.lo[tris]) & (p <= self.hi[tris]), axis=1)
+            rows, tris, other, p = rows[keep], tris[keep], other[keep], p[keep]
+            if len(rows) == 0: continue
+
+            q = closest_point_on_triangles(p, self.a[tris], self.b[tris], self.c[tris])
+            dist = np.linalg.norm(q - p, axis=1)
+            hit = dist < self.radius
+            rows, other, dist = rows[hit], other[hit], dist[hit]
+            if len(rows) == 0: continue
+
+            # First entry per row after sorting by (row, dist, shard)
+            order = np.lexsort((other, dist, rows))
+            rows, other, dist = rows[order], other[order], dist[order]
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = rows[1:] != rows[:-1]
+            best_shard[c0 + rows[first]] = other[first]
+            best_dist[c0 + rows[first]] = dist[first]
+
+        return best_shard, best_dist
+
+def nearest_other_shard_bruteforce(shard_arrays, points, point_shard, radius):
+    """Reference: every point against every triangle of every other shard."""
+    best_shard = np.full(len(points), -1, dtype=np.int64)
+    best_dist = np.full(len(points), np.inf)
+    for i, p in enumerate(points):
+        for s, arrays in enumerate(shard_arrays):
+            if s == point_shard[i] or len(arrays['tris']) == 0: continue
+            tris = arrays['tris']
+            co = arrays['co']
+            pp = np.repeat(p[None], len(tris), axis=0)
+            q = closest_point_on_triangles(pp, co[tris[:, 0]], co[tris[:, 1]], co[tris[:, 2]])
+            d = np.linalg.norm(q - pp, axis=1).min()
+            if d < radius and d < best_dist[i]:
+                best_dist[i] = d
+                best_shard[i] = s
+    return best_shard, best_dist
+
+# --- Broadphase ---
+
+def shard_aabbs(shard_arrays):
+    """World AABB per shard -> (lo [S,3], hi [S,3]). Empty shards get an inverted box."""
+    lo = np.full((len(shard_arrays), 3), np.inf)
+    hi = np.full((len(shard_arrays), 3), -np.inf)
+    for s, arrays in enumerate(shard_arrays):
+        if len(arrays['tris']) == 0: continue
+        used = arrays['co'][np.unique(arrays['tris'])]
+        lo[s] = used.min(axis=0)
+        hi[s] = used.max(axis=0)
+    return lo, hi
+
+def broadphase_candidates(lo, hi, pad):
+    """[S,S] bool matrix of shard pairs whose AABBs (padded by pad) overlap."""
+    lo = lo - pad
+    hi = hi + pad
+    overlap = np.all((lo[:, None, :] <= hi[None, :, :]) & (hi[:, None, :] >= lo[None, :, :]), axis=2)
+    np.fill_diagonal(overlap, False)
+    return overlap
+
+def candidate_lists(candidates):
+    """Per shard: array of candidate neighbour indices."""
+    return [np.flatnonzero(row) for row in candidates]
+
+def pruning_stats(candidates, groups=None):
+    """Candidate pairs vs all pairs, overall and per group (e.g. per pot).
+
+    groups: optional list with a group key per shard.
+    Returns {key: (candidate_pairs, all_pairs, pruned_ratio)}; key None = all shards.
+    """
+    def stats(idx):
+        n = len(idx)
+        total = n * (n - 1) // 2
+        kept = int(np.triu(candidates[np.ix_(idx, idx)], 1).sum())
+        return kept, total, (1.0 - kept / total) if total else 0.0
+
+    result = {None: stats(np.arange(len(candidates)))}
+    if groups is not None:
+        for key in dict.fromkeys(groups):
+            result[key] = stats(np.array([i for i, g in enumerate(groups) if g == key]))
+    return result
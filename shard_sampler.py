@@ -0,0 +1,354 @@
+import os
+import time
+import zlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Vectorized surface sampler shared by the exporters.
+# Blender data is pulled once per shard with foreach_get, everything after
+# that is plain NumPy (no bpy needed to sample from the arrays).
+#
+# sample_shards() keeps the bpy part (extraction) on the calling thread and
+# runs sampling + the optional write callback of every shard on a thread pool.
+# With per-shard seeds the output is identical to the serial path.
+#
+# Sampling methods (sample_arrays(method=...)):
+#   uniform - i.i.d. area-weighted points (clusters and gaps at 2048 points)
+#   fps     - farthest-point sampling over a dense uniform pre-sample, first
+#             thinned to one candidate per voxel so FPS runs on ~4x num_points
+#   poisson - Poisson-disk (blue noise) dart throwing over the dense
+#             pre-sample: grid cells of r/sqrt(3) hold at most one point and
+#             the 27 cell phases are processed as vectorized batches
+#
+# Nested levels (levels=[512, 1024, 2048, 8192]): max(levels) points are
+# sampled once and reordered (nested_order) so that every prefix is a
+# well-spread lower-resolution cloud; readers slice pos[:512] etc.
+
+SAMPLING_METHODS = ("uniform", "fps", "poisson")
+DENSE_FACTOR = 16      # Dense pre-sample of fps/poisson: DENSE_FACTOR * num_points candidates
+FPS_REDUCTION = 4      # FPS runs on about FPS_REDUCTION * num_points voxel representatives
+POISSON_FILL = 0.55    # Dart throwing yields about 1.1 * num_points at radius sqrt(POISSON_FILL * area / num_points)
+POISSON_ROUNDS = 3     # Candidates tried per grid cell (later rounds add few points)
+DENSE_GRID_LIMIT = 1 << 23 # Cells of a dense lookup grid (int32), else sorted-key lookup
+
+def default_workers():
+    return min(8, os.cpu_count() or 1)
+
+def extract_shard_arrays(obj):
+    """Pulls world-space vertices and loop triangles of a mesh object into arrays."""
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3).astype(np.float64)
+
+    # Bake the object transform into the vertices (same as bm.transform(matrix_world))
+    mw = np.array(obj.matrix_world, dtype=np.float64)
+    co = co @ mw[:3, :3].T + mw[:3, 3]
+
+    num_tris = len(mesh.loop_triangles)
+    tris = np.empty(num_tris * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    material_index = np.empty(num_tris, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", material_index)
+    polygon_index = np.empty(num_tris, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("polygon_index", polygon_index)
+
+    return {
+        'co': co,
+        'tris': tris.reshape(-1, 3),
+        'material_index': material_index,
+        'polygon_index': polygon_index,
+    }
+
+def material_label_table(obj, mat_to_id):
+    """Material slot -> facet label (0 = original surface)."""
+    table = np.zeros(max(len(obj.data.materials), 1), dtype=np.int32)
+    for i, mat in enumerate(obj.data.materials):
+        if mat and "RECON_V6_" in mat.name:
+            table[i] = mat_to_id.get((obj.name, mat.name), 0)
+    return table
+
+def sample_surface(co, tris, num_points, rng):
+    """Area-weighted uniform sampling of a triangle soup.
+
+    Returns (positions, normals, triangle_index) for num_points samples.
+    """
+    a = co[tris[:, 0]]
+    b = co[tris[:, 1]]
+    c = co[tris[:, 2]]
+    cross = np.cross(b - a, c - a)
+    dbl_area = np.linalg.norm(cross, axis=1)
+
+    # Cumulative area table -> pick triangles in one searchsorted call
+    cum_area = np.cumsum(dbl_area)
+    r = rng.random(num_points) * cum_area[-1]
+    tri_idx = np.searchsorted(cum_area, r, side='right')
+    np.minimum(tri_idx, len(tris) - 1, out=tri_idx)
+
+    # Barycentric weights (folded back into the triangle)
+    u = rng.random(num_points)
+    v = rng.random(num_points)
+    flip = u + v > 1
+    u[flip] = 1 - u[flip]
+    v[flip] = 1 - v[flip]
+    w = 1 - u - v
+
+    pos = (u[:, None] * a[tri_idx] +
+           v[:, None] * b[tri_idx] +
+           w[:, None] * c[tri_idx])
+
+    length = dbl_area[tri_idx]
+    length[length == 0] = 1.0
+    norm = cross[tri_idx] / length[:, None]
+    return pos, norm, tri_idx
+
+def surface_area(co, tris):
+    a = co[tris[:, 0]]
+    return 0.5 * float(np.linalg.norm(np.cross(co[tris[:, 1]] - a, co[tris[:, 2]] - a), axis=1).sum())
+
+def _cell_keys(pos, cell_size, pad=0):
+    """(linear cell key per point, grid dims) of a padded grid over the points."""
+    cells = np.floor((pos - pos.min(axis=0)) / cell_size).astype(np.int64) + pad
+    dims = cells.max(axis=0) + 1 + pad
+    return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2], dims
+
+def voxel_representatives(pos, cell_size):
+    """Index of the first point in every occupied voxel (a random one for i.i.d. points)."""
+    keys, _ = _cell_keys(pos, cell_size)
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
+
+def farthest_point_indices(pos, num_points, rng):
+    """Greedy farthest-point sampling; one vectorized distance update per pick."""
+    n = len(pos)
+    if num_points >= n:
+        return np.arange(n)
+    x, y, z = (np.ascontiguousarray(pos[:, k], dtype=np.float32) for k in range(3))
+    dist = np.full(n, np.inf, dtype=np.float32)
+    d = np.empty(n, dtype=np.float32)
+    t = np.empty(n, dtype=np.float32)
+    picked = np.empty(num_points, dtype=np.int64)
+    cur = int(rng.integers(n))
+    for i in range(num_points):
+        picked[i] = cur
+        np.subtract(x, x[cur], out=d)
+        np.multiply(d, d, out=d)
+        np.subtract(y, y[cur], out=t)
+        np.multiply(t, t, out=t)
+        d += t
+        np.subtract(z, z[cur], out=t)
+        np.multiply(t, t, out=t)
+        d += t
+        np.minimum(dist, d, out=dist)
+        cur = int(dist.argmax())
+    return picked
+
+def poisson_disk_indices(pos, radius, rounds=POISSON_ROUNDS):
+    """Candidates kept by dart throwing in candidate order, no two closer than radius."""
+    h = radius / np.sqrt(3)  # Cell diagonal = radius -> at most one point per cell
+    keys, dims = _cell_keys(pos, h, pad=2)
+    order = np.argsort(keys, kind='stable')
+    cell_keys, first, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    cz = cell_keys % dims[2]
+    cy = cell_keys // dims[2] % dims[1]
+    cx = cell_keys // (dims[1] * dims[2])
+    phase = (cx % 3) * 9 + (cy % 3) * 3 + cz % 3
+
+    # Neighbour cells that can hold a point closer than radius
+    r = np.arange(-2, 3)
+    off = np.stack(np.meshgrid(r, r, r, indexing='ij'), axis=-1).reshape(-1, 3)
+    off = off[(np.clip(np.abs(off) - 1, 0, None) ** 2).sum(axis=1) < 3]
+    off_keys = (off[:, 0] * dims[1] + off[:, 1]) * dims[2] + off[:, 2]
+
+    accepted = np.full(len(cell_keys), -1, dtype=np.int64)
+    dense = int(np.prod(dims)) <= DENSE_GRID_LIMIT
+    if dense:
+        owner = np.full(int(np.prod(dims)), -1, dtype=np.int32)
+
+    def neighbours(keys):
+        if dense:
+            return owner[keys]
+        slot = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+        return np.where(cell_keys[slot] == keys, accepted[slot], -1)
+
+    by_phase = [np.flatnonzero(phase == p) for p in range(27)]
+    r2 = radius * radius
+    for t in range(rounds):
+        tried = False
+        for cells in by_phase:
+            # Cells of one phase are >= 3 cells apart: their candidates cannot conflict
+            cells = cells[(accepted[cells] < 0) & (counts[cells] > t)]
+            if len(cells) == 0: continue
+            tried = True
+            cand = order[first[cells] + t]
+            nb = neighbours(cell_keys[cells][:, None] + off_keys[None, :])
+            # Distances only to the occupied neighbour cells
+            rows, cols = np.nonzero(nb >= 0)
+            d2 = ((pos[nb[rows, cols]] - pos[cand[rows]]) ** 2).sum(axis=1)
+            ok = np.ones(len(cells), dtype=bool)
+            ok[rows[d2 < r2]] = False
+            accepted[cells[ok]] = cand[ok]
+            if dense:
+                owner[cell_keys[cells[ok]]] = cand[ok]
+        if not tried:
+            break
+    return np.sort(accepted[accepted >= 0])
+
+def select_blue_noise(pos, num_points, area, rng, rounds=POISSON_ROUNDS):
+    """Exactly num_points Poisson-disk indices into the candidates pos."""
+    n = len(pos)
+    if num_points >= n:
+        return np.arange(n)
+    radius = np.sqrt(POISSON_FILL * area / num_points)
+    for _ in range(3):
+        keep = poisson_disk_indices(pos, radius, rounds)
+        if len(keep) >= num_points:
+            break
+        # Too sparse: shrink the radius by the missing density and retry
+        radius *= 0.95 * np.sqrt(max(len(keep), 1) / num_points)
+    if len(keep) > num_points:
+        keep = np.sort(rng.choice(keep, num_points, replace=False))
+    elif len(keep) < num_points:
+        rest = np.setdiff1d(np.arange(n), keep)
+        keep = np.sort(np.concatenate([keep, rng.choice(rest, num_points - len(keep), replace=False)]))
+    return keep
+
+def sample_surface_method(co, tris, num_points, rng, method="uniform", candidates=None):
+    """sample_surface() with a point distribution: 'uniform', 'fps' or 'poisson'.
+
+    candidates: size of the dense pre-sample for fps/poisson (default DENSE_FACTOR * num_points).
+    """
+    if method == "uniform":
+        return sample_surface(co, tris, num_points, rng)
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {method}")
+
+    pos, norm, tri_idx = sample_surface(co, tris, candidates or DENSE_FACTOR * num_points, rng)
+    area = surface_area(co, tris)
+    if method == "fps":
+        reps = voxel_representatives(pos, np.sqrt(area / (FPS_REDUCTION * num_points)))
+        if len(reps) < num_points:
+            reps = np.arange(len(pos))
+        keep = reps[farthest_point_indices(pos[reps], num_points, rng)]
+    else:
+        keep = select_blue_noise(pos, num_points, area, rng)
+    return pos[keep], norm[keep], tri_idx[keep]
+
+def nested_order(pos, levels, rng):
+    """Permutation of pos whose prefixes are spread over the shard.
+
+    FPS order up to the second largest level (so every smaller level is an
+    FPS subset), the remaining points of the largest level in random order.
+    """
+    n = len(pos)
+    levels = sorted(levels)
+    head = min(levels[-2] if len(levels) > 1 else 0, n)
+    if head == 0:
+        return rng.permutation(n)
+    first = farthest_point_indices(pos, head, rng)
+    rest = np.setdiff1d(np.arange(n), first)
+    return np.concatenate([first, rng.permutation(rest)])
+
+def shard_seed(base_seed, shard_name):
+    """Per-shard seed from the pot's sampler seed (None -> unseeded)."""
+    if base_seed is None:
+        return None
+    return [int(base_seed), zlib.crc32(shard_name.encode("utf-8"))]
+
+def prepare_shard(obj, mat_to_id=None):
+    """bpy part of sampling (main thread only). Returns (arrays, label_table, seconds)."""
+    t0 = time.perf_counter()
+    arrays = extract_shard_arrays(obj)
+    label_table = material_label_table(obj, mat_to_id or {})
+    return arrays, label_table, time.perf_counter() - t0
+
+def sample_shard_points(obj, num_points=2048, mat_to_id=None, seed=None, method="uniform"):
+    """Samples one shard. Returns (sample, timings).
+
+    sample: {'pos': float32 [N,3], 'norm': float32 [N,3], 'label': int32 [N]}
+    timings: seconds spent in extraction and sampling.
+    """
+    arrays, label_table, t_extract = prepare_shard(obj, mat_to_id)
+    t1 = time.perf_counter()
+    sample = sample_arrays(arrays, label_table, num_points, np.random.default_rng(seed), method)
+    timings = {'extract': t_extract, 'sample': time.perf_counter() - t1}
+    return sample, timings
+
+def sample_prepared_shards(prepared, num_points=2048, seeds=None, workers=1, write=None, method="uniform", levels=None):
+    """Samples shards from an iterable of prepare_shard() results.
+
+    The iterable is consumed on the calling thread (so it may touch bpy) while
+    earlier shards are already being sampled on `workers` threads.
+    write(k, sample): optional per-shard callback run on the worker (e.g. file
+    serialization); its return value is passed through.
+    method: one of SAMPLING_METHODS.
+    levels: nested resolutions (num_points must be max(levels)), see nested_order.
+    Returns [(sample, timings, written)] in shard order.
+    """
+    def job(k, arrays, label_table, t_extract):
+        seed = seeds[k] if seeds is not None else None
+        t0 = time.perf_counter()
+        sample = sample_arrays(arrays, label_table, num_points, np.random.default_rng(seed), method, levels)
+        t1 = time.perf_counter()
+        written = write(k, sample) if write else None
+        timings = {'extract': t_extract, 'sample': t1 - t0}
+        if write:
+            timings['write'] = time.perf_counter() - t1
+        return sample, timings, written
+
+    if workers <= 1:
+        return [job(k, *p) for k, p in enumerate(prepared)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(job, k, *p) for k, p in enumerate(prepared)]
+        return [f.result() for f in futures]
+
+def sample_shards(objs, num_points=2048, mat_to_id=None, seeds=None, workers=1, write=None, method="uniform",
+                  levels=None):
+    """sample_prepared_shards over Blender objects (extraction stays on this thread)."""
+    return sample_prepared_shards((prepare_shard(obj, mat_to_id) for obj in objs),
+                                  num_points, seeds, workers, write, method, levels)
+
+def sample_arrays(arrays, label_table, num_points, rng, method="uniform", levels=None):
+    """Samples already extracted shard arrays (no bpy access).
+
+    levels: reorder the points so every level is a prefix (see nested_order).
+    """
+    if len(arrays['tris']) == 0:
+        return {
+            'pos': np.zeros((0, 3), dtype=np.float32),
+            'norm': np.zeros((0, 3), dtype=np.float32),
+            'label': np.zeros(0, dtype=np.int32),
+        }
+
+    pos, norm, tri_idx = sample_surface_method(arrays['co'], arrays['tris'], num_points, rng, method)
+    if levels:
+        order = nested_order(pos, levels, rng)
+        pos, norm, tri_idx = pos[order], norm[order], tri_idx[order]
+    mat_idx = np.clip(arrays['material_index'][tri_idx], 0, len(label_table) - 1)
+    return {
+        'pos': pos.astype(np.float32),
+        'norm': norm.astype(np.float32),
+        'label': label_table[mat_idx],
+    }
+
+def sample_to_records(sample):
+    """Legacy JSON layout: list of {'pos', 'norm', 'label'} dicts."""
+    return [
+        {'pos': p, 'norm': n, 'label': l}
+        for p, n, l in zip(sample['pos'].tolist(), sample['norm'].tolist(), sample['label'].tolist())
+    ]
+
+def parse_levels(text):
+    """"512, 1024,2048" -> [512, 1024, 2048] (sorted, unique); empty -> None."""
+    levels = sorted({int(v) for v in text.replace(",", " ").split()})
+    if any(v <= 0 for v in levels):
+        raise ValueError(f"Point levels must be positive: {text}")
+    return levels or None
+
+def format_timings(name, timings, num_points):
+    line = f"  {name}: extract {timings['extract'] * 1000:.1f} ms, sample {timings['sample'] * 1000:.1f} ms"
+    if 'write' in timings:
+        line += f", write {timings['write'] * 1000:.1f} ms"
+    return line + f" ({num_points} pts)"
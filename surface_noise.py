@@ -0,0 +1,61 @@
+import numpy as np
+
+# Vectorized procedural roughness for the pot surface.
+#
+# Stands in for the SUBSURF + DISPLACE(CLOUDS "Excavated_Noise") modifiers:
+# seeded 3D gradient (Perlin) noise, summed over octaves, moves every vertex
+# along its normal before the mesh datablock is created.
+
+ROUGHNESS_STRENGTH = 0.008 # Displace strength of the old modifier
+ROUGHNESS_FREQUENCY = 20.0 # 1 / CLOUDS noise_scale (0.05)
+ROUGHNESS_OCTAVES = 3      # CLOUDS noise_depth 2 = 3 octaves
+
+# 12 cube-edge gradients of improved Perlin noise
+GRADIENTS = np.array([
+    [1, 1, 0], [-1, 1, 0], [1, -1, 0], [-1, -1, 0],
+    [1, 0, 1], [-1, 0, 1], [1, 0, -1], [-1, 0, -1],
+    [0, 1, 1], [0, -1, 1], [0, 1, -1], [0, -1, -1],
+], dtype=np.float64)
+
+def permutation_table(seed=None):
+    """Doubled 256-entry permutation. seed None -> fixed table (same pattern every pot)."""
+    perm = np.random.default_rng(0 if seed is None else seed).permutation(256)
+    return np.concatenate([perm, perm])
+
+def gradient_noise(points, perm):
+    """3D gradient noise at points [N,3], roughly in [-1, 1]."""
+    cell = np.floor(points)
+    f = points - cell
+    i = cell.astype(np.int64) & 255
+    u = f * f * f * (f * (f * 6 - 15) + 10) # fade curve
+
+    result = np.zeros(len(points))
+    for corner in range(8):
+        off = np.array([(corner >> 0) & 1, (corner >> 1) & 1, (corner >> 2) & 1])
+        h = perm[perm[perm[i[:, 0] + off[0]] + i[:, 1] + off[1]] + i[:, 2] + off[2]] % 12
+        dot = np.einsum('ij,ij->i', GRADIENTS[h], f - off)
+        weight = np.prod(np.where(off == 1, u, 1 - u), axis=1)
+        result += weight * dot
+    return result
+
+def fractal_noise(points, frequency=ROUGHNESS_FREQUENCY, octaves=ROUGHNESS_OCTAVES, seed=None,
+                  lacunarity=2.0, gain=0.5):
+    """Octave sum of gradient noise, normalized back to roughly [-1, 1]."""
+    perm = permutation_table(seed)
+    points = np.asarray(points, dtype=np.float64)
+    total = np.zeros(len(points))
+    amplitude = 1.0
+    norm = 0.0
+    for octave in range(octaves):
+        # Shift every octave so the lattices don't line up at the origin
+        total += amplitude * gradient_noise(points * frequency + octave * 17.31, perm)
+        norm += amplitude
+        frequency *= lacunarity
+        amplitude *= gain
+    return total / norm
+
+def displace_along_normals(verts, normals, strength=ROUGHNESS_STRENGTH, frequency=ROUGHNESS_FREQUENCY,
+                           octaves=ROUGHNESS_OCTAVES, seed=None):
+    """verts + normal * strength * (noise - midlevel), like Displace with midlevel 0.5."""
+    noise = fractal_noise(verts, frequency, octaves, seed)
+    return verts + normals * (0.5 * strength * noise)[:, None]
@@ -0,0 +1,184 @@
+import numpy as np
+
+# Reproducible fractured-pot fixture without Blender or RBDLab.
+#
+# The pot is a thick open cylinder cut into angular x height bricks. Each
+# height row is rotated by a random angle, so a brick's top and bottom touch
+# two or more bricks of the neighbouring rows, like a real cell fracture.
+# Every brick is a closed quad mesh in the same array layout the pipeline pulls
+# from Blender (see shard_sampler.extract_shard_arrays and
+# facet_segmentation_v6_majority.mesh_loop_arrays):
+#
+#   'name', 'co' [V,3] world (frame 1), 'tris' [T,3], 'material_index' [T],
+#   'polygon_index' [T], 'loop_start' [F], 'loop_total' [F], 'loop_edges' [L],
+#   'inner' [F] bool (fracture faces, like RBDLab's Inner_faces), 'centers' [F,3]
+
+RADIUS_IN = 0.20
+RADIUS_OUT = 0.23
+HEIGHT = 0.60
+SUBDIVISION_LEVELS = {'low': 4, 'high': 12} # Quads per brick face edge
+RELIEF_WAVELENGTH = 0.04 # Typical wavelength (m) of the optional fracture relief
+RELIEF_WAVES = 6
+
+def choose_grid(num_shards):
+    """(angular, rows) with angular * rows == num_shards and angular close to 3 * rows."""
+    best = (num_shards, 1)
+    for rows in range(1, num_shards + 1):
+        if num_shards % rows: continue
+        angular = num_shards // rows
+        if angular < 3: break
+        if abs(angular - 3 * rows) < abs(best[0] - 3 * best[1]):
+            best = (angular, rows)
+    return best
+
+def _face_grid(corner_fn, n):
+    """Vertices [(n+1)^2, 3] and quads [n^2, 4] of one parametric brick face."""
+    u, v = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1), indexing='ij')
+    verts = corner_fn(u.reshape(-1), v.reshape(-1))
+    idx = np.arange((n + 1) ** 2).reshape(n + 1, n + 1)
+    quads = np.stack([idx[:-1, :-1], idx[1:, :-1], idx[1:, 1:], idx[:-1, 1:]], axis=-1).reshape(-1, 4)
+    return verts, quads
+
+def _cyl(r, t, z):
+    return np.stack([r * np.cos(t), r * np.sin(t), z], axis=1)
+
+def make_brick(t0, t1, z0, z1, n, surface_top, surface_bottom, r_in=RADIUS_IN, r_out=RADIUS_OUT):
+    """Closed quad mesh of one wall brick. Returns (verts, quads, inner mask per quad)."""
+    radial = lambda c: np.stack([c[:, 0], c[:, 1], np.zeros(len(c))], axis=1)
+    tangent = lambda t: np.array([-np.sin(t), np.cos(t), 0.0])
+    up = np.array([0.0, 0.0, 1.0])
+    # (parametric face, outward direction at the quad centres, is fracture face)
+    faces = [
+        (lambda u, v: _cyl(r_out, t0 + (t1 - t0) * u, z0 + (z1 - z0) * v), radial, False),                 # outer wall
+        (lambda u, v: _cyl(r_in, t0 + (t1 - t0) * u, z0 + (z1 - z0) * v), lambda c: -radial(c), False),    # inner wall
+        (lambda u, v: _cyl(r_in + (r_out - r_in) * u, np.full_like(u, t0), z0 + (z1 - z0) * v), lambda c: -tangent(t0), True),
+        (lambda u, v: _cyl(r_in + (r_out - r_in) * u, np.full_like(u, t1), z0 + (z1 - z0) * v), lambda c: tangent(t1), True),
+        (lambda u, v: _cyl(r_in + (r_out - r_in) * u, t0 + (t1 - t0) * v, np.full_like(u, z0)), lambda c: -up, not surface_bottom),
+        (lambda u, v: _cyl(r_in + (r_out - r_in) * u, t0 + (t1 - t0) * v, np.full_like(u, z1)), lambda c: up, not surface_top),
+    ]
+    verts, quads, inner = [], [], []
+    offset = 0
+    for fn, outward, is_inner in faces:
+        v, q = _face_grid(fn, n)
+        # Wind every quad so its normal points out of the brick
+        c = v[q].mean(axis=1)
+        normal = np.cross(v[q[:, 2]] - v[q[:, 0]], v[q[:, 3]] - v[q[:, 1]])
+        flip = (normal * outward(c)).sum(axis=1) < 0
+        q[flip] = q[flip][:, ::-1]
+        verts.append(v)
+        quads.append(q + offset)
+        inner.append(np.full(len(q), is_inner))
+        offset += len(v)
+    verts = np.vstack(verts)
+    quads = np.vstack(quads)
+    inner = np.concatenate(inner)
+
+    # Weld the shared face borders
+    _, first, remap = np.unique(np.round(verts, 9), axis=0, return_index=True, return_inverse=True)
+    remap = remap.reshape(-1)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    verts = verts[first[order]]
+    quads = rank[remap[quads]]
+
+    return verts, quads, inner
+
+def shard_mesh_arrays(name, verts, quads, inner):
+    """Pipeline array layout of one quad-mesh shard."""
+    num_faces = len(quads)
+    loops = quads.reshape(-1)
+    loop_next = quads[:, [1, 2, 3, 0]].reshape(-1)
+    pairs = np.sort(np.stack([loops, loop_next], axis=1), axis=1)
+    _, loop_edges = np.unique(pairs, axis=0, return_inverse=True)
+
+    tris = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    polygon_index = np.concatenate([np.arange(num_faces), np.arange(num_faces)])
+    return {
+        'name': name,
+        'co': verts,
+        'tris': tris,
+        'material_index': inner[polygon_index].astype(np.int32),
+        'polygon_index': polygon_index,
+        'loop_start': np.arange(num_faces, dtype=np.int64) * 4,
+        'loop_total': np.full(num_faces, 4, dtype=np.int64),
+        'loop_edges': loop_edges.reshape(-1).astype(np.int64),
+        'inner': inner,
+        'centers': verts[quads].mean(axis=1),
+    }
+
+def _angle_gap(theta, cuts):
+    """Smallest absolute angle between theta [V] and any of the cut angles."""
+    diff = np.angle(np.exp(1j * (theta[:, None] - np.asarray(cuts)[None, :])))
+    return np.abs(diff).min(axis=1)
+
+def relieve_brick(verts, t0, t1, z0, z1, cuts_below, cuts_above, waves, amplitude,
+                  r_in=RADIUS_IN, r_out=RADIUS_OUT):
+    """Displaces the fracture-face vertices of one brick by a shared rough relief.
+
+    The height is a function of world position and is pushed along a fixed
+    direction per cut plane (tangent of the cut angle, +z between rows), so the
+    two bricks of a contact get exactly complementary surfaces. It tapers to
+    zero at the walls and along every cut line, which keeps the meshes closed.
+    cuts_below / cuts_above: cut angles of the rows under / over the brick (None = pot rim).
+    """
+    theta = np.arctan2(verts[:, 1], verts[:, 0])
+    radial = np.sin(np.pi * np.clip((np.hypot(verts[:, 0], verts[:, 1]) - r_in) / (r_out - r_in), 0, 1))
+    wave_vec, phase = waves
+    height = amplitude * np.sin(verts @ wave_vec.T + phase).sum(axis=1) / np.sqrt(len(phase) / 2)
+    tol = 1e-9
+    out = verts.copy()
+    for t in (t0, t1):
+        on = _angle_gap(theta, [t]) < tol
+        taper = radial * np.sin(np.pi * np.clip((verts[:, 2] - z0) / (z1 - z0), 0, 1))
+        tangent = np.array([-np.sin(t), np.cos(t), 0.0])
+        out[on] += (height * taper)[on, None] * tangent
+    ramp = RELIEF_WAVELENGTH / 4
+    for zb, cuts_a, cuts_b in ((z0, cuts_below, [t0, t1]), (z1, [t0, t1], cuts_above)):
+        if cuts_a is None or cuts_b is None: continue
+        on = np.abs(verts[:, 2] - zb) < tol
+        gap = _angle_gap(theta, np.concatenate([cuts_a, cuts_b]))
+        taper = radial * np.clip(gap * np.hypot(verts[:, 0], verts[:, 1]) / ramp, 0, 1)
+        out[on, 2] += (height * taper)[on]
+    return out
+
+def relief_waves(rng, count=RELIEF_WAVES):
+    """Random plane waves (wave vectors [count,3], phases [count]) of the fracture relief."""
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    lengths = RELIEF_WAVELENGTH * rng.uniform(0.5, 1.5, count)
+    return directions * (2 * np.pi / lengths)[:, None], rng.uniform(0, 2 * np.pi, count)
+
+def make_fractured_pot(num_shards=60, level='low', seed=0, pot_name="Pot_001", relief=0.0):
+    """List of shard dicts (see module comment) for a pot broken into num_shards bricks.
+
+    relief: RMS height (m) of a rough, complementary fracture surface (0 = flat cuts,
+    as in the benchmarks); needs enough subdivision to show, e.g. level 'high'.
+    """
+    n = SUBDIVISION_LEVELS.get(level, level)
+    rng = np.random.default_rng(seed)
+    angular, rows = choose_grid(num_shards)
+
+    z = np.linspace(0, HEIGHT, rows + 1)
+    if rows > 1:
+        z[1:-1] += rng.uniform(-0.3, 0.3, rows - 1) * (HEIGHT / rows)
+    row_cuts = []
+    for r in range(rows):
+        # Uneven angular cuts, rotated per row
+        cuts = rng.uniform(0.6, 1.4, angular)
+        cuts = np.cumsum(cuts / cuts.sum()) * 2 * np.pi
+        row_cuts.append(np.concatenate([[0.0], cuts]) + rng.uniform(0, 2 * np.pi))
+    waves = relief_waves(np.random.default_rng([seed, 1])) if relief else None
+
+    shards = []
+    for r, t in enumerate(row_cuts):
+        for a in range(angular):
+            verts, quads, inner = make_brick(t[a], t[a + 1], z[r], z[r + 1], n,
+                                             surface_top=(r == rows - 1), surface_bottom=(r == 0))
+            if relief:
+                verts = relieve_brick(verts, t[a], t[a + 1], z[r], z[r + 1],
+                                      row_cuts[r - 1][:-1] if r > 0 else None,
+                                      row_cuts[r + 1][:-1] if r < rows - 1 else None, waves, relief)
+            name = f"{pot_name}_cell.{len(shards):03d}"
+            shards.append(shard_mesh_arrays(name, verts, quads, inner))
+    return shards
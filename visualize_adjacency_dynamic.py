@@ -1,6 +1,8 @@
 import bpy
 import bmesh
-from mathutils import Vector, Matrix
+from mathutils import Matrix
+
+import facet_adjacency
 
 def create_red_pipe(p1, p2, radius, name):
     v = p2 - p1
@@ -57,63 +59,25 @@ def setup_dynamic_visualization():
     bpy.context.view_layer.update()
 
     shards = [obj for obj in bpy.data.objects if "RND_Pot" in obj.name and ("cell" in obj.name.lower() or "Cell" in obj.name) and obj.type == 'MESH']
-    facet_data = []
-
-    for obj in shards:
-        for i, m in enumerate(obj.data.materials):
-            if not m or "RECON_V6_" not in m.name: continue
-            
-            faces = [f for f in obj.data.polygons if f.material_index == i]
-            if not faces: continue
-            
-            local_centroid = sum((f.center for f in faces), Vector()) / len(faces)
-            world_centroid = obj.matrix_world @ local_centroid
-            
-            core_name = m.name[9:] 
-            nb_name = "_".join(core_name.split('_')[:-1])
-            facet_data.append({
-                'obj_name': obj.name, 
-                'nb_name': nb_name, 
-                'mat_name': m.name, 
-                'pos': world_centroid
-            })
+    facet_data, _ = facet_adjacency.collect_facets(shards)
 
-    # 3. Create Pipes
-    processed_pairs = set()
+    # 3. Create Pipes (pair_facets returns each pair once)
     count = 0
     MATCH_DIST_THRESHOLD = 2.0 
     
-    for i, f1 in enumerate(facet_data):
-        if f1['nb_name'] == "NONE": continue
+    for i, j in facet_adjacency.pair_facets(facet_data, max_dist=MATCH_DIST_THRESHOLD):
+        f1 = facet_data[i]
+        f2 = facet_data[j]
         
-        best_candidate = None
-        min_dist = 1000.0
-
-        for j, f2 in enumerate(facet_data):
-            if i == j: continue
-            if f1['nb_name'] == f2['obj_name'] and f2['nb_name'] == f1['obj_name']:
-                dist = (f1['pos'] - f2['pos']).length
-                if dist < MATCH_DIST_THRESHOLD and dist < min_dist:
-                    min_dist = dist
-                    best_candidate = j
-                    
-        if best_candidate is not None:
-            f2 = facet_data[best_candidate]
-            pair_ids = sorted([f1['mat_name'] + f1['obj_name'], f2['mat_name'] + f2['obj_name']])
-            pair_key = "_".join(pair_ids)
-            
-            if pair_key not in processed_pairs:
-                processed_pairs.add(pair_key)
-                
-                # Create RED THICK PIPE (4cm diameter)
-                pipe = create_red_pipe(
-                    f1['pos'], f2['pos'], 
-                    radius=0.02, 
-                    name=f"FinalPipe_{count}"
-                )
-                if pipe:
-                    pipe.data.materials.append(mat)
-                    count += 1
+        # Create RED THICK PIPE (4cm diameter)
+        pipe = create_red_pipe(
+            f1['pos'], f2['pos'], 
+            radius=0.02, 
+            name=f"FinalPipe_{count}"
+        )
+        if pipe:
+            pipe.data.materials.append(mat)
+            count += 1
 
     bpy.context.scene.frame_set(current_frame)
     return f"Created {count} RED THICK PIPES."